@@ -0,0 +1,271 @@
+"""成就系统（不导入PyQt）
+
+每条规则只保存很小的增量状态，在添加记录和日期切换时更新，不重新扫描历史记录。
+进度保存在数据目录的 achievements.json 中；文件不存在时（第一次使用）从已有记录重建一次。
+
+    python achievements.py    基准测试：评估一条记录的耗时与历史长短无关
+"""
+import gc
+import os
+import sys
+import json
+import time
+from datetime import datetime, timedelta
+
+ACHIEVEMENT_FILE_NAME = "achievements.json"
+
+# 一天中的时段（用于“全天饮水”）：上午、下午、晚上
+DAY_PARTS = [(0, 12), (12, 18), (18, 24)]
+
+
+def previous_day(day):
+    """前一天的日期字符串"""
+    return (datetime.strptime(day, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def crossed_goal(amount, day_total, goal):
+    """这条记录是否让当天饮水量刚好越过目标"""
+    return day_total - amount < goal <= day_total
+
+
+class AchievementRule:
+    """成就规则：state是可以保存为JSON的小字典，progress(state)达到target时解锁
+
+    on_record 在每条新记录后调用（day_total已包含这条记录），
+    on_day_rollover 在进入新的一天时调用；两者都只能修改state，不能读取历史记录。
+    """
+    def __init__(self, key, title, description, target=1):
+        self.key = key
+        self.title = title
+        self.description = description
+        self.target = target
+
+    def initial_state(self):
+        return {"value": 0}
+
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        pass
+
+    def on_day_rollover(self, state, day):
+        pass
+
+    def progress(self, state):
+        return state["value"]
+
+
+class RecordCountRule(AchievementRule):
+    """累计记录次数"""
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        state["value"] += 1
+
+
+class TotalAmountRule(AchievementRule):
+    """累计饮水量（毫升）"""
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        state["value"] += amount
+
+
+class GoalDaysRule(AchievementRule):
+    """累计达标天数（同一天重置后再次达标不重复计算）"""
+    def initial_state(self):
+        return {"value": 0, "last_day": None}
+
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        if crossed_goal(amount, day_total, goal) and state["last_day"] != day:
+            state["value"] += 1
+            state["last_day"] = day
+
+
+class GoalStreakRule(AchievementRule):
+    """连续达标天数（进度为历史最长连续天数）"""
+    def initial_state(self):
+        return {"value": 0, "current": 0, "last_day": None}
+
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        if not crossed_goal(amount, day_total, goal) or state["last_day"] == day:
+            return
+        if state["last_day"] == previous_day(day):
+            state["current"] += 1
+        else:
+            state["current"] = 1
+        state["last_day"] = day
+        state["value"] = max(state["value"], state["current"])
+
+    def on_day_rollover(self, state, day):
+        # 昨天没有达标，当前连续天数中断
+        if state["last_day"] and state["last_day"] < previous_day(day):
+            state["current"] = 0
+
+
+class EarlyBirdRule(AchievementRule):
+    """在某个时间之前喝水的天数"""
+    def __init__(self, key, title, description, target=1, before_hour=8):
+        super().__init__(key, title, description, target)
+        self.before_hour = before_hour
+
+    def initial_state(self):
+        return {"value": 0, "last_day": None}
+
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        if hour < self.before_hour and state["last_day"] != day:
+            state["value"] += 1
+            state["last_day"] = day
+
+
+class AllDayRule(AchievementRule):
+    """上午、下午、晚上都喝了水的天数（饮水均匀）"""
+    def initial_state(self):
+        return {"value": 0, "day": None, "parts": 0}
+
+    def on_record(self, state, day, hour, amount, day_total, goal):
+        if state["day"] != day:
+            state["day"] = day
+            state["parts"] = 0
+        all_parts = (1 << len(DAY_PARTS)) - 1
+        if state["parts"] == all_parts:
+            return
+        for index, (start, end) in enumerate(DAY_PARTS):
+            if start <= hour < end:
+                state["parts"] |= 1 << index
+        if state["parts"] == all_parts:
+            state["value"] += 1
+
+
+# 已注册的成就规则（key -> 规则），按注册顺序显示
+ACHIEVEMENT_RULES = {}
+
+
+def register_rule(rule):
+    """注册成就规则，key不能重复；返回规则本身"""
+    if rule.key in ACHIEVEMENT_RULES:
+        raise ValueError(f"成就规则已存在: {rule.key}")
+    ACHIEVEMENT_RULES[rule.key] = rule
+    return rule
+
+
+register_rule(RecordCountRule("first_drink", "第一杯水", "记录第一次饮水"))
+register_rule(GoalDaysRule("first_goal", "初次达标", "第一次达成每日目标"))
+register_rule(GoalStreakRule("streak_3", "渐入佳境", "连续3天达成目标", 3))
+register_rule(GoalStreakRule("streak_7", "坚持一周", "连续7天达成目标", 7))
+register_rule(GoalStreakRule("streak_30", "习惯养成", "连续30天达成目标", 30))
+register_rule(GoalDaysRule("goal_days_100", "百日达标", "累计100天达成目标", 100))
+register_rule(EarlyBirdRule("early_bird", "早起一杯水", "累计10天在8点前喝水", 10))
+register_rule(AllDayRule("all_day", "细水长流", "累计7天上午、下午、晚上都喝水", 7))
+register_rule(TotalAmountRule("ocean_100l", "百升之水", "累计喝水100升", 100000))
+
+
+class AchievementEngine:
+    """按已注册的规则增量评估成就，并保存进度
+
+    每条记录的评估只与规则数量有关，与历史记录的多少无关。
+    记录按日期顺序评估，同步来的早于已评估日期的记录不再计入（成就不会因此撤销）。
+    """
+    def __init__(self, path=None, rules=None):
+        self.path = path
+        self.rules = list((rules or ACHIEVEMENT_RULES).values())
+        self.states = {}
+        self.unlocked = {}  # key -> 解锁日期
+        self.last_day = None
+        self.loaded = self.load()
+
+    def load(self):
+        """读取保存的进度，文件不存在或损坏时返回False（需要重建）"""
+        saved = {}
+        if self.path:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+        states = saved.get("states", {})
+        self.states = {rule.key: states.get(rule.key, rule.initial_state()) for rule in self.rules}
+        self.unlocked = saved.get("unlocked", {})
+        self.last_day = saved.get("last_day")
+        return bool(saved)
+
+    def save(self):
+        if not self.path:
+            return
+        temp_file = self.path + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"states": self.states, "unlocked": self.unlocked, "last_day": self.last_day},
+                      f, ensure_ascii=False)
+        os.replace(temp_file, self.path)
+
+    def rebuild(self, records, day_goal):
+        """从全部记录重建进度（只在第一次使用时执行），不产生解锁通知，也不保存（由调用方决定）；
+        day_goal(日期)返回当天的目标"""
+        self.states = {rule.key: rule.initial_state() for rule in self.rules}
+        self.unlocked = {}
+        self.last_day = None
+        for day in sorted(records):
+            goal = day_goal(day)
+            day_total = 0
+            for record in sorted(records[day], key=lambda record: record["time"]):
+                day_total += record["amount"]
+                hour = int(record["time"].split(":")[0]) % 24
+                self.on_record(day, hour, record["amount"], day_total, goal)
+
+    def on_day_rollover(self, day):
+        """进入新的一天"""
+        if self.last_day is not None and day <= self.last_day:
+            return
+        for rule in self.rules:
+            rule.on_day_rollover(self.states[rule.key], day)
+        self.last_day = day
+
+    def on_record(self, day, hour, amount, day_total, goal):
+        """评估一条新记录，返回因此解锁的规则列表（调用方负责save）"""
+        if self.last_day is not None and day < self.last_day:
+            return []
+        self.on_day_rollover(day)
+
+        unlocked = []
+        for rule in self.rules:
+            state = self.states[rule.key]
+            rule.on_record(state, day, hour, amount, day_total, goal)
+            if rule.key not in self.unlocked and rule.progress(state) >= rule.target:
+                self.unlocked[rule.key] = day
+                unlocked.append(rule)
+        return unlocked
+
+    def summary(self):
+        """每条规则的标题、说明、进度和解锁日期"""
+        return [{
+            "key": rule.key,
+            "title": rule.title,
+            "description": rule.description,
+            "progress": min(rule.progress(self.states[rule.key]), rule.target),
+            "target": rule.target,
+            "unlocked": self.unlocked.get(rule.key),
+        } for rule in self.rules]
+
+
+def benchmark(history_days=(30, 365, 3650, 36500), records_per_day=8, samples=20000):
+    """先用不同长度的历史重建进度，再测量评估一条新记录的平均耗时"""
+    print(f"{'历史天数':>8}  {'重建(ms)':>10}  {'每条记录(us)':>12}")
+    start_day = datetime(2000, 1, 1)
+    for days in history_days:
+        records = {}
+        for offset in range(days):
+            day = (start_day + timedelta(days=offset)).strftime("%Y-%m-%d")
+            records[day] = [{"time": f"{7 + i * 2:02d}:00", "amount": 250} for i in range(records_per_day)]
+        engine = AchievementEngine()
+        began = time.perf_counter()
+        engine.rebuild(records, lambda day: 1700)
+        rebuild_ms = (time.perf_counter() - began) * 1000
+        # 只保留引擎本身，避免垃圾回收扫描测试数据影响计时
+        del records
+        gc.collect()
+
+        day = (start_day + timedelta(days=days)).strftime("%Y-%m-%d")
+        began = time.perf_counter()
+        for i in range(samples):
+            engine.on_record(day, 7 + i % 16, 250, 250 * (i % 12 + 1), 1700)
+        per_record_us = (time.perf_counter() - began) / samples * 1e6
+        print(f"{days:>8}  {rebuild_ms:>10.1f}  {per_record_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    benchmark()
+    sys.exit(0)
@@ -0,0 +1,47 @@
+import os
+
+from PyQt5.QtCore import QFile, QIODevice
+from PyQt5.QtGui import QIcon
+
+# 编译好的Qt资源模块由 build_exe.py 生成（python build_exe.py --resources-only）
+try:
+    import resources_rc  # noqa: F401
+    HAS_COMPILED_RESOURCES = True
+except ImportError:
+    HAS_COMPILED_RESOURCES = False
+
+# 源码中的资源目录（开发环境下的回退路径，与当前工作目录无关）
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources")
+
+# 图标尺寸
+ICON_SIZES = [16, 32, 48, 64, 128]
+
+
+def resource_path(relative_path):
+    """获取资源路径：有编译资源时使用内存中的 :/ 路径，否则使用源码目录中的文件"""
+    if HAS_COMPILED_RESOURCES:
+        return ":/" + relative_path.replace(os.sep, "/")
+    return os.path.join(RESOURCE_DIR, relative_path)
+
+
+def load_app_icon():
+    """加载包含所有尺寸的应用图标，资源缺失时返回None"""
+    icon = QIcon()
+    for size in ICON_SIZES:
+        path = resource_path(f"water_bottle_{size}.png")
+        if HAS_COMPILED_RESOURCES or os.path.exists(path):
+            icon.addFile(path)
+    if not icon.availableSizes():
+        return None
+    return icon
+
+
+def read_text_resource(relative_path, default=""):
+    """读取文本资源（例如QSS样式表），资源不存在时返回默认值"""
+    resource_file = QFile(resource_path(relative_path))
+    if not resource_file.open(QIODevice.ReadOnly | QIODevice.Text):
+        return default
+    try:
+        return bytes(resource_file.readAll()).decode("utf-8")
+    finally:
+        resource_file.close()
@@ -36,6 +36,35 @@ def ensure_icon_exists():
         print(f"使用现有图标: {icon_path}")
         return icon_path
 
+def compile_resources():
+    """把图标和QSS主题编译成Qt资源模块resources_rc.py
+    
+    程序运行时通过 :/ 路径从内存加载资源，不再依赖当前工作目录下的resources目录。
+    """
+    resource_files = []
+    for root, _, files in os.walk("resources"):
+        for name in sorted(files):
+            if name.endswith((".png", ".qss")):
+                path = os.path.join(root, name)
+                resource_files.append(os.path.relpath(path, "resources").replace(os.sep, "/"))
+    
+    if not resource_files:
+        print("未找到资源文件，跳过资源编译")
+        return None
+    
+    # 生成qrc文件，别名与resources目录内的相对路径一致
+    lines = ['<!DOCTYPE RCC><RCC version="1.0">', '<qresource prefix="/">']
+    for relative_path in sorted(resource_files):
+        lines.append(f'    <file alias="{relative_path}">resources/{relative_path}</file>')
+    lines.extend(['</qresource>', '</RCC>', ''])
+    with open("resources.qrc", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    
+    # 使用PyQt5自带的pyrcc5编译
+    subprocess.check_call([sys.executable, "-m", "PyQt5.pyrcc_main", "-o", "resources_rc.py", "resources.qrc"])
+    print(f"已编译 {len(resource_files)} 个资源到 resources_rc.py")
+    return "resources_rc.py"
+
 def cleanup():
     """清理之前的构建目录"""
     dirs_to_remove = ["build", "dist"]
@@ -45,6 +74,10 @@ def cleanup():
     
     if os.path.exists("水瓶助手.spec"):
         os.remove("水瓶助手.spec")
+    
+    for generated in ["resources.qrc", "resources_rc.py"]:
+        if os.path.exists(generated):
+            os.remove(generated)
 
 def build_exe():
     """使用PyInstaller打包应用程序"""
@@ -53,6 +86,9 @@ def build_exe():
     # 确保图标文件存在
     icon_path = ensure_icon_exists()
     
+    # 编译Qt资源模块（图标和主题打包进程序，运行时从内存加载）
+    compiled_resources = compile_resources()
+    
     # PyInstaller命令参数
     cmd = [
         "pyinstaller",
@@ -72,8 +108,10 @@ def build_exe():
         "--add-data=README.md;.",
     ])
     
-    # 如果resources目录存在，添加所有资源
-    if os.path.exists("resources"):
+    # 资源已编译进resources_rc.py时无需再复制散文件
+    if compiled_resources:
+        cmd.append("--hidden-import=resources_rc")
+    elif os.path.exists("resources"):
         cmd.append("--add-data=resources;resources")
     
     # 主脚本
@@ -100,6 +138,12 @@ def check_upx():
     return False
 
 if __name__ == "__main__":
+    # 只编译资源模块（开发时使用）
+    if "--resources-only" in sys.argv:
+        ensure_icon_exists()
+        compile_resources()
+        sys.exit(0)
+    
     print("===== 水瓶助手应用打包工具 =====")
     print("此脚本将把Python应用打包为单个EXE文件")
     
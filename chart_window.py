@@ -0,0 +1,336 @@
+from datetime import date, timedelta
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QButtonGroup
+from PyQt5.QtCore import Qt, QRectF, QPointF, QSettings, pyqtSignal
+from PyQt5.QtGui import QPainter, QPixmap, QColor, QPen, QFont
+
+from theme import theme_color, current_theme
+
+# 可选时间段（名称 -> 按钮文字）
+CHART_SPANS = {
+    "day": "日",
+    "week": "周",
+    "month": "月",
+    "year": "年",
+}
+CHART_SPAN_NAMES = list(CHART_SPANS)
+DEFAULT_CHART_SPAN = "week"
+
+WEEKDAY_LABELS = ["一", "二", "三", "四", "五", "六", "日"]
+
+# 绘图区四周留白（左、上、右、下），左侧和下方放坐标轴文字
+CHART_MARGINS = (48, 12, 14, 26)
+
+# 每个数据点至少要有这么多像素才画成柱子，否则按像素列取最小/最大值绘制
+MIN_BAR_PIXELS = 3
+
+BAR_COLOR = QColor(65, 180, 255, 200)       # 未达标
+GOAL_BAR_COLOR = QColor(46, 204, 113, 210)  # 达标
+ENVELOPE_COLOR = QColor(65, 180, 255, 90)   # 像素列内最小值到最大值之间
+GOAL_LINE_COLOR = QColor(231, 76, 60, 200)
+
+
+def span_range(span, anchor):
+    """包含anchor（date）的时间段的(第一天, 最后一天)"""
+    if span == "day":
+        return anchor, anchor
+    if span == "week":
+        first = anchor - timedelta(days=anchor.weekday())
+        return first, first + timedelta(days=6)
+    if span == "month":
+        first = anchor.replace(day=1)
+        next_first = (first + timedelta(days=32)).replace(day=1)
+        return first, next_first - timedelta(days=1)
+    return date(anchor.year, 1, 1), date(anchor.year, 12, 31)
+
+
+def shift_anchor(span, anchor, steps):
+    """向前（steps<0）或向后移动若干个时间段"""
+    if span == "day":
+        return anchor + timedelta(days=steps)
+    if span == "week":
+        return anchor + timedelta(days=7 * steps)
+    if span == "month":
+        month = anchor.year * 12 + anchor.month - 1 + steps
+        return date(month // 12, month % 12 + 1, 1)
+    return date(anchor.year + steps, 1, 1)
+
+
+def min_max_downsample(values, columns):
+    """把values按顺序分到columns个像素列，返回每列的(最小值, 最大值)
+
+    数据点比像素少时每个点单独一列；否则每列只画一段，绘制量与数据量无关，
+    而且不会像隔点取样那样漏掉单日的高峰或低谷。
+    """
+    count = len(values)
+    if count <= columns:
+        return [(value, value) for value in values]
+    buckets = []
+    for column in range(columns):
+        chunk = values[column * count // columns:(column + 1) * count // columns]
+        buckets.append((min(chunk), max(chunk)))
+    return buckets
+
+
+def axis_scale(top):
+    """纵轴的(最大值, 刻度间隔)，最多4格"""
+    for step in (50, 100, 250, 500, 1000, 2500, 5000, 10000):
+        if top <= step * 4:
+            break
+    maximum = max(step, -(-top // step) * step)
+    return maximum, step
+
+
+class HistoryChart(QWidget):
+    """柱状图：内容绘制到缓存的QPixmap中，只有数据、尺寸或主题变化时才重新生成"""
+    scrolled = pyqtSignal(int)  # 滚轮请求移动的时间段数
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.labels = []   # (下标, 文字)
+        self.goals = []    # 每个数据点的目标，为空时不画目标线
+        self._pixmap = None
+        self._pixmap_key = None
+        self._wheel_delta = 0
+        self.setMinimumSize(240, 160)
+
+    def set_series(self, values, labels, goals=None):
+        """设置要显示的数据，缓存的图像在下次绘制时重新生成"""
+        self.values = values
+        self.labels = labels
+        self.goals = goals or []
+        self._pixmap = None
+        self.update()
+
+    def paintEvent(self, event):
+        key = (self.width(), self.height(), self.devicePixelRatioF(), current_theme())
+        if self._pixmap is None or self._pixmap_key != key:
+            self._pixmap = self.render_chart()
+            self._pixmap_key = key
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+
+    def render_chart(self):
+        """把坐标轴和柱子绘制到一张新的QPixmap"""
+        dpr = self.devicePixelRatioF()
+        pixmap = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+
+        left, top, right, bottom = CHART_MARGINS
+        plot = QRectF(left, top, self.width() - left - right, self.height() - top - bottom)
+        if plot.width() <= 0 or plot.height() <= 0:
+            return pixmap
+
+        painter = QPainter(pixmap)
+        font = QFont()
+        font.setPointSize(8)
+        painter.setFont(font)
+        text_color = theme_color("text")
+
+        maximum, step = axis_scale(max(self.values + self.goals + [1]))
+
+        def y_of(value):
+            return plot.bottom() - value / maximum * plot.height()
+
+        # 横向网格线和纵轴刻度
+        for value in range(0, maximum + 1, step):
+            y = y_of(value)
+            painter.setPen(QPen(theme_color("grid"), 1))
+            painter.drawLine(QPointF(plot.left(), y), QPointF(plot.right(), y))
+            painter.setPen(text_color)
+            painter.drawText(QRectF(0, y - 8, left - 6, 16), Qt.AlignRight | Qt.AlignVCenter, str(value))
+
+        slot = plot.width() / max(len(self.values), 1)
+        if slot >= MIN_BAR_PIXELS:
+            for index, value in enumerate(self.values):
+                if value <= 0:
+                    continue
+                color = GOAL_BAR_COLOR if self.goals and value >= self.goals[index] else BAR_COLOR
+                painter.fillRect(QRectF(plot.left() + index * slot + slot * 0.15, y_of(value),
+                                        slot * 0.7, plot.bottom() - y_of(value)), color)
+        else:
+            buckets = min_max_downsample(self.values, max(1, int(plot.width())))
+            column = plot.width() / len(buckets)
+            for index, (low, high) in enumerate(buckets):
+                x = plot.left() + index * column
+                painter.fillRect(QRectF(x, y_of(low), column, plot.bottom() - y_of(low)), BAR_COLOR)
+                painter.fillRect(QRectF(x, y_of(high), column, y_of(low) - y_of(high)), ENVELOPE_COLOR)
+
+        # 目标线：每天的目标可能不同，画成阶梯线
+        if self.goals:
+            painter.setPen(QPen(GOAL_LINE_COLOR, 1, Qt.DashLine))
+            start = 0
+            for index in range(1, len(self.goals) + 1):
+                if index < len(self.goals) and self.goals[index] == self.goals[start]:
+                    continue
+                y = y_of(self.goals[start])
+                painter.drawLine(QPointF(plot.left() + start * slot, y), QPointF(plot.left() + index * slot, y))
+                if index < len(self.goals):
+                    painter.drawLine(QPointF(plot.left() + index * slot, y),
+                                     QPointF(plot.left() + index * slot, y_of(self.goals[index])))
+                start = index
+
+        # 横轴文字
+        painter.setPen(text_color)
+        for index, text in self.labels:
+            x = plot.left() + (index + 0.5) * slot
+            painter.drawText(QRectF(x - 30, plot.bottom() + 4, 60, bottom - 4), Qt.AlignHCenter | Qt.AlignTop, text)
+        painter.end()
+        return pixmap
+
+    def wheelEvent(self, event):
+        """滚轮前后翻动时间段（触控板的小幅滚动累积到一格再翻）"""
+        self._wheel_delta += event.angleDelta().y() or event.angleDelta().x()
+        while abs(self._wheel_delta) >= 120:
+            step = 1 if self._wheel_delta > 0 else -1
+            self._wheel_delta -= step * 120
+            self.scrolled.emit(-step)
+        event.accept()
+
+
+class ChartWindow(QWidget):
+    """饮水统计窗口：按日、周、月、年查看历史饮水量
+
+    数据来自DataManager在内存中维护的每日、每小时汇总，不读磁盘。
+    记录变化时只有落在当前时间段内才重新加载；窗口隐藏时只做标记，显示时再加载。
+    """
+    def __init__(self, data_manager, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setObjectName("chartWindow")  # 样式见主题样式表
+        self.setAttribute(Qt.WA_StyledBackground, True)
+        self.setWindowTitle("饮水统计")
+        self.resize(560, 360)
+
+        self.data_manager = data_manager
+        settings = QSettings("WaterBottleApp", "WaterReminder")
+        self.span = settings.value("chart_span", DEFAULT_CHART_SPAN)
+        if self.span not in CHART_SPANS:
+            self.span = DEFAULT_CHART_SPAN
+        self.anchor = date.today()
+        self._dirty = True
+
+        layout = QVBoxLayout(self)
+        toolbar = QHBoxLayout()
+        self.span_group = QButtonGroup(self)
+        for name in CHART_SPAN_NAMES:
+            button = QPushButton(CHART_SPANS[name])
+            button.setCheckable(True)
+            button.setChecked(name == self.span)
+            button.setProperty("span", name)
+            self.span_group.addButton(button)
+            toolbar.addWidget(button)
+        self.span_group.buttonClicked.connect(lambda button: self.set_span(button.property("span")))
+        toolbar.addStretch()
+
+        self.previous_button = QPushButton("◀")
+        self.previous_button.clicked.connect(lambda: self.move_by(-1))
+        self.range_label = QLabel()
+        self.range_label.setObjectName("chartRangeLabel")
+        self.range_label.setAlignment(Qt.AlignCenter)
+        self.next_button = QPushButton("▶")
+        self.next_button.clicked.connect(lambda: self.move_by(1))
+        self.today_button = QPushButton("今天")
+        self.today_button.clicked.connect(self.go_today)
+        for widget in (self.previous_button, self.range_label, self.next_button, self.today_button):
+            toolbar.addWidget(widget)
+        layout.addLayout(toolbar)
+
+        self.chart = HistoryChart(self)
+        self.chart.scrolled.connect(self.move_by)
+        layout.addWidget(self.chart, 1)
+
+        self.summary_label = QLabel()
+        self.summary_label.setObjectName("chartSummaryLabel")
+        layout.addWidget(self.summary_label)
+
+        data_manager.records_added.connect(self.on_records_changed)
+        data_manager.records_removed.connect(self.on_records_changed)
+        data_manager.day_reset.connect(self.on_records_changed)
+        data_manager.goal_changed.connect(lambda goal: self.invalidate())
+        data_manager.day_rolled_over.connect(lambda day: self.invalidate())
+
+    def set_span(self, span):
+        if span == self.span:
+            return
+        self.span = span
+        for button in self.span_group.buttons():
+            button.setChecked(button.property("span") == span)
+        QSettings("WaterBottleApp", "WaterReminder").setValue("chart_span", span)
+        self.invalidate()
+
+    def move_by(self, steps):
+        """前后移动时间段，不超过今天所在的时间段"""
+        anchor = shift_anchor(self.span, self.anchor, steps)
+        if span_range(self.span, anchor)[0] > date.today():
+            return
+        self.anchor = anchor
+        self.invalidate()
+
+    def go_today(self):
+        self.anchor = date.today()
+        self.invalidate()
+
+    def on_records_changed(self, day, records=None):
+        """记录变化（见DataManager的变更通知），只关心当前时间段内的日期"""
+        first_day, last_day = span_range(self.span, self.anchor)
+        if first_day.strftime("%Y-%m-%d") <= day <= last_day.strftime("%Y-%m-%d"):
+            self.invalidate()
+
+    def invalidate(self):
+        """数据需要重新加载；窗口隐藏时推迟到下次显示"""
+        self._dirty = True
+        if self.isVisible():
+            self.reload()
+
+    def showEvent(self, event):
+        if self._dirty:
+            self.reload()
+        super().showEvent(event)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Left:
+            self.move_by(-1)
+        elif event.key() == Qt.Key_Right:
+            self.move_by(1)
+        else:
+            super().keyPressEvent(event)
+
+    def reload(self):
+        """从内存中的汇总数据读取当前时间段并刷新图表和文字"""
+        self._dirty = False
+        today = date.today()
+        first_day, last_day = span_range(self.span, self.anchor)
+        if self.span == "day":
+            goal = self.data_manager.get_day_goal(first_day.strftime("%Y-%m-%d"))
+            values = self.data_manager.get_hourly_totals(first_day.strftime("%Y-%m-%d"))
+            labels = [(hour, f"{hour}时") for hour in range(0, 24, 3)]
+            self.chart.set_series(values, labels)
+            self.range_label.setText(first_day.strftime("%Y-%m-%d"))
+            self.summary_label.setText(f"合计 {sum(values)} ml，目标 {goal} ml")
+        else:
+            values = self.data_manager.get_daily_totals(first_day, last_day)
+            goals = self.data_manager.get_daily_goals(first_day, last_day)
+            if self.span == "week":
+                labels = [(index, f"周{name}") for index, name in enumerate(WEEKDAY_LABELS)]
+                self.range_label.setText(f"{first_day:%m-%d} ~ {last_day:%m-%d}")
+            elif self.span == "month":
+                labels = [(day - 1, str(day)) for day in range(1, len(values) + 1, 7)]
+                self.range_label.setText(f"{first_day.year}年{first_day.month}月")
+            else:
+                labels = [((date(first_day.year, month, 1) - first_day).days, f"{month}月")
+                          for month in range(1, 13, 2)]
+                self.range_label.setText(f"{first_day.year}年")
+            self.chart.set_series(values, labels, goals)
+
+            # 平均值只算到今天
+            elapsed_days = max(0, (min(last_day, today) - first_day).days + 1)
+            elapsed = values[:elapsed_days]
+            average = sum(elapsed) / len(elapsed) if elapsed else 0
+            reached = sum(1 for value, goal in zip(elapsed, goals) if value >= goal)
+            self.summary_label.setText(f"合计 {sum(values)} ml，平均 {average:.0f} ml/天，"
+                                       f"{reached}/{len(elapsed)} 天达成目标")
+
+        self.next_button.setEnabled(last_day < today)
+        self.today_button.setEnabled(not first_day <= today <= last_day)
@@ -0,0 +1,242 @@
+"""水瓶命令行工具（不导入PyQt）
+
+    python cli.py add 250          记录一次饮水
+    python cli.py today            查看今天的饮水量
+    python cli.py stats --days 7   最近几天的饮水统计
+    python cli.py export -o a.csv  导出全部记录
+    python cli.py compact          整理数据文件
+    python cli.py sync URL         与同步服务器交换增量变更
+    python cli.py achievements     查看成就进度
+    python cli.py verify --repair  校验数据文件，修复损坏的部分
+
+水瓶正在运行时，修改数据的命令会转发给它；否则在持有单实例锁的情况下直接读写数据文件。
+"""
+import sys
+import json
+import argparse
+from datetime import date, timedelta
+
+import ipc
+from integrity import valid_amount, MAX_RECORD_AMOUNT
+
+
+class CommandError(Exception):
+    """命令执行失败（消息直接显示给用户）"""
+
+
+def open_store(write=False):
+    """打开数据文件，返回(DataManager, 锁)；write为True时必须先拿到单实例锁，否则只读打开，不写任何文件"""
+    lock = None
+    if write:
+        lock = ipc.InstanceLock()
+        if not lock.acquire():
+            raise CommandError("水瓶正在启动，请稍后再试")
+    from data_manager import DataManager
+    return DataManager(read_only=not write), lock
+
+
+def run_command(command, apply_locally):
+    """修改数据的命令：有界面实例时转发给它，否则在锁内直接执行"""
+    reply = ipc.send_command(command, timeout=30.0)
+    if reply is None:
+        manager, lock = open_store(write=True)
+        with lock:
+            result = apply_locally(manager) or {}
+            reply = dict(result, ok=True, today=manager.get_today_total(), goal=manager.get_daily_goal())
+    if not reply.get("ok"):
+        raise CommandError(reply.get("error", "命令执行失败"))
+    return reply
+
+
+def format_progress(today, goal):
+    percent = int(today / goal * 100) if goal else 0
+    return f"今天已喝 {today} / {goal} ml（{percent}%）"
+
+
+def cmd_add(args):
+    if not valid_amount(args.amount):
+        raise CommandError(f"饮水量应在1到{MAX_RECORD_AMOUNT}毫升之间")
+    reply = run_command({"command": "add", "amount": args.amount},
+                        lambda manager: manager.add_water_record(args.amount))
+    print(f"已记录 {args.amount} ml，" + format_progress(reply["today"], reply["goal"]))
+
+
+def cmd_today(args):
+    reply = ipc.send_command({"command": "status"})
+    if reply is None:
+        manager, _ = open_store()
+        reply = {"today": manager.get_today_total(), "goal": manager.get_daily_goal()}
+    if args.json:
+        print(json.dumps({"today": reply["today"], "goal": reply["goal"]}))
+    else:
+        print(format_progress(reply["today"], reply["goal"]))
+
+
+def cmd_stats(args):
+    if args.days <= 0:
+        raise CommandError("天数必须大于0")
+    # 只读：界面的新记录先追加到日志（water_journal.jsonl），打开数据时会一并重放，直接读取即可
+    manager, _ = open_store()
+    first_day = date.today() - timedelta(days=args.days - 1)
+    rows = []
+    for i in range(args.days):
+        day = (first_day + timedelta(days=i)).strftime("%Y-%m-%d")
+        # 每天按当天实际使用的目标判断是否达标
+        rows.append({"date": day, "total": manager.daily_totals.get(day, 0), "goal": manager.get_day_goal(day)})
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False))
+        return
+    reached = 0
+    for row in rows:
+        mark = "✓" if row["total"] >= row["goal"] else " "
+        reached += row["total"] >= row["goal"]
+        print(f"{row['date']}  {row['total']:>5} / {row['goal']} ml  {mark}")
+    average = sum(row["total"] for row in rows) / len(rows)
+    print(f"平均 {average:.0f} ml/天，{reached}/{len(rows)} 天达成目标")
+
+
+def cmd_export(args):
+    manager, _ = open_store()
+    records = manager.data.get("records", {})
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(records, output, ensure_ascii=False, indent=2)
+            output.write("\n")
+        else:
+            import csv
+            writer = csv.writer(output)
+            writer.writerow(["date", "time", "amount"])
+            for day in sorted(records):
+                for record in records[day]:
+                    writer.writerow([day, record["time"], record["amount"]])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def cmd_compact(args):
+    if args.keep_days is not None and args.keep_days <= 0:
+        raise CommandError("保留天数必须大于0")
+    reply = run_command({"command": "compact", "keep_days": args.keep_days},
+                        lambda manager: manager.compact(args.keep_days))
+    if not reply.get("background"):
+        print("数据文件已整理")
+    elif reply.get("started"):
+        print("水瓶正在运行，已在后台空闲时开始整理")
+    else:
+        print("水瓶正在后台整理数据文件")
+
+
+def cmd_sync(args):
+    from sync import SyncEngine, HttpTransport, SyncError
+
+    def sync_locally(manager):
+        try:
+            pushed, pulled = SyncEngine(manager, HttpTransport(args.server)).sync()
+        except SyncError as e:
+            raise CommandError(str(e))
+        return {"pushed": pushed, "pulled": pulled}
+
+    reply = run_command({"command": "sync", "server": args.server}, sync_locally)
+    if reply.get("background"):
+        if reply.get("started"):
+            print("水瓶正在运行，已在后台开始同步，完成后会显示通知")
+        else:
+            print("水瓶正在后台同步")
+        return
+    print(f"已推送 {reply['pushed']} 条、拉取 {reply['pulled']} 条变更，" + format_progress(reply["today"], reply["goal"]))
+
+
+def cmd_achievements(args):
+    # 成就进度每次评估后都会立即保存，直接读取即可
+    manager, _ = open_store()
+    items = manager.achievements.summary()
+    if args.json:
+        print(json.dumps(items, ensure_ascii=False))
+        return
+    for item in items:
+        mark = "✓" if item["unlocked"] else " "
+        print(f"{mark} {item['title']}  {item['progress']}/{item['target']}  {item['description']}")
+    unlocked = sum(1 for item in items if item["unlocked"])
+    print(f"已解锁 {unlocked}/{len(items)} 个成就")
+
+
+def cmd_verify(args):
+    report = run_command({"command": "verify", "repair": args.repair},
+                         lambda manager: manager.verify_store(args.repair))
+    if args.json:
+        print(json.dumps({key: value for key, value in report.items() if key != "ok"}, ensure_ascii=False))
+        return
+    data_file_states = {"ok": "正常", "missing": "不存在", "damaged": "无法读取"}
+    print(f"数据文件: {data_file_states[report['data_file']]}，{report['segments']} 个月份")
+    if report["damaged_segments"]:
+        print("校验失败的月份: " + "、".join(report["damaged_segments"]))
+    if report["invalid_records"]:
+        print(f"格式错误的记录: {report['invalid_records']} 条")
+    print(f"日志: {report['journal_lines']} 行，损坏 {report['damaged_lines']} 行")
+    for issue in report["repaired_on_load"]:
+        print(f"加载时: {issue}")
+    if report.get("repaired"):
+        print("已重建索引并重新写入数据文件和备份")
+    elif not report["healthy"]:
+        print("发现问题，使用 --repair 修复")
+    else:
+        print("数据完好")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="water-bottle", description="水瓶命令行工具")
+    subparsers = parser.add_subparsers(dest="command", metavar="命令")
+    subparsers.required = True
+
+    add_parser = subparsers.add_parser("add", help="记录一次饮水")
+    add_parser.add_argument("amount", type=int, help="饮水量（毫升）")
+    add_parser.set_defaults(handler=cmd_add)
+
+    today_parser = subparsers.add_parser("today", help="查看今天的饮水量")
+    today_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    today_parser.set_defaults(handler=cmd_today)
+
+    stats_parser = subparsers.add_parser("stats", help="最近几天的饮水统计")
+    stats_parser.add_argument("--days", type=int, default=7, help="统计天数（默认7）")
+    stats_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    export_parser = subparsers.add_parser("export", help="导出全部饮水记录")
+    export_parser.add_argument("--format", choices=["csv", "json"], default="csv", help="导出格式（默认csv）")
+    export_parser.add_argument("-o", "--output", help="输出文件（默认输出到屏幕）")
+    export_parser.set_defaults(handler=cmd_export)
+
+    compact_parser = subparsers.add_parser("compact", help="整理数据文件")
+    compact_parser.add_argument("--keep-days", type=int, help="只保留最近几天的记录")
+    compact_parser.set_defaults(handler=cmd_compact)
+
+    sync_parser = subparsers.add_parser("sync", help="与同步服务器交换增量变更")
+    sync_parser.add_argument("server", help="同步服务器地址，例如 http://127.0.0.1:8766")
+    sync_parser.set_defaults(handler=cmd_sync)
+
+    achievements_parser = subparsers.add_parser("achievements", help="查看成就进度")
+    achievements_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    achievements_parser.set_defaults(handler=cmd_achievements)
+
+    verify_parser = subparsers.add_parser("verify", help="校验数据文件和日志")
+    verify_parser.add_argument("--repair", action="store_true", help="修复损坏的部分并重新写入数据文件")
+    verify_parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    verify_parser.set_defaults(handler=cmd_verify)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except CommandError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
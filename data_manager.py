@@ -1,37 +1,168 @@
 import os
 import json
 import time
+import uuid
+from bisect import bisect_right
+from collections import Counter
 from datetime import datetime, date, timedelta
 from pathlib import Path
 
-class DataManager:
+from predictor import IntakePredictor
+from achievements import AchievementEngine, ACHIEVEMENT_FILE_NAME
+from integrity import (segment_of, segment_days, segment_content, segment_checksums, checksum,
+                       valid_amount, valid_day, valid_record, seal_entry, open_entry, MAX_RECORD_AMOUNT)
+
+# 没有足够历史记录时使用的快捷饮水量
+DEFAULT_QUICK_AMOUNTS = [100, 200, 300, 500]
+
+# 追加日志中的条目达到这个数量时，把全部数据写回主文件（检查点）并清空日志
+JOURNAL_CHECKPOINT_ENTRIES = 500
+
+# 明细记录保留的天数：更早的日期由后台维护清理，只保留每天的总量和目标
+DETAIL_RETENTION_DAYS = 365
+
+# 后台维护每一步处理的日期（或条目）数量，每一步都很短，调用方可以在两步之间处理界面事件
+MAINTENANCE_BATCH = 20
+LOCAL_CHANGES_BATCH = 2000
+
+# 后台维护的各项任务（maintenance_steps产生的任务名称 -> 显示名称）
+MAINTENANCE_JOBS = {
+    "rollup": "生成月度汇总",
+    "prune": "清理旧的明细记录",
+    "purge": "删除过期记录",
+    "vacuum": "整理数据",
+    "checkpoint": "写回数据文件",
+}
+
+
+class Signal:
+    """不依赖Qt的简单信号：connect(回调) 订阅，emit(参数...) 依次调用所有回调"""
     def __init__(self):
-        """初始化数据管理器"""
+        self._slots = []
+    
+    def connect(self, slot):
+        if slot not in self._slots:
+            self._slots.append(slot)
+    
+    def disconnect(self, slot):
+        if slot in self._slots:
+            self._slots.remove(slot)
+    
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class DataManager:
+    def __init__(self, read_only=False):
+        """初始化数据管理器
+        
+        read_only为True时只读取数据（命令行工具的查询命令使用）：不创建目录，不写回迁移后的数据、
+        目标快照和成就进度，之后的保存也都会跳过，不会与正在运行的界面实例同时写文件。
+        """
+        self.read_only = read_only
+        # 变更通知：界面订阅后只在相关数据变化时重新计算
+        self.records_added = Signal()    # (日期, 新增的记录列表)
+        self.records_removed = Signal()  # (日期, 删除的记录列表)
+        self.day_reset = Signal()        # (日期)
+        self.goal_changed = Signal()     # (新的目标)
+        self.day_rolled_over = Signal()  # (新的日期)
+        self.achievement_unlocked = Signal()  # (成就规则)
+        
         self.data_dir = os.path.join(os.path.expanduser("~"), ".water_bottle")
         self.data_file = os.path.join(self.data_dir, "water_data.json")
         self.backup_file = os.path.join(self.data_dir, "water_data_backup.json")
+        # 追加日志：新增记录和同步带来的变更只追加到这里，不重写整个数据文件
+        self.journal_file = os.path.join(self.data_dir, "water_journal.jsonl")
+        self.journal_entries = 0
+        # 每次同步写入数据文件时加一，后台写好的检查点只在期间没有其他保存时才替换数据文件
+        self.save_generation = 0
+        # 正在进行的后台检查点的令牌（见begin_checkpoint），进行中时不清理残留的临时文件
+        self._checkpoint_token = None
         
         # 确保数据目录存在
-        if not os.path.exists(self.data_dir):
+        if not read_only and not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
         
-        # 加载数据或创建空数据结构
+        # 加载数据或创建空数据结构；加载时发现并修复的问题记在integrity_issues中
+        self.integrity_issues = []
         self.data = self.load_data()
+        self.data.setdefault("records", {})
+        self._check_segments()
+        
+        # 同步信息：本机标识、下一个变更序号、删除标记和目标的修改时间
+        self.sync_info = self.data.setdefault("sync", {})
+        new_device = "device_id" not in self.sync_info
+        self.device_id = self.sync_info.setdefault("device_id", uuid.uuid4().hex[:12])
+        self.sync_info.setdefault("next_seq", 1)
+        self.sync_info.setdefault("tombstones", {})
+        # 新数据或旧版本数据需要立即写回，保存本机标识
+        migrated = self._assign_record_ids() or new_device
+        
+        # 汇总数据：加载时统计一次，之后随记录增删增量维护
+        self.amount_counts = Counter()  # 饮水量 -> 次数
+        self.daily_totals = {}          # 日期 -> 当日饮水总量
+        self.hourly_totals = {}         # 日期 -> 每小时饮水量（24个数）
+        self.record_days = {}           # 记录id -> 日期
+        self.local_changes = []         # 本机产生的变更 (序号, 类型, key)，按序号排列，用于同步推送
+        # 最近一条记录 (日期, 时间)：添加时更新；删除了这条记录或清理了那一天时标记为过期，用到时再查找
+        self._last_record = None
+        self._last_record_stale = True
+        # 日期 -> 当天实际使用的目标快照 {"goal", "mode", "user_info"}，
+        # 修改设置只影响今天，以前各天的统计不会随之变化
+        self.day_goals = self.data.setdefault("day_goals", {})
+        for day, records in self.data["records"].items():
+            for record in records:
+                self._count_record(day, record)
+                self.record_days[record["id"]] = day
+                if self._is_local_id(record["id"]):
+                    self.local_changes.append((record["seq"], "add", record["id"]))
+        for record_id, tombstone in self.sync_info["tombstones"].items():
+            if tombstone["origin"] == self.device_id:
+                self.local_changes.append((tombstone["seq"], "delete", record_id))
+        goal_stamp = self.sync_info.get("goal_stamp")
+        if goal_stamp and goal_stamp[1] == self.device_id:
+            self.local_changes.append((self.sync_info["goal_seq"], "goal", None))
+        
+        # 重放上次检查点之后追加的日志
+        self._replay_journal()
+        self.local_changes.sort()
+        
+        # 已清理明细的日期只保留每天的总量（见maintenance_steps）
+        for day, total in self.data.get("pruned_totals", {}).items():
+            self.daily_totals.setdefault(day, total)
+        
+        # 旧版本数据没有目标快照：按当前目标补上一次，之后不再变化
+        for day in self.data["records"]:
+            if day not in self.day_goals:
+                self._stamp_day_goal(day)
+                migrated = True
+        
+        # 饮水节奏预测模型（基于每小时汇总数据）
+        self.intake_model = IntakePredictor()
+        self.intake_model.load(self.hourly_totals)
+        
+        # 成就进度随新记录增量更新；第一次使用时从已有记录重建
+        self.achievements = AchievementEngine(os.path.join(self.data_dir, ACHIEVEMENT_FILE_NAME))
+        if not self.achievements.loaded:
+            self.achievements.rebuild(self.data["records"], self.get_day_goal)
+            self._save_achievements()
+        
+        if migrated:
+            self.save_data()
     
     def load_data(self):
         """加载饮水数据，如果不存在则创建新数据结构"""
         if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                # 如果数据文件损坏，尝试加载备份
-                if os.path.exists(self.backup_file):
-                    try:
-                        with open(self.backup_file, 'r', encoding='utf-8') as f:
-                            return json.load(f)
-                    except:
-                        pass
+            data = self._read_json(self.data_file)
+            if data is not None:
+                return data
+            # 如果数据文件损坏，尝试加载备份（之后重放的日志会补上最近一次检查点之后的变更）
+            data = self._read_json(self.backup_file)
+            if data is not None:
+                self.integrity_issues.append("数据文件无法读取，已从备份恢复")
+                return data
+            self.integrity_issues.append("数据文件和备份都无法读取")
         
         # 创建新的数据结构
         return {
@@ -44,12 +175,37 @@ class DataManager:
             "records": {}
         }
     
+    @staticmethod
+    def _read_json(path):
+        """读取JSON文件，不存在或无法解析时返回None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"读取 {path} 时出错: {str(e)}")
+            return None
+        return data if isinstance(data, dict) else None
+    
     def save_data(self):
-        """保存饮水数据到JSON文件"""
+        """保存饮水数据到JSON文件（检查点），之后清空追加日志；只读方式打开时不保存"""
+        if self.read_only:
+            return
         try:
-            # 保存当前数据
-            with open(self.data_file, 'w', encoding='utf-8') as f:
+            # 每个月份一个校验值，损坏时只需恢复所在的月份
+            self.data["checksums"] = segment_checksums(self.data)
+            # 保存当前数据：先写临时文件再替换，其他进程（命令行工具）不会读到写了一半的文件
+            temp_file = self.data_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.data_file)
+            self.save_generation += 1
+            
+            # 主文件已包含日志中的全部变更（即使在这里中断，重放日志也不会重复添加）
+            if self.journal_entries:
+                open(self.journal_file, 'w').close()
+                self.journal_entries = 0
             
             # 判断是否需要创建备份
             # 每天23:59或数据变更超过10次后创建备份
@@ -59,53 +215,152 @@ class DataManager:
             
             self.data["backup_info"][today] += 1
             if self.data["backup_info"][today] >= 10:
-                # 创建备份
-                with open(self.backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, ensure_ascii=False, indent=2)
-                self.data["backup_info"][today] = 0
+                self.create_backup()
         except Exception as e:
             print(f"保存数据时出错: {str(e)}")
     
+    def create_backup(self):
+        """把当前数据写入备份文件（只读方式打开时不写）"""
+        if self.read_only:
+            return
+        today = date.today().strftime("%Y-%m-%d")
+        self.data.setdefault("backup_info", {})[today] = 0
+        self.data["checksums"] = segment_checksums(self.data)
+        temp_file = self.backup_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.backup_file)
+    
+    def roll_over_day(self):
+        """日期变化时更新缓存的当天状态（汇总数据按日期存放，无需重新加载），返回新一天的饮水量"""
+        today = date.today().strftime("%Y-%m-%d")
+        self.intake_model.roll_to(today)
+        if today not in self.day_goals:
+            self._append_journal([self._stamp_day_goal(today)])
+        self.achievements.on_day_rollover(today)
+        self._save_achievements()
+        self.day_rolled_over.emit(today)
+        return self.daily_totals.get(today, 0)
+    
     def add_water_record(self, amount):
         """添加饮水记录"""
+        self.add_water_records([amount])
+    
+    def add_water_records(self, amounts):
+        """一次添加多条饮水记录（只追加一次日志），饮水量超出范围时抛出ValueError，不添加任何记录"""
+        if not all(valid_amount(amount) for amount in amounts):
+            raise ValueError(f"饮水量应在1到{MAX_RECORD_AMOUNT}毫升之间")
         today = date.today().strftime("%Y-%m-%d")
         now = datetime.now().strftime("%H:%M")
         
-        # 确保记录字典中有今天的记录列表
-        if "records" not in self.data:
-            self.data["records"] = {}
-        
-        if today not in self.data["records"]:
-            self.data["records"][today] = []
-        
         # 添加记录
-        self.data["records"][today].append({
-            "time": now,
-            "amount": amount
-        })
+        entries = []
+        records = []
+        for amount in amounts:
+            seq = self._next_seq()
+            record = {
+                "time": now,
+                "amount": amount,
+                "id": f"{self.device_id}-{seq}",
+                "seq": seq
+            }
+            self._apply_add(today, record)
+            self.local_changes.append((seq, "add", record["id"]))
+            self.intake_model.observe(today, self._record_hour(record), amount)
+            entries.append({"op": "add", "day": today, "record": record})
+            records.append(record)
+        if today not in self.day_goals:
+            entries.append(self._stamp_day_goal(today))
         
         # 保存数据
-        self.save_data()
+        self._append_journal(entries)
+        self._update_achievements(today, records)
+        self.records_added.emit(today, records)
     
     def get_today_total(self):
         """获取今天的总饮水量"""
         today = date.today().strftime("%Y-%m-%d")
-        total = 0
-        
-        if today in self.data.get("records", {}):
-            for record in self.data["records"][today]:
-                total += record["amount"]
-        
-        return total
+        return self.daily_totals.get(today, 0)
+    
+    def get_hourly_totals(self, day=None):
+        """获取某天（默认今天）每小时的饮水量列表"""
+        day = day or date.today().strftime("%Y-%m-%d")
+        return list(self.hourly_totals.get(day, [0] * 24))
+
+    def get_daily_totals(self, first_day, last_day):
+        """获取日期范围内（date，含两端）每天的饮水量列表，只读取内存中的汇总数据"""
+        totals = []
+        day = first_day
+        while day <= last_day:
+            totals.append(self.daily_totals.get(day.strftime("%Y-%m-%d"), 0))
+            day += timedelta(days=1)
+        return totals
+    
+    def get_daily_goals(self, first_day, last_day):
+        """获取日期范围内（date，含两端）每天实际使用的目标列表"""
+        goals = []
+        day = first_day
+        while day <= last_day:
+            goals.append(self.get_day_goal(day.strftime("%Y-%m-%d")))
+            day += timedelta(days=1)
+        return goals
+
+    def get_last_record_time(self):
+        """获取最近一次饮水记录的时间（datetime），没有记录时返回None"""
+        if self._last_record_stale:
+            self._last_record = None
+            records = self.data.get("records", {})
+            for day in sorted(records, reverse=True):
+                if records[day]:
+                    self._last_record = (day, max(record["time"] for record in records[day]))
+                    break
+            self._last_record_stale = False
+        if self._last_record is None:
+            return None
+        return datetime.strptime(" ".join(self._last_record), "%Y-%m-%d %H:%M")
     
     def get_daily_goal(self):
         """获取每日饮水目标"""
         return self.data.get("daily_goal", 1700)
     
-    def set_daily_goal(self, goal):
-        """设置每日饮水目标"""
-        self.data["daily_goal"] = goal
+    def get_day_goal(self, day):
+        """某天实际使用的目标（没有快照的日期使用当前目标）"""
+        snapshot = self.day_goals.get(day)
+        return snapshot["goal"] if snapshot else self.get_daily_goal()
+    
+    def get_day_goal_info(self, day):
+        """某天的目标快照 {"goal", "mode", "user_info"}，没有时返回None"""
+        return self.day_goals.get(day)
+    
+    def set_daily_goal(self, goal, mode=None):
+        """设置每日饮水目标；mode为产生这个目标的目标模式（standard、formula或custom）"""
+        self.update_settings(goal=goal, mode=mode)
+    
+    def update_settings(self, user_info=None, goal=None, mode=None):
+        """一次更新用户信息、每日目标和目标模式（None表示不变）
+        
+        今天的目标快照只记一次，数据文件也只保存一次；什么都没有变化时不写文件。
+        """
+        goal_changed = goal is not None and goal != self.get_daily_goal()
+        info_changed = user_info is not None and user_info != self.get_user_info()
+        mode_changed = bool(mode) and mode != self.data.get("goal_mode", "standard")
+        if not (goal_changed or info_changed or mode_changed):
+            return
+        if goal_changed:
+            # 记录修改时间，同步时以最后一次修改为准
+            seq = self._next_seq()
+            self.sync_info["goal_stamp"] = [time.time(), self.device_id]
+            self.sync_info["goal_seq"] = seq
+            self.local_changes.append((seq, "goal", None))
+            self.data["daily_goal"] = goal
+        if info_changed:
+            self.data["user_info"] = dict(user_info)
+        if mode_changed:
+            self.data["goal_mode"] = mode
+        self._stamp_day_goal(date.today().strftime("%Y-%m-%d"))
         self.save_data()
+        if goal_changed:
+            self.goal_changed.emit(goal)
     
     def get_user_info(self):
         """获取用户信息"""
@@ -117,8 +372,7 @@ class DataManager:
     
     def set_user_info(self, user_info):
         """设置用户信息"""
-        self.data["user_info"] = user_info
-        self.save_data()
+        self.update_settings(user_info=user_info)
     
     def get_weekly_stats(self):
         """获取最近一周的饮水统计"""
@@ -128,16 +382,10 @@ class DataManager:
         # 获取过去7天的数据
         for i in range(6, -1, -1):
             day = (today - timedelta(days=i)).strftime("%Y-%m-%d")
-            total = 0
-            
-            if day in self.data.get("records", {}):
-                for record in self.data["records"][day]:
-                    total += record["amount"]
-            
             stats.append({
                 "date": day,
-                "total": total,
-                "goal": self.data.get("daily_goal", 1700)
+                "total": self.daily_totals.get(day, 0),
+                "goal": self.get_day_goal(day)
             })
         
         return stats
@@ -145,21 +393,696 @@ class DataManager:
     def reset_today_records(self):
         """重置今天的饮水记录（仅用于测试）"""
         today = date.today().strftime("%Y-%m-%d")
-        if "records" in self.data and today in self.data["records"]:
-            self.data["records"][today] = []
+        entries = []
+        for record in list(self.data["records"].get(today, [])):
+            # 留下删除标记，同步到其他设备
+            seq = self._next_seq()
+            self._apply_delete(today, record["id"], seq, self.device_id)
+            self.local_changes.append((seq, "delete", record["id"]))
+            entries.append({"op": "delete", "day": today, "id": record["id"],
+                            "seq": seq, "origin": self.device_id})
+        if entries:
+            self.intake_model.reset_today()
+            self._append_journal(entries)
+            self.day_reset.emit(today)
+    
+    def compact(self, keep_days=None):
+        """同步执行全部维护任务，写回主文件并创建一次备份；指定keep_days时同时删除更早的记录
+        
+        没有界面时（命令行工具）使用；界面中由MaintenanceWorker在空闲时分段执行同样的任务。
+        """
+        for _ in self.maintenance_steps(keep_days):
+            pass
+        self.save_data()
+        try:
+            self.create_backup()
+        except Exception as e:
+            print(f"创建备份时出错: {str(e)}")
+    
+    def maintenance_steps(self, purge_days=None):
+        """维护任务的生成器：每一步只做少量工作，之后产生 (任务名称, 已完成, 总数)
+        
+        依次执行：
+        - rollup：为已经结束的月份生成一次月度汇总（之后不再重新计算，除非这个月的记录又有变化）
+        - prune：超过DETAIL_RETENTION_DAYS天的日期清理明细记录，只保留当天的总量和目标
+          （目标快照去掉用户信息），以及这些日期的删除标记
+        - purge：指定purge_days时，更早的日期连同总量一起删除
+        - vacuum：删除空的日期、以前各天的备份计数、失效的本机变更，以及本类自己留下的临时文件
+          （没有后台检查点正在写入时）
+        
+        每一步之后数据都是一致的，调用方可以在任意两步之间处理新记录和绘制；
+        全部完成后由调用方写回数据文件（compact或MaintenanceWorker）。
+        """
+        today = date.today()
+        
+        # 月度汇总
+        this_month = today.strftime("%Y-%m")
+        rollups = self.data.setdefault("rollups", {})
+        months = {}
+        for day in self.daily_totals:
+            month = segment_of(day)
+            if month < this_month and month not in rollups:
+                months.setdefault(month, []).append(day)
+        for index, month in enumerate(sorted(months)):
+            rollups[month] = self._month_rollup(months[month])
+            yield "rollup", index + 1, len(months)
+        
+        # 清理明细记录
+        cutoff = (today - timedelta(days=DETAIL_RETENTION_DAYS)).strftime("%Y-%m-%d")
+        yield from self._drop_days_before(cutoff, "prune", keep_total=True)
+        
+        # 删除过期记录
+        if purge_days is not None:
+            cutoff = (today - timedelta(days=purge_days)).strftime("%Y-%m-%d")
+            yield from self._drop_days_before(cutoff, "purge", keep_total=False)
+        
+        # 整理：失效的本机变更分批过滤，期间新产生的变更接在后面
+        records = self.data["records"]
+        for day in [day for day, day_records in records.items() if not day_records]:
+            del records[day]
+        self._prune_backup_info()
+        if self._checkpoint_token is None and not self.read_only:
+            self._remove_leftovers()
+        total = len(self.local_changes)
+        kept = []
+        for start in range(0, total, LOCAL_CHANGES_BATCH):
+            kept += [change for change in self.local_changes[start:start + LOCAL_CHANGES_BATCH]
+                     if self._describe_change(*change) is not None]
+            yield "vacuum", min(start + LOCAL_CHANGES_BATCH, total), total
+        self.local_changes = kept + self.local_changes[total:]
+        if not total:
+            yield "vacuum", 1, 1
+    
+    def _drop_days_before(self, cutoff, job, keep_total):
+        """分批清理cutoff之前的日期，产生进度（maintenance_steps的一部分）"""
+        self._raise_pruned_before(cutoff)
+        if keep_total:
+            # 已经清理过的日期只剩总量和精简的目标快照，不再重复处理
+            days = set(self.data["records"]) | {day for day, snapshot in self.day_goals.items()
+                                                if "user_info" in snapshot}
+        else:
+            days = self._stored_days()
+        days = sorted(day for day in days if day < cutoff)
+        removed = {}
+        for start in range(0, len(days), MAINTENANCE_BATCH):
+            for day in days[start:start + MAINTENANCE_BATCH]:
+                records = self._drop_day(day, keep_total)
+                if records:
+                    removed[day] = records
+            yield job, min(start + MAINTENANCE_BATCH, len(days)), len(days)
+        
+        tombstones = self.sync_info["tombstones"]
+        for record_id in [record_id for record_id, tombstone in tombstones.items() if tombstone["day"] < cutoff]:
+            del tombstones[record_id]
+        if days:
+            self.intake_model.load(self.hourly_totals)
+        for day, records in removed.items():
+            if not keep_total:
+                self.records_removed.emit(day, records)
+    
+    def _stored_days(self):
+        """有明细记录、目标快照或保留了总量的日期（删除过期记录时使用）"""
+        return set(self.data["records"]) | set(self.day_goals) | set(self.data.get("pruned_totals", {}))
+    
+    def _drop_day(self, day, keep_total):
+        """清理某一天的明细记录，返回被清理的记录
+        
+        keep_total为True时保留当天的总量和精简后的目标快照，否则连同总量和目标一起删除。
+        """
+        records = self.data["records"].get(day, [])
+        total = self.daily_totals.get(day, 0)
+        self._forget_day(day)
+        for record in records:
+            self.record_days.pop(record["id"], None)
+        self.data["records"].pop(day, None)
+        pruned_totals = self.data.setdefault("pruned_totals", {})
+        if keep_total:
+            if total:
+                pruned_totals[day] = total
+                self.daily_totals[day] = total
+            snapshot = self.day_goals.get(day)
+            if snapshot and "user_info" in snapshot:
+                self.day_goals[day] = {"goal": snapshot["goal"], "mode": snapshot["mode"]}
+        else:
+            pruned_totals.pop(day, None)
+            self.day_goals.pop(day, None)
+            self.data.get("rollups", {}).pop(segment_of(day), None)
+        return records
+    
+    def _raise_pruned_before(self, cutoff):
+        """记下已清理到的日期，之后同步或重放日志带来的更早的记录直接忽略"""
+        if cutoff > self.data.get("pruned_before", ""):
+            self.data["pruned_before"] = cutoff
+    
+    def _month_rollup(self, days):
+        """一个月的汇总：总量、有饮水的天数和达标天数"""
+        totals = {day: self.daily_totals[day] for day in days if self.daily_totals[day] > 0}
+        return {
+            "total": sum(totals.values()),
+            "days": len(totals),
+            "goal_days": sum(1 for day, total in totals.items() if total >= self.get_day_goal(day)),
+        }
+    
+    def get_month_rollup(self, month):
+        """已经结束的月份（YYYY-MM）的汇总，后台维护还没有生成时返回None"""
+        return self.data.get("rollups", {}).get(month)
+    
+    def begin_checkpoint(self):
+        """开始一次不阻塞界面的检查点（在主线程中调用），返回 (令牌, 数据快照)
+        
+        快照只复制各层字典和列表（记录本身不会被修改，可以共享），很快；
+        之后在其他线程中调用write_checkpoint序列化并写入临时文件，
+        写完后回到主线程调用finish_checkpoint替换数据文件。同时写入备份。
+        """
+        self.data.setdefault("backup_info", {})[date.today().strftime("%Y-%m-%d")] = 0
+        snapshot = dict(self.data)
+        snapshot["records"] = {day: list(records) for day, records in self.data["records"].items()}
+        snapshot["sync"] = dict(self.sync_info, tombstones=dict(self.sync_info["tombstones"]))
+        for key in ("day_goals", "backup_info", "rollups", "pruned_totals"):
+            if key in self.data:
+                snapshot[key] = dict(self.data[key])
+        journal_size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        self._checkpoint_token = (self.save_generation, journal_size, self.journal_entries)
+        return self._checkpoint_token, snapshot
+    
+    def write_checkpoint(self, snapshot):
+        """序列化快照并写入数据文件和备份的临时文件（可以在其他线程中调用，不访问其他状态）"""
+        snapshot["checksums"] = segment_checksums(snapshot)
+        text = json.dumps(snapshot, ensure_ascii=False, indent=2)
+        for path in (self.data_file, self.backup_file):
+            with open(path + ".checkpoint", 'w', encoding='utf-8') as f:
+                f.write(text)
+    
+    def finish_checkpoint(self, token):
+        """在主线程中完成检查点：用写好的临时文件替换数据文件和备份，并从日志中去掉快照已包含的部分
+        
+        期间有过同步保存时（数据文件已经更新）只替换备份，丢弃数据文件的临时文件，返回False。
+        """
+        generation, journal_size, journal_entries = token
+        if token == self._checkpoint_token:
+            self._checkpoint_token = None
+        # 快照本身是完整一致的，即使期间有过保存也比上一次的备份新，备份总是替换
+        os.replace(self.backup_file + ".checkpoint", self.backup_file)
+        if generation != self.save_generation:
+            os.remove(self.data_file + ".checkpoint")
+            return False
+        os.replace(self.data_file + ".checkpoint", self.data_file)
+        self.save_generation += 1
+        
+        # 快照之后追加的日志保留下来（即使在这里中断，重放日志也不会重复添加）
+        if journal_size:
+            with open(self.journal_file, 'rb') as f:
+                f.seek(journal_size)
+                tail = f.read()
+            temp_file = self.journal_file + ".tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(tail)
+            os.replace(temp_file, self.journal_file)
+            self.journal_entries = max(0, self.journal_entries - journal_entries)
+        return True
+    
+    def cancel_checkpoint(self, token):
+        """后台写入失败时放弃检查点（在主线程中调用），删除写了一半的临时文件"""
+        if token == self._checkpoint_token:
+            self._checkpoint_token = None
+        for path in (self.data_file, self.backup_file):
+            try:
+                os.remove(path + ".checkpoint")
+            except OSError:
+                pass
+    
+    def _remove_leftovers(self):
+        """删除以前中断的保存留下的临时文件（只删除本类自己写的文件）"""
+        paths = [path + ".tmp" for path in (self.data_file, self.backup_file, self.journal_file)]
+        paths += [path + ".checkpoint" for path in (self.data_file, self.backup_file)]
+        if self.achievements.path:
+            paths.append(self.achievements.path + ".tmp")
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除临时文件 {path} 时出错: {str(e)}")
+    
+    def _prune_backup_info(self):
+        """清理以前各天的备份计数"""
+        today = date.today().strftime("%Y-%m-%d")
+        backup_info = self.data.setdefault("backup_info", {})
+        for day in [day for day in backup_info if day < today]:
+            del backup_info[day]
+    
+    def get_local_changes(self, since_seq, limit):
+        """本机产生的、序号大于since_seq的变更（用于同步推送），最多limit条"""
+        changes = []
+        start = bisect_right(self.local_changes, (since_seq, "\uffff"))
+        for seq, kind, key in self.local_changes[start:]:
+            change = self._describe_change(seq, kind, key)
+            if change is not None:
+                changes.append(change)
+                if len(changes) >= limit:
+                    break
+        return changes
+    
+    def _describe_change(self, seq, kind, key):
+        """把本机变更转换为同步数据，已被后续变更取代的返回None"""
+        if kind == "add":
+            day = self.record_days.get(key)
+            if day is None:
+                return None  # 已删除或已清理，删除标记会单独同步
+            record = self._find_record(day, key)
+            return {"kind": "add", "seq": seq, "origin": self.device_id, "id": key, "day": day,
+                    "time": record["time"], "amount": record["amount"]}
+        if kind == "delete":
+            tombstone = self.sync_info["tombstones"].get(key)
+            if tombstone is None:
+                return None  # 已随旧记录一起清理
+            return {"kind": "delete", "seq": seq, "origin": self.device_id, "id": key, "day": tombstone["day"]}
+        if kind == "goal" and self.sync_info.get("goal_seq") == seq:
+            return {"kind": "goal", "seq": seq, "origin": self.device_id,
+                    "value": self.get_daily_goal(), "stamp": self.sync_info["goal_stamp"]}
+        return None
+    
+    def apply_remote_changes(self, changes):
+        """应用从其他设备同步来的变更（只追加日志），返回实际生效的数量
+        
+        冲突处理是确定的，与变更到达的顺序无关：
+        - 记录按id只添加一次；删除标记优先，删除过的记录不会再出现
+        - 每日目标以修改时间（相同时比较设备标识）较大的为准
+        
+        格式不完整或数值不合理的变更先全部筛掉再应用，不会应用到一半时出错；生效的变更一次追加到日志。
+        """
+        changes = [change for change in changes if self._valid_change(change)]
+        entries = []
+        added = {}    # 日期 -> 新增的记录
+        removed = {}  # 日期 -> 删除的记录
+        goal_changed = False
+        for change in changes:
+            kind = change.get("kind")
+            if kind == "add":
+                record = {"time": change["time"], "amount": change["amount"],
+                          "id": change["id"], "seq": self._next_seq()}
+                if self._apply_add(change["day"], record):
+                    entries.append({"op": "add", "day": change["day"], "record": record})
+                    added.setdefault(change["day"], []).append(record)
+            elif kind == "delete":
+                seq = self._next_seq()
+                record = self._find_record(change["day"], change["id"])
+                if self._apply_delete(change["day"], change["id"], seq, change["origin"]):
+                    entries.append({"op": "delete", "day": change["day"], "id": change["id"],
+                                    "seq": seq, "origin": change["origin"]})
+                    if record is not None:
+                        removed.setdefault(change["day"], []).append(record)
+            elif kind == "goal":
+                seq = self._next_seq()
+                if self._apply_goal(change["value"], change["stamp"], seq):
+                    entries.append({"op": "goal", "value": change["value"],
+                                    "stamp": change["stamp"], "seq": seq})
+                    goal_changed = True
+        # 同步来的目标从今天起生效；其他设备上的日期第一次出现时记下当时的目标
+        if goal_changed:
+            entries.append(self._stamp_day_goal(date.today().strftime("%Y-%m-%d"), "sync"))
+        for day in added:
+            if day not in self.day_goals:
+                entries.append(self._stamp_day_goal(day))
+        if entries:
+            # 只把增减的记录计入预测模型，不重新加载全部汇总数据；明天以后的记录（其他设备时钟偏快）不计入
+            today = date.today().strftime("%Y-%m-%d")
+            self.intake_model.roll_to(today)
+            for records_by_day, sign in ((added, 1), (removed, -1)):
+                for day, records in records_by_day.items():
+                    if day <= today:
+                        for record in records:
+                            self.intake_model.observe(day, self._record_hour(record), sign * record["amount"])
+            self._append_journal(entries)
+        
+        for day in sorted(added):
+            self._update_achievements(day, added[day])
+        for day, records in added.items():
+            self.records_added.emit(day, records)
+        for day, records in removed.items():
+            self.records_removed.emit(day, records)
+        if goal_changed:
+            self.goal_changed.emit(self.get_daily_goal())
+        return len(entries)
+    
+    @staticmethod
+    def _valid_change(change):
+        """同步来的变更是否完整合理；格式或数值不合理的记录不接受，否则下次加载时会被当作损坏的数据"""
+        if not isinstance(change, dict):
+            return False
+        kind = change.get("kind")
+        if kind == "add":
+            return valid_day(change.get("day")) and valid_record(
+                {"time": change.get("time"), "amount": change.get("amount"), "id": change.get("id")})
+        if kind == "delete":
+            return (valid_day(change.get("day")) and isinstance(change.get("id"), str)
+                    and isinstance(change.get("origin"), str))
+        if kind == "goal":
+            stamp = change.get("stamp")
+            return (type(change.get("value")) is int and change["value"] > 0
+                    and isinstance(stamp, (list, tuple)) and len(stamp) == 2
+                    and type(stamp[0]) in (int, float) and isinstance(stamp[1], str))
+        return False
+    
+    def _update_achievements(self, day, records):
+        """按新记录更新成就进度（只评估这几条记录），并通知新解锁的成就"""
+        goal = self.get_day_goal(day)
+        day_total = self.daily_totals.get(day, 0) - sum(record["amount"] for record in records)
+        unlocked = []
+        for record in records:
+            day_total += record["amount"]
+            unlocked += self.achievements.on_record(day, self._record_hour(record), record["amount"],
+                                                    day_total, goal)
+        self._save_achievements()
+        for rule in unlocked:
+            self.achievement_unlocked.emit(rule)
+    
+    def _save_achievements(self):
+        """保存成就进度（只读方式打开时跳过）"""
+        if not self.read_only:
+            self.achievements.save()
+    
+    def _stamp_day_goal(self, day, mode=None):
+        """记下某天实际使用的目标，以及产生它的目标模式和用户信息，返回对应的日志条目"""
+        snapshot = {
+            "goal": self.get_daily_goal(),
+            "mode": mode or self.data.get("goal_mode", "standard"),
+            "user_info": dict(self.get_user_info()),
+        }
+        self.day_goals[day] = snapshot
+        return {"op": "day_goal", "day": day, "snapshot": snapshot}
+    
+    def _find_record(self, day, record_id):
+        """按id查找某天的记录，不存在时返回None"""
+        if self.record_days.get(record_id) != day:
+            return None
+        return next(record for record in self.data["records"][day] if record["id"] == record_id)
+    
+    def _next_seq(self):
+        """分配下一个本机变更序号（单调递增）"""
+        seq = self.sync_info["next_seq"]
+        self.sync_info["next_seq"] = seq + 1
+        return seq
+    
+    def _is_local_id(self, record_id):
+        """记录是否由本机创建（旧版本数据迁移来的记录也算本机的）"""
+        return record_id.startswith(self.device_id + "-") or record_id.startswith("legacy-")
+    
+    def _assign_record_ids(self):
+        """为旧版本数据中的记录分配id和序号，有修改时返回True
+        
+        id由日期、时间、饮水量和出现次数决定，同一份旧数据复制到两台电脑上得到的id相同，同步时不会重复。
+        """
+        migrated = False
+        for day in sorted(self.data["records"]):
+            occurrences = Counter()
+            for record in self.data["records"][day]:
+                if "id" in record:
+                    continue
+                key = (record["time"], record["amount"])
+                occurrences[key] += 1
+                record["id"] = f"legacy-{day}-{record['time']}-{record['amount']}-{occurrences[key]}"
+                record["seq"] = self._next_seq()
+                migrated = True
+        return migrated
+    
+    def _apply_add(self, day, record):
+        """添加一条记录（已存在或已删除时忽略），返回是否生效"""
+        record_id = record["id"]
+        if record_id in self.record_days or record_id in self.sync_info["tombstones"]:
+            return False
+        if day < self.data.get("pruned_before", ""):
+            return False  # 这一天的明细已经清理
+        self.data["records"].setdefault(day, []).append(record)
+        self.data.get("rollups", {}).pop(segment_of(day), None)
+        self.record_days[record_id] = day
+        self._count_record(day, record)
+        self._bump_next_seq(record["seq"])
+        if not self._last_record_stale and (self._last_record is None
+                                            or (day, record["time"]) > self._last_record):
+            self._last_record = (day, record["time"])
+        return True
+    
+    def _apply_delete(self, day, record_id, seq, origin):
+        """删除一条记录并留下删除标记（已有标记时忽略），返回是否生效"""
+        if record_id in self.sync_info["tombstones"]:
+            return False
+        self.sync_info["tombstones"][record_id] = {"day": day, "seq": seq, "origin": origin}
+        self._bump_next_seq(seq)
+        records = self.data["records"].get(day, [])
+        for index, record in enumerate(records):
+            if record["id"] == record_id:
+                del records[index]
+                self.record_days.pop(record_id, None)
+                self.data.get("rollups", {}).pop(segment_of(day), None)
+                self._forget_record(day, record)
+                if self._last_record == (day, record["time"]):
+                    self._last_record_stale = True
+                break
+        return True
+    
+    def _apply_goal(self, value, stamp, seq):
+        """修改时间更晚时采用同步来的目标，返回是否生效"""
+        current = self.sync_info.get("goal_stamp")
+        if current is not None and list(stamp) <= list(current):
+            return False
+        self.data["daily_goal"] = value
+        self.sync_info["goal_stamp"] = list(stamp)
+        self.sync_info["goal_seq"] = seq
+        self._bump_next_seq(seq)
+        return True
+    
+    def _bump_next_seq(self, seq):
+        """重放日志时保证之后分配的序号更大"""
+        if seq >= self.sync_info["next_seq"]:
+            self.sync_info["next_seq"] = seq + 1
+    
+    def _append_journal(self, entries):
+        """把变更追加到日志，条目过多时写一次检查点；只读方式打开时不写"""
+        if self.read_only:
+            return
+        try:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(seal_entry(entry))
+            self.journal_entries += len(entries)
+        except Exception as e:
+            print(f"写入日志时出错: {str(e)}")
+            self.save_data()
+            return
+        if self.journal_entries >= JOURNAL_CHECKPOINT_ENTRIES:
             self.save_data()
     
-    def cleanup_old_records(self, days=30):
-        """清理旧记录，默认保留最近30天的数据"""
-        if "records" not in self.data:
+    def _replay_journal(self):
+        """加载时重放追加日志（重复的条目会被忽略，写了一半或校验失败的行直接跳过）"""
+        if not os.path.exists(self.journal_file):
             return
+        damaged = 0
+        with open(self.journal_file, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                try:
+                    entry = open_entry(line)
+                except ValueError:
+                    damaged += 1
+                    continue
+                self.journal_entries += 1
+                op = entry.get("op")
+                if op == "add":
+                    record = entry["record"]
+                    if not valid_record(record):
+                        damaged += 1
+                        continue
+                    if self._apply_add(entry["day"], record) and self._is_local_id(record["id"]):
+                        self.local_changes.append((record["seq"], "add", record["id"]))
+                elif op == "delete":
+                    if self._apply_delete(entry["day"], entry["id"], entry["seq"], entry["origin"]) \
+                            and entry["origin"] == self.device_id:
+                        self.local_changes.append((entry["seq"], "delete", entry["id"]))
+                elif op == "goal":
+                    if self._apply_goal(entry["value"], entry["stamp"], entry["seq"]) \
+                            and entry["stamp"][1] == self.device_id:
+                        self.local_changes.append((entry["seq"], "goal", None))
+                elif op == "day_goal":
+                    self.day_goals[entry["day"]] = entry["snapshot"]
+        if damaged:
+            self.integrity_issues.append(f"日志中有 {damaged} 行损坏，已跳过")
+    
+    def _check_segments(self):
+        """加载时逐月核对校验值和记录格式
+
+        校验值不符的月份优先从备份中校验通过的同一月份恢复，备份也不可用时只保留格式正确的记录；
+        校验值相符（或旧数据没有校验值）但有格式错误的记录时，只丢弃这些记录。
+        其他月份不受影响。修复只发生在内存中，下一次保存时写回。
+        """
+        records = self.data["records"]
+        if not isinstance(records, dict):
+            records = self.data["records"] = {}
+            self.integrity_issues.append("记录数据格式错误，已清空")
+        stored = self.data.get("checksums", {})
+        segments = segment_days(self.data)
+        backup = None
+        
+        for segment in sorted(set(segments) | set(stored)):
+            days = segments.get(segment, [])
+            # 旧版本数据没有校验值，只检查记录格式
+            damaged = segment in stored and stored[segment] != checksum(segment_content(self.data, days))
+            invalid = any(not isinstance(records.get(day, []), list)
+                          or not all(valid_record(record) for record in records.get(day, []))
+                          for day in days)
+            if not damaged and not invalid:
+                continue
+            
+            # 只有校验值不符（内容被改坏）时才用备份替换整个月份；
+            # 校验值相符时其余记录是完好的，只丢弃格式错误的记录
+            if damaged:
+                if backup is None:
+                    backup = self._read_json(self.backup_file) or {}
+                if self._restore_segment(segment, days, backup):
+                    self.integrity_issues.append(f"{segment} 的数据校验失败，已从备份恢复")
+                    continue
             
-        cutoff_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-        records_to_keep = {}
+            kept = dropped = 0
+            for day in days:
+                day_records = records.get(day)
+                if day_records is None:
+                    continue
+                if not isinstance(day_records, list):
+                    day_records = []
+                    dropped += 1
+                valid = [record for record in day_records if valid_record(record)]
+                dropped += len(day_records) - len(valid)
+                kept += len(valid)
+                records[day] = valid
+            reason = "校验失败" if damaged else "有格式错误的记录"
+            self.integrity_issues.append(f"{segment} 的数据{reason}，保留了 {kept} 条有效记录，丢弃 {dropped} 条")
+    
+    def _restore_segment(self, segment, days, backup):
+        """用备份中校验通过的同一月份替换当前内容，返回是否成功"""
+        backup_days = segment_days(backup).get(segment, [])
+        content = segment_content(backup, backup_days)
+        if backup.get("checksums", {}).get(segment) != checksum(content):
+            return False
+        if not all(valid_record(record) for day_records in content["records"].values() for record in day_records):
+            return False
+        for day in days:
+            self.data["records"].pop(day, None)
+            self.data.get("day_goals", {}).pop(day, None)
+            self.data.get("pruned_totals", {}).pop(day, None)
+        self.data["records"].update(content["records"])
+        self.data.setdefault("day_goals", {}).update(content["day_goals"])
+        if content.get("pruned_totals"):
+            self.data.setdefault("pruned_totals", {}).update(content["pruned_totals"])
+        return True
+    
+    def verify_store(self, repair=False):
+        """逐段检查磁盘上的数据文件和追加日志，返回检查报告
         
-        for day, records in self.data["records"].items():
-            if day >= cutoff_date:
-                records_to_keep[day] = records
+        主文件每个月份单独核对校验值，日志逐行流式读取。repair为True时，
+        用内存中的数据（加载时已跳过损坏的部分并尽量从备份恢复）重建索引，
+        并重新写入数据文件、备份和空的日志。
+        """
+        report = {
+            "data_file": "ok",
+            "segments": 0,
+            "damaged_segments": [],
+            "invalid_records": 0,
+            "journal_lines": 0,
+            "damaged_lines": 0,
+            "repaired_on_load": list(self.integrity_issues),
+        }
+        data = self._read_json(self.data_file)
+        if data is None:
+            report["data_file"] = "missing" if not os.path.exists(self.data_file) else "damaged"
+        else:
+            stored = data.get("checksums", {})
+            segments = segment_days(data)
+            for segment in sorted(set(segments) | set(stored)):
+                report["segments"] += 1
+                content = segment_content(data, segments.get(segment, []))
+                if segment in stored and stored[segment] != checksum(content):
+                    report["damaged_segments"].append(segment)
+                for day_records in content["records"].values():
+                    if not isinstance(day_records, list):
+                        report["invalid_records"] += 1
+                        continue
+                    report["invalid_records"] += sum(1 for record in day_records if not valid_record(record))
+        
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    report["journal_lines"] += 1
+                    try:
+                        entry = open_entry(line)
+                        if entry.get("op") == "add" and not valid_record(entry["record"]):
+                            raise ValueError("记录格式错误")
+                    except (ValueError, KeyError):
+                        report["damaged_lines"] += 1
         
-        self.data["records"] = records_to_keep
-        self.save_data() 
\ No newline at end of file
+        report["healthy"] = (report["data_file"] != "damaged" and not report["damaged_segments"]
+                             and not report["invalid_records"] and not report["damaged_lines"]
+                             and not self.integrity_issues)
+        if repair:
+            self._rebuild_indexes()
+            self.save_data()
+            self.create_backup()
+            self.integrity_issues = []
+            report["repaired"] = True
+        return report
+    
+    def _rebuild_indexes(self):
+        """从记录重新统计汇总数据和记录索引"""
+        self.amount_counts = Counter()
+        self.daily_totals = {}
+        self.hourly_totals = {}
+        self.record_days = {}
+        for day, records in self.data["records"].items():
+            for record in records:
+                self._count_record(day, record)
+                self.record_days[record["id"]] = day
+        for day, total in self.data.get("pruned_totals", {}).items():
+            self.daily_totals.setdefault(day, total)
+        self._last_record_stale = True
+        self.intake_model.load(self.hourly_totals)
+    
+    @staticmethod
+    def _record_hour(record):
+        """记录所在的小时（0-23）"""
+        return int(record["time"].split(":")[0]) % 24
+    
+    def _count_record(self, day, record):
+        """把一条记录计入汇总数据"""
+        amount = record["amount"]
+        self.amount_counts[amount] += 1
+        self.daily_totals[day] = self.daily_totals.get(day, 0) + amount
+        self.hourly_totals.setdefault(day, [0] * 24)[self._record_hour(record)] += amount
+    
+    def _forget_record(self, day, record):
+        """从汇总数据中移除一条记录"""
+        amount = record["amount"]
+        self.amount_counts[amount] -= 1
+        if self.amount_counts[amount] <= 0:
+            del self.amount_counts[amount]
+        self.daily_totals[day] -= amount
+        self.hourly_totals[day][self._record_hour(record)] -= amount
+    
+    def _forget_day(self, day):
+        """从汇总数据中移除某一天的全部记录"""
+        for record in self.data["records"].get(day, []):
+            self.amount_counts[record["amount"]] -= 1
+            if self.amount_counts[record["amount"]] <= 0:
+                del self.amount_counts[record["amount"]]
+        self.daily_totals.pop(day, None)
+        self.hourly_totals.pop(day, None)
+        if self._last_record is not None and self._last_record[0] == day:
+            self._last_record_stale = True
+    
+    def get_frequent_amounts(self, count=4):
+        """获取最常用的饮水量（从小到大排列），历史不足时用默认值补齐"""
+        amounts = [amount for amount, _ in self.amount_counts.most_common(count)]
+        for amount in DEFAULT_QUICK_AMOUNTS:
+            if len(amounts) >= count:
+                break
+            if amount not in amounts:
+                amounts.append(amount)
+        return sorted(amounts)
@@ -0,0 +1,230 @@
+"""汇总多台电脑上的饮水数据（不导入PyQt）
+
+    python fleet_report.py 收集目录 -o 输出目录 [--workers 8] [--from 2024-01-01] [--to 2024-01-31]
+
+递归查找目录中的 water_data.json，在进程池中并行解析，输出：
+    fleet_daily.csv   每天：人数、总量、人均、P50/P90/P99、达标比例
+    fleet_hourly.csv  每个小时：总量、占比、每人每天平均、P50/P90（有饮水的人天）
+百分位数由固定宽度的直方图估算，内存只与天数有关，与文件数量无关。
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from integrity import open_entry
+
+DATA_FILE_NAME = "water_data.json"
+JOURNAL_FILE_NAME = "water_journal.jsonl"
+
+# 直方图桶宽（毫升）和上限，超出上限的值计入最后一个桶
+DAY_BUCKET_ML = 50
+DAY_MAX_ML = 10000
+HOUR_BUCKET_ML = 25
+HOUR_MAX_ML = 3000
+
+# 每个工作进程同时排队的文件数，限制未完成任务占用的内存
+TASKS_PER_WORKER = 4
+
+
+class Histogram:
+    """固定桶宽的直方图，用于估算百分位数"""
+    def __init__(self, bucket, maximum):
+        self.bucket = bucket
+        self.counts = [0] * (maximum // bucket + 1)
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        index = min(int(value // self.bucket), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, p):
+        """估算第p百分位数（桶内线性插值）"""
+        if not self.count:
+            return 0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                return round((index + (rank - seen) / count) * self.bucket)
+            seen += count
+        return len(self.counts) * self.bucket
+
+
+def find_data_files(root, name=DATA_FILE_NAME):
+    """逐个产生目录树中的数据文件路径"""
+    for directory, _, files in os.walk(root):
+        for file_name in files:
+            if file_name == name:
+                yield os.path.join(directory, file_name)
+
+
+def load_with_journal(path):
+    """读取数据文件，并应用同一目录中尚未写回的追加日志（见DataManager），跳过校验失败的行"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    journal_path = os.path.join(os.path.dirname(path), JOURNAL_FILE_NAME)
+    if not os.path.exists(journal_path):
+        return data
+
+    records = data.setdefault("records", {})
+    pruned_before = data.get("pruned_before", "")
+    known_ids = {record.get("id") for day_records in records.values() for record in day_records}
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = open_entry(line)
+            except ValueError:
+                continue
+            if entry.get("op") == "add" and entry["record"]["id"] not in known_ids \
+                    and entry["day"] >= pruned_before:
+                known_ids.add(entry["record"]["id"])
+                records.setdefault(entry["day"], []).append(entry["record"])
+            elif entry.get("op") == "delete":
+                day_records = records.get(entry["day"], [])
+                records[entry["day"]] = [record for record in day_records if record.get("id") != entry["id"]]
+            elif entry.get("op") == "goal":
+                data["daily_goal"] = entry["value"]
+            elif entry.get("op") == "day_goal":
+                data.setdefault("day_goals", {})[entry["day"]] = entry["snapshot"]
+    return data
+
+
+def summarize_file(path, first_day=None, last_day=None):
+    """在工作进程中解析一个数据文件，只返回汇总结果：{日期: (总量, 每小时24个数, 当天的目标)}
+
+    目标使用当天记下的目标快照（见DataManager），旧数据没有快照时使用文件中的当前目标。
+    已清理明细的日期（见DataManager.maintenance_steps）只有总量，每小时的数据为None。
+    """
+    data = load_with_journal(path)
+    current_goal = data.get("daily_goal", 1700)
+    day_goals = data.get("day_goals", {})
+
+    days = {}
+    for day, records in data.get("records", {}).items():
+        if not records or (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        hours = [0] * 24
+        for record in records:
+            hours[int(record["time"].split(":")[0]) % 24] += record["amount"]
+        days[day] = (sum(hours), hours, day_goals.get(day, {}).get("goal", current_goal))
+    for day, total in data.get("pruned_totals", {}).items():
+        if day not in days and not (first_day and day < first_day) and not (last_day and day > last_day):
+            days[day] = (total, None, day_goals.get(day, {}).get("goal", current_goal))
+    return days
+
+
+class FleetAggregator:
+    """合并各文件的汇总结果；合并后立即丢弃单个文件的数据"""
+    def __init__(self):
+        self.daily = defaultdict(lambda: Histogram(DAY_BUCKET_ML, DAY_MAX_ML))
+        self.goal_reached = defaultdict(int)
+        self.hourly = [Histogram(HOUR_BUCKET_ML, HOUR_MAX_ML) for _ in range(24)]
+        self.hour_totals = [0] * 24
+        self.user_days = 0
+        self.files = 0
+
+    def add(self, days):
+        self.files += 1
+        for day, (total, hours, goal) in days.items():
+            self.daily[day].add(total)
+            if total >= goal:
+                self.goal_reached[day] += 1
+            if hours is None:
+                continue
+            self.user_days += 1
+            for hour, amount in enumerate(hours):
+                self.hour_totals[hour] += amount
+                if amount:
+                    self.hourly[hour].add(amount)
+
+    def write_daily(self, output):
+        writer = csv.writer(output)
+        writer.writerow(["date", "users", "total_ml", "mean_ml", "p50_ml", "p90_ml", "p99_ml", "goal_reached_pct"])
+        for day in sorted(self.daily):
+            histogram = self.daily[day]
+            writer.writerow([day, histogram.count, histogram.total, round(histogram.mean()),
+                             histogram.percentile(50), histogram.percentile(90), histogram.percentile(99),
+                             round(self.goal_reached[day] / histogram.count * 100, 1)])
+
+    def write_hourly(self, output):
+        writer = csv.writer(output)
+        writer.writerow(["hour", "total_ml", "share_pct", "mean_per_user_day_ml", "drinking_user_days",
+                         "p50_ml", "p90_ml"])
+        fleet_total = sum(self.hour_totals)
+        for hour in range(24):
+            histogram = self.hourly[hour]
+            writer.writerow([f"{hour:02d}:00", self.hour_totals[hour],
+                             round(self.hour_totals[hour] / fleet_total * 100, 1) if fleet_total else 0,
+                             round(self.hour_totals[hour] / self.user_days) if self.user_days else 0,
+                             histogram.count, histogram.percentile(50), histogram.percentile(90)])
+
+
+def aggregate(paths, workers=None, first_day=None, last_day=None, on_error=None):
+    """在进程池中解析文件并合并结果，同时排队的任务数有上限（文件再多内存也不会增长）"""
+    aggregator = FleetAggregator()
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * TASKS_PER_WORKER
+    paths = iter(paths)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        while True:
+            for path in paths:
+                pending[executor.submit(summarize_file, path, first_day, last_day)] = path
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    aggregator.add(future.result())
+                except Exception as e:
+                    if on_error:
+                        on_error(path, e)
+    return aggregator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="汇总多台电脑上的饮水数据")
+    parser.add_argument("root", help="收集数据文件的目录（递归查找）")
+    parser.add_argument("-o", "--output-dir", default=".", help="CSV输出目录（默认当前目录）")
+    parser.add_argument("--name", default=DATA_FILE_NAME, help=f"数据文件名（默认{DATA_FILE_NAME}）")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认CPU核数）")
+    parser.add_argument("--from", dest="first_day", metavar="YYYY-MM-DD", help="开始日期")
+    parser.add_argument("--to", dest="last_day", metavar="YYYY-MM-DD", help="结束日期")
+    args = parser.parse_args(argv)
+
+    errors = []
+
+    def report_error(path, error):
+        errors.append(path)
+        print(f"跳过 {path}: {error}", file=sys.stderr)
+
+    aggregator = aggregate(find_data_files(args.root, args.name), args.workers,
+                           args.first_day, args.last_day, report_error)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "fleet_daily.csv"), "w", encoding="utf-8", newline="") as f:
+        aggregator.write_daily(f)
+    with open(os.path.join(args.output_dir, "fleet_hourly.csv"), "w", encoding="utf-8", newline="") as f:
+        aggregator.write_hourly(f)
+
+    print(f"已汇总 {aggregator.files} 个文件（{aggregator.user_days} 人天），跳过 {len(errors)} 个")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import json
+from concurrent.futures import Future
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer
+
+from ipc import server_address
+
+
+class InstanceServer(QObject):
+    """接收其他进程（重复启动的水瓶、命令行工具）发来的命令
+
+    每个连接发送一行JSON命令，交给handler处理后回复一行JSON。
+    handler(command) 返回回复字典，其中没有"ok"时视为成功。
+    """
+    def __init__(self, handler, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def listen(self):
+        """开始监听；只能在持有单实例锁时调用，因此可以放心删除残留的套接字"""
+        address = server_address()
+        QLocalServer.removeServer(address)
+        if not self.server.listen(address):
+            print(f"无法监听本地连接: {self.server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        """停止监听"""
+        self.server.close()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(lambda connection=connection: self.on_ready_read(connection))
+            connection.disconnected.connect(connection.deleteLater)
+
+    def on_ready_read(self, connection):
+        if not connection.canReadLine():
+            return
+        line = bytes(connection.readLine()).decode("utf-8", errors="replace")
+        try:
+            command = json.loads(line)
+            reply = self.handler(command) or {}
+        except ValueError:
+            reply = {"ok": False, "error": "无效的命令"}
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        reply.setdefault("ok", True)
+
+        connection.write((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+        connection.waitForBytesWritten(1000)
+        connection.disconnectFromServer()
+
+
+class GuiThreadExecutor(QObject):
+    """在Qt主线程中执行其他线程（例如本地接口）提交的函数
+
+    submit() 可以在任意线程调用，返回concurrent.futures.Future；
+    函数通过跨线程的排队信号在主线程的事件循环中执行。
+    """
+    _call = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._call.connect(self._run)
+
+    def submit(self, function, *args):
+        future = Future()
+        self._call.emit((future, function, args))
+        return future
+
+    def _run(self, call):
+        future, function, args = call
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except Exception as e:
+            future.set_exception(e)
@@ -0,0 +1,94 @@
+"""数据文件的分段校验（不导入PyQt）
+
+主文件中的记录按月份分段，每段（当月的记录、目标快照和清理明细后保留的总量）保存一个CRC32校验值；
+追加日志的每一行也带有自己的校验值。损坏时只影响所在的月份或那一行日志。
+"""
+import re
+import json
+import zlib
+from datetime import datetime
+
+# 单条记录的饮水量上限（毫升），超出视为损坏的数据
+MAX_RECORD_AMOUNT = 10000
+
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):[0-5]\d$")
+DAY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def checksum(value):
+    """对象规范化为JSON后的CRC32（十六进制）"""
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f"{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+def segment_of(day):
+    """日期所在的分段（月份）"""
+    return day[:7]
+
+
+def segment_days(data):
+    """分段 -> 该月出现在记录、目标快照或保留的总量中的日期列表"""
+    segments = {}
+    for day in set(data.get("records", {})) | set(data.get("day_goals", {})) | set(data.get("pruned_totals", {})):
+        segments.setdefault(segment_of(day), []).append(day)
+    return segments
+
+
+def segment_content(data, days):
+    """一个分段的内容：这些日期的记录和目标快照（以及清理明细后保留的总量）"""
+    records = data.get("records", {})
+    day_goals = data.get("day_goals", {})
+    content = {
+        "records": {day: records[day] for day in days if day in records},
+        "day_goals": {day: day_goals[day] for day in days if day in day_goals},
+    }
+    # 旧版本的数据没有这一项，校验值保持不变
+    if "pruned_totals" in data:
+        pruned_totals = data["pruned_totals"]
+        content["pruned_totals"] = {day: pruned_totals[day] for day in days if day in pruned_totals}
+    return content
+
+
+def segment_checksums(data):
+    """计算所有分段的校验值（保存主文件前调用）"""
+    return {segment: checksum(segment_content(data, days)) for segment, days in segment_days(data).items()}
+
+
+def valid_amount(amount):
+    """饮水量是否在合理范围内（写入记录前检查，与加载时的检查一致）"""
+    return type(amount) is int and 0 < amount <= MAX_RECORD_AMOUNT
+
+
+def valid_day(day):
+    """日期是否为有效的 YYYY-MM-DD 字符串"""
+    if not isinstance(day, str) or DAY_PATTERN.match(day) is None:
+        return False
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def valid_record(record):
+    """记录的格式和数值是否合理"""
+    return (isinstance(record, dict)
+            and isinstance(record.get("time"), str) and TIME_PATTERN.match(record["time"]) is not None
+            and valid_amount(record.get("amount"))
+            and isinstance(record.get("id", ""), str))
+
+
+def seal_entry(entry):
+    """日志条目加上校验值，返回要写入的一行"""
+    return json.dumps(dict(entry, crc=checksum(entry)), ensure_ascii=False) + "\n"
+
+
+def open_entry(line):
+    """解析一行日志并核对校验值，损坏时抛出ValueError（旧版本没有校验值的条目直接接受）"""
+    entry = json.loads(line)
+    if not isinstance(entry, dict):
+        raise ValueError("日志条目格式错误")
+    expected = entry.pop("crc", None)
+    if expected is not None and expected != checksum(entry):
+        raise ValueError("日志条目校验失败")
+    return entry
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+
+# 本模块不导入PyQt：重复启动时在导入PyQt之前就把命令转发给已运行的实例，
+# 命令行工具也用它与界面通信
+
+# 数据目录（与DataManager一致）
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".water_bottle")
+
+# 单实例锁文件：持有锁的进程才能读写数据文件
+LOCK_FILE = os.path.join(DATA_DIR, "instance.lock")
+
+# 等待正在启动的实例开始监听的最长秒数
+CONNECT_WAIT = 3.0
+
+
+def server_address():
+    """本地通信地址：Windows上为命名管道，其他系统为数据目录中的Unix套接字"""
+    if sys.platform == "win32":
+        user = os.environ.get("USERNAME", "user")
+        return r"\\.\pipe\water_bottle-" + user
+    return os.path.join(DATA_DIR, "instance.sock")
+
+
+def add_instance_arguments(parser):
+    """添加转发给运行中实例的命令行参数"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--show", action="store_true", help="显示水瓶窗口（默认）")
+    group.add_argument("--add", type=int, metavar="ML", help="记录一次饮水（毫升）")
+    group.add_argument("--settings", action="store_true", help="打开设置")
+    group.add_argument("--quit", action="store_true", help="退出正在运行的水瓶")
+
+
+def command_from_args(args):
+    """把命令行参数转换为实例命令"""
+    if args.add is not None:
+        return {"command": "add", "amount": args.add}
+    if args.settings:
+        return {"command": "settings"}
+    if args.quit:
+        return {"command": "quit"}
+    return {"command": "show"}
+
+
+def _exchange(data, timeout):
+    """发送一行请求并读取一行回复，没有实例在监听时返回None"""
+    address = server_address()
+    if sys.platform == "win32":
+        try:
+            pipe = open(address, "r+b", buffering=0)
+        except OSError:
+            return None
+        with pipe:
+            pipe.write(data)
+            return pipe.readline()
+
+    if not os.path.exists(address):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+    except OSError:
+        # 套接字文件残留（上次异常退出）或实例正在退出
+        sock.close()
+        return None
+    with sock:
+        sock.sendall(data)
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+        return reply
+
+
+def send_command(command, timeout=2.0, wait=0.0):
+    """把命令发送给运行中的实例，返回回复（字典）；没有实例时返回None
+
+    wait > 0 时在这段时间内重试连接（对方可能正在启动，还没开始监听）。
+    """
+    data = (json.dumps(command, ensure_ascii=False) + "\n").encode("utf-8")
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            reply = _exchange(data, timeout)
+        except OSError:
+            reply = None
+        if reply is not None:
+            try:
+                return json.loads(reply.decode("utf-8") or "{}")
+            except ValueError:
+                return {"ok": False, "error": "无效的回复"}
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.05)
+
+
+def forward_command_line(argv):
+    """有实例在运行时转发命令行并返回True（调用方随即退出），否则返回False"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_instance_arguments(parser)
+    try:
+        args, _ = parser.parse_known_args(argv[1:])
+    except SystemExit:
+        # 参数有误，交给完整的参数解析报告错误
+        return False
+    return send_command(command_from_args(args)) is not None
+
+
+class InstanceLock:
+    """基于操作系统文件锁的单实例锁，进程退出（包括崩溃）时自动释放"""
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """尝试获取锁（不等待），成功返回True"""
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.path, "a+")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        """释放锁"""
+        if self._file is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
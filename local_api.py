@@ -0,0 +1,275 @@
+import json
+import asyncio
+import threading
+import http.client
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+from integrity import valid_amount, MAX_RECORD_AMOUNT
+
+# 本地接口只监听本机地址，默认端口（设置项 api_port 为0时不启用）
+API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8765
+
+# 同时处理的请求数、请求大小和单次请求的数据量上限
+MAX_CONCURRENCY = 8
+MAX_HEADER_BYTES = 8 * 1024
+MAX_BODY_BYTES = 64 * 1024
+MAX_BATCH_RECORDS = 100
+MAX_RANGE_DAYS = 366
+
+# 读取请求和等待写入完成的超时（秒）
+REQUEST_TIMEOUT = 5.0
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 504: "Gateway Timeout"}
+
+
+class ApiError(Exception):
+    """请求错误，status为HTTP状态码"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _run_inline(function, *args):
+    """在当前线程执行写入（没有界面时使用），返回已完成的Future"""
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class StoreBackend:
+    """接口的数据来源
+
+    读取只访问DataManager在内存中维护的汇总数据，不读磁盘；
+    写入交给submit(函数, 参数...)执行并返回Future，
+    界面中由它把写入转到Qt主线程（DataManager只在主线程中修改）。
+    """
+    def __init__(self, data_manager, add_records=None, submit=_run_inline):
+        self.data_manager = data_manager
+        self.add_records_function = add_records or data_manager.add_water_records
+        self.submit = submit
+
+    def today(self):
+        day = date.today().strftime("%Y-%m-%d")
+        return {
+            "date": day,
+            "total": self.data_manager.daily_totals.get(day, 0),
+            "goal": self.data_manager.get_daily_goal(),
+            "hourly": self.data_manager.get_hourly_totals(day),
+        }
+
+    def stats(self, first_day, last_day):
+        # 每天带上当天实际使用的目标，以前各天的结果不随当前设置变化
+        days = []
+        day = first_day
+        while day <= last_day:
+            key = day.strftime("%Y-%m-%d")
+            days.append({"date": key, "total": self.data_manager.daily_totals.get(key, 0),
+                         "goal": self.data_manager.get_day_goal(key)})
+            day += timedelta(days=1)
+        totals = [item["total"] for item in days]
+        return {
+            "goal": self.data_manager.get_daily_goal(),
+            "days": days,
+            "total": sum(totals),
+            "average": round(sum(totals) / len(totals), 1),
+            "goal_reached_days": sum(1 for item in days if item["total"] >= item["goal"]),
+        }
+
+    def add_records(self, amounts):
+        return self.submit(self.add_records_function, amounts)
+
+
+class LocalApiServer:
+    """嵌入式的本机JSON接口（asyncio，运行在独立线程中，不占用Qt主线程）
+
+    GET  /api/today                          今天的饮水量、目标和每小时分布
+    GET  /api/stats?from=YYYY-MM-DD&to=...   日期范围内每天的饮水量（默认最近7天）
+    POST /api/records  {"records": [{"amount": 200}, ...]}   批量添加饮水记录
+
+    同时处理的请求数由信号量限制，超出的连接排队等待。
+    """
+    def __init__(self, backend, port=DEFAULT_API_PORT, host=API_HOST, max_concurrency=MAX_CONCURRENCY):
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        """在后台线程中启动服务，监听失败时抛出OSError"""
+        self._thread = threading.Thread(target=self._run, name="local-api", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        return self.port
+
+    def stop(self):
+        """停止服务并等待后台线程结束"""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(2.0)
+        self._loop = None
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, self.host, self.port,
+                                     limit=MAX_HEADER_BYTES))
+            # 端口为0时由系统分配
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+
+    async def _handle_connection(self, reader, writer):
+        async with self._semaphore:
+            try:
+                status, payload = await asyncio.wait_for(self._handle_request(reader), REQUEST_TIMEOUT)
+            except ApiError as e:
+                status, payload = e.status, {"error": str(e)}
+            except asyncio.TimeoutError:
+                status, payload = 504, {"error": "请求超时"}
+            except Exception as e:
+                # 内部错误的细节只输出到控制台，不返回给客户端
+                print(f"本地接口处理请求时出错: {str(e)}")
+                status, payload = 500, {"error": "服务器内部错误"}
+
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            header = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                      "Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n")
+            try:
+                writer.write(header.encode("ascii") + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+    async def _handle_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            raise ApiError(413, "请求头过大")
+        except asyncio.IncompleteReadError:
+            raise ApiError(400, "请求不完整")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise ApiError(400, "无效的请求行")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ApiError(400, "无效的Content-Length")
+        if length < 0:
+            raise ApiError(400, "无效的Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "请求内容过大")
+        try:
+            body = await reader.readexactly(length) if length else b""
+        except asyncio.IncompleteReadError:
+            raise ApiError(400, "请求不完整")
+
+        url = urlsplit(target)
+        return await self._route(method, url.path, parse_qs(url.query), body)
+
+    async def _route(self, method, path, query, body):
+        routes = {
+            "/api/today": ("GET", self._get_today),
+            "/api/stats": ("GET", self._get_stats),
+            "/api/records": ("POST", self._post_records),
+        }
+        if path not in routes:
+            raise ApiError(404, "未知的接口")
+        allowed, handler = routes[path]
+        if method != allowed:
+            raise ApiError(405, f"只支持{allowed}")
+        return 200, await handler(query, body)
+
+    async def _get_today(self, query, body):
+        return self.backend.today()
+
+    async def _get_stats(self, query, body):
+        today = date.today()
+        try:
+            last_day = _parse_day(query, "to", today)
+            first_day = _parse_day(query, "from", last_day - timedelta(days=6))
+        except ValueError:
+            raise ApiError(400, "日期格式应为YYYY-MM-DD")
+        if first_day > last_day:
+            raise ApiError(400, "开始日期晚于结束日期")
+        if (last_day - first_day).days >= MAX_RANGE_DAYS:
+            raise ApiError(400, f"日期范围不能超过{MAX_RANGE_DAYS}天")
+        return self.backend.stats(first_day, last_day)
+
+    async def _post_records(self, query, body):
+        try:
+            records = json.loads(body.decode("utf-8"))["records"]
+            amounts = [int(record["amount"]) for record in records]
+        except (ValueError, KeyError, TypeError):
+            raise ApiError(400, '请求内容应为 {"records": [{"amount": 毫升}, ...]}')
+        if not amounts or len(amounts) > MAX_BATCH_RECORDS:
+            raise ApiError(400, f"每次应添加1到{MAX_BATCH_RECORDS}条记录")
+        if not all(valid_amount(amount) for amount in amounts):
+            raise ApiError(400, f"饮水量应在1到{MAX_RECORD_AMOUNT}毫升之间")
+
+        await asyncio.wrap_future(self.backend.add_records(amounts))
+        result = self.backend.today()
+        result["added"] = len(amounts)
+        return result
+
+
+def _parse_day(query, name, default):
+    values = query.get(name)
+    if not values:
+        return default
+    return datetime.strptime(values[0], "%Y-%m-%d").date()
+
+
+def api_request(method, path, payload=None, port=DEFAULT_API_PORT, timeout=5.0):
+    """本机客户端：发送请求并返回(状态码, 回复数据)，用于调试和测试本地接口"""
+    connection = http.client.HTTPConnection(API_HOST, port, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode("utf-8") or "{}")
+    finally:
+        connection.close()
@@ -0,0 +1,117 @@
+import time
+import threading
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from data_manager import MAINTENANCE_JOBS
+
+# 每个时间片最多运行的秒数，以及两个时间片之间留给界面的毫秒数
+SLICE_SECONDS = 0.008
+SLICE_GAP_MS = 40
+
+# 用户操作（喝水、拖动水瓶）之后等待这么多秒再继续，维护只在空闲时进行
+IDLE_SECONDS = 5
+
+
+class MaintenanceWorker(QObject):
+    """在空闲时分段执行DataManager的维护任务，不阻塞喝水记录和绘制
+
+    维护任务（maintenance_steps）在主线程中按很短的时间片执行，两个时间片之间
+    回到事件循环；最后的检查点只在主线程中复制一份快照，序列化和写文件在后台线程中进行，
+    写完后回到主线程替换数据文件（见DataManager.begin_checkpoint）。
+    """
+    progress = pyqtSignal(str, int, int)  # (任务名称, 已完成, 总数)
+    finished = pyqtSignal(bool)           # 是否成功写回
+    _written = pyqtSignal(object)         # 后台线程写完临时文件
+
+    def __init__(self, data_manager, parent=None):
+        super().__init__(parent)
+        self.data_manager = data_manager
+        self._steps = None
+        self._writing = False
+        self._resume_at = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_slice)
+        self._written.connect(self._finish_checkpoint)
+
+    def start(self, purge_days=None):
+        """开始一轮维护，已经在进行时返回False"""
+        if self.is_running():
+            return False
+        self._steps = self.data_manager.maintenance_steps(purge_days)
+        self._timer.start(0)
+        return True
+
+    def is_running(self):
+        return self._steps is not None or self._writing
+
+    def note_activity(self):
+        """用户刚刚操作过：之后的时间片推迟到空闲时"""
+        self._resume_at = time.monotonic() + IDLE_SECONDS
+
+    def _run_slice(self):
+        wait = self._resume_at - time.monotonic()
+        if wait > 0:
+            self._timer.start(int(wait * 1000) + 1)
+            return
+
+        deadline = time.perf_counter() + SLICE_SECONDS
+        step = None
+        try:
+            while time.perf_counter() < deadline:
+                step = next(self._steps)
+        except StopIteration:
+            self._steps = None
+        except Exception as e:
+            print(f"后台维护时出错: {str(e)}")
+            self._steps = None
+            self.finished.emit(False)
+            return
+        if step is not None:
+            self.progress.emit(*step)
+
+        if self._steps is not None:
+            self._timer.start(SLICE_GAP_MS)
+        else:
+            self._start_checkpoint()
+
+    def _start_checkpoint(self):
+        self._writing = True
+        token, snapshot = self.data_manager.begin_checkpoint()
+        self.progress.emit("checkpoint", 0, 1)
+        threading.Thread(target=self._write, args=(token, snapshot),
+                         name="maintenance-checkpoint", daemon=True).start()
+
+    def _write(self, token, snapshot):
+        """后台线程：只处理快照，不访问DataManager的其他状态"""
+        try:
+            self.data_manager.write_checkpoint(snapshot)
+            self._written.emit((token, None))
+        except Exception as e:
+            self._written.emit((token, e))
+
+    def _finish_checkpoint(self, result):
+        token, error = result
+        self._writing = False
+        if error is not None:
+            print(f"写回数据文件时出错: {str(error)}")
+            self.data_manager.cancel_checkpoint(token)
+            self.finished.emit(False)
+            return
+        try:
+            # 期间有过同步保存时数据文件已是最新的，只替换备份
+            self.data_manager.finish_checkpoint(token)
+        except OSError as e:
+            print(f"写回数据文件时出错: {str(e)}")
+            self.finished.emit(False)
+            return
+        self.progress.emit("checkpoint", 1, 1)
+        self.finished.emit(True)
+
+
+def describe_progress(job, done, total):
+    """进度的显示文字，例如“清理旧的明细记录 40%”"""
+    percent = round(done / total * 100) if total else 100
+    return f"{MAINTENANCE_JOBS.get(job, job)} {percent}%"
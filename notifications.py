@@ -0,0 +1,154 @@
+import time
+from collections import OrderedDict, deque, namedtuple
+
+from PyQt5.QtCore import QObject, QTimer, Qt
+from PyQt5.QtWidgets import QApplication, QLabel, QSystemTrayIcon
+
+# count: 合并的重复通知数量
+Notification = namedtuple("Notification", ["key", "title", "text", "level", "count"])
+
+
+class LogSink:
+    """把通知输出到控制台（没有系统托盘时使用）"""
+    def show(self, notification):
+        suffix = f" (×{notification.count})" if notification.count > 1 else ""
+        print(f"[{notification.title}] {notification.text}{suffix}")
+
+
+class TraySink:
+    """通过系统托盘气泡显示通知"""
+    def __init__(self, tray_icon, duration_ms=4000):
+        self.tray_icon = tray_icon
+        self.duration_ms = duration_ms
+
+    def show(self, notification):
+        icon = QSystemTrayIcon.Warning if notification.level == "warning" else QSystemTrayIcon.Information
+        self.tray_icon.showMessage(notification.title, notification.text, icon, self.duration_ms)
+
+
+class ToastBubble(QLabel):
+    """水瓶上方的非模态提示气泡，点击即可关闭（样式见主题样式表）"""
+    def __init__(self):
+        super().__init__()
+        self.setObjectName("toastBubble")
+        self.setWindowFlags(Qt.Tool | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setAlignment(Qt.AlignCenter)
+        self.setWordWrap(True)
+        self.setMaximumWidth(260)
+
+    def mousePressEvent(self, event):
+        self.hide()
+
+
+class BubbleSink:
+    """在指定窗口（水瓶）上方显示提示气泡，一段时间后自动隐藏"""
+    def __init__(self, anchor_widget, duration_ms=6000):
+        self.anchor = anchor_widget
+        self.duration_ms = duration_ms
+        self.bubble = None
+        self.hide_timer = QTimer()
+        self.hide_timer.setSingleShot(True)
+
+    def show(self, notification):
+        if not self.anchor.isVisible():
+            return
+        if self.bubble is None:
+            self.bubble = ToastBubble()
+            self.hide_timer.timeout.connect(self.bubble.hide)
+
+        self.bubble.setText(f"{notification.title}\n{notification.text}")
+        self.bubble.adjustSize()
+
+        # 显示在水瓶正上方，不超出屏幕顶部
+        anchor_rect = self.anchor.frameGeometry()
+        x = anchor_rect.x() + (anchor_rect.width() - self.bubble.width()) // 2
+        y = anchor_rect.y() - self.bubble.height() + 20
+        screen_rect = QApplication.desktop().availableGeometry(self.anchor)
+        self.bubble.move(max(screen_rect.left(), min(x, screen_rect.right() - self.bubble.width())),
+                         max(screen_rect.top(), y))
+        self.bubble.show()
+        self.hide_timer.start(self.duration_ms)
+
+
+class NotificationCenter(QObject):
+    """非阻塞的通知队列
+
+    notify() 只把通知放进队列并立即返回，由定时器按节奏分发给各个显示端（sink），
+    事件循环不会被模态对话框阻塞：
+    - 合并：队列中相同key的通知合并为一条（保留最新内容并累计次数）
+    - 限流：两条通知之间至少间隔 min_interval 秒，window 秒内最多显示 max_per_window 条
+    显示端只需要实现 show(notification) 方法。
+    """
+    def __init__(self, parent=None, min_interval=3.0, max_per_window=5, window=60.0,
+                 clock=time.monotonic):
+        super().__init__(parent)
+        self.min_interval = min_interval
+        self.max_per_window = max_per_window
+        self.window = window
+        self.clock = clock
+        self.sinks = []
+
+        self._pending = OrderedDict()  # key -> Notification
+        self._shown_times = deque()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.dispatch)
+
+    def add_sink(self, sink):
+        """添加显示端"""
+        if sink not in self.sinks:
+            self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """移除显示端"""
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+
+    def notify(self, key, title, text, level="info"):
+        """提交一条通知（立即返回），相同key的待显示通知会被合并"""
+        existing = self._pending.get(key)
+        count = existing.count + 1 if existing else 1
+        self._pending[key] = Notification(key, title, text, level, count)
+        if not self._timer.isActive():
+            self._timer.start(0)
+
+    def pending_count(self):
+        """等待显示的通知数量"""
+        return len(self._pending)
+
+    def dispatch(self):
+        """在限流允许时显示队首的通知，其余的稍后再分发"""
+        if not self._pending:
+            return
+
+        delay = self._rate_limit_delay()
+        if delay > 0:
+            self._timer.start(int(delay * 1000) + 1)
+            return
+
+        _, notification = self._pending.popitem(last=False)
+        self._shown_times.append(self.clock())
+        for sink in list(self.sinks):
+            try:
+                sink.show(notification)
+            except Exception as e:
+                print(f"显示通知出错: {str(e)}")
+
+        if self._pending:
+            self._timer.start(int(self.min_interval * 1000))
+
+    def _rate_limit_delay(self):
+        """距离下一次允许显示还需等待的秒数"""
+        now = self.clock()
+        while self._shown_times and now - self._shown_times[0] >= self.window:
+            self._shown_times.popleft()
+
+        delay = 0.0
+        if self._shown_times:
+            delay = self._shown_times[-1] + self.min_interval - now
+        if len(self._shown_times) >= self.max_per_window:
+            delay = max(delay, self._shown_times[0] + self.window - now)
+        return delay
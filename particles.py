@@ -0,0 +1,210 @@
+import math
+import random
+from array import array
+
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QPainter, QPixmap, QColor, QRadialGradient
+
+# 预渲染气泡精灵的逻辑尺寸（像素），绘制时按粒子大小缩放
+SPRITE_SIZE = 12
+
+# 粒子类型
+KIND_NONE = 0
+KIND_BUBBLE = 1
+KIND_SPLASH = 2
+
+
+class BubbleParticleSystem:
+    """预分配的气泡粒子池
+
+    前 bubble_capacity 个槽位是从瓶底上升的气泡，其余槽位是添加饮水时溅起的水花。
+    粒子状态保存在定长数组中，坐标相对于水瓶绘制区域左上角（不含弹跳偏移）。
+    每帧只更新数组里的数值，并通过一次 drawPixmapFragments 调用贴出所有粒子，
+    不再为每个气泡创建和裁剪 QPainterPath。
+    """
+    def __init__(self, bubble_capacity=8, splash_capacity=16, seed=None):
+        self.bubble_capacity = bubble_capacity
+        self.capacity = bubble_capacity + splash_capacity
+        self.random = random.Random(seed)
+
+        n = self.capacity
+        self.kind = array('b', [KIND_NONE] * n)
+        self.x = array('d', [0.0] * n)
+        self.y = array('d', [0.0] * n)
+        self.vx = array('d', [0.0] * n)
+        self.vy = array('d', [0.0] * n)
+        self.size = array('d', [0.0] * n)
+        self.phase = array('d', [0.0] * n)
+        self.life = array('d', [0.0] * n)
+
+        # 绘制用的片段数组也预先分配，每帧只改写字段。PyQt的drawPixmapFragments
+        # 不接受片段数量参数，因此为每种活动粒子数准备一个定长数组，避免每帧切片
+        self.fragment_arrays = [sip.array(QPainter.PixmapFragment, count) for count in range(n + 1)]
+        self.active_fragments = 0
+
+        # 局部重绘用的外接矩形，update_damage_rects只改写前面的若干个
+        self.damage = [QRect() for _ in range(n)]
+
+        self.bubble_count = 0
+        self.clock = 0.0
+        self.width = 0.0
+        self.surface_y = 0.0
+        self.bottom_y = 0.0
+
+        self.sprite = None
+        self.sprite_dpr = None
+
+    def set_bounds(self, width, surface_y, bottom_y):
+        """更新水瓶宽度、水面和瓶底位置（相对绘制区域）"""
+        self.width = width
+        self.surface_y = surface_y
+        self.bottom_y = bottom_y
+
+    def set_bubble_count(self, count):
+        """设置同时存在的气泡数量，新增的气泡从瓶底生成"""
+        count = max(0, min(count, self.bubble_capacity))
+        for i in range(self.bubble_count, count):
+            self._spawn_bubble(i, anywhere=True)
+        for i in range(count, self.bubble_count):
+            self.kind[i] = KIND_NONE
+        self.bubble_count = count
+
+    def splash(self, count=10):
+        """在水面溅起一簇水花，使用空闲的水花槽位"""
+        rnd = self.random
+        for i in range(self.bubble_capacity, self.capacity):
+            if count <= 0:
+                break
+            if self.kind[i] != KIND_NONE:
+                continue
+            self.kind[i] = KIND_SPLASH
+            self.x[i] = self.width * rnd.uniform(0.3, 0.7)
+            self.y[i] = self.surface_y
+            self.vx[i] = rnd.uniform(-40.0, 40.0)
+            self.vy[i] = rnd.uniform(-140.0, -80.0)
+            self.size[i] = rnd.uniform(2.5, 5.0)
+            self.life[i] = 1.0
+            count -= 1
+
+    def reset(self):
+        """清空所有粒子（尺寸变化时调用）"""
+        for i in range(self.capacity):
+            self.kind[i] = KIND_NONE
+        self.bubble_count = 0
+        self.active_fragments = 0
+
+    def advance(self, dt):
+        """按动画时钟推进所有粒子"""
+        self.clock += dt
+        kind = self.kind
+        x = self.x
+        y = self.y
+        vx = self.vx
+        vy = self.vy
+
+        for i in range(self.capacity):
+            k = kind[i]
+            if k == KIND_BUBBLE:
+                # 气泡匀速上升并左右轻微摇摆，到达水面后回到瓶底
+                y[i] += vy[i] * dt
+                x[i] += vx[i] * math.cos(self.clock * 2.0 + self.phase[i]) * dt
+                if y[i] < self.surface_y + self.size[i]:
+                    self._spawn_bubble(i)
+            elif k == KIND_SPLASH:
+                # 水花做抛物线运动，落回水面后回收
+                vy[i] += 400.0 * dt
+                x[i] += vx[i] * dt
+                y[i] += vy[i] * dt
+                self.life[i] -= dt
+                if self.life[i] <= 0 or (vy[i] > 0 and y[i] > self.surface_y):
+                    kind[i] = KIND_NONE
+
+    def has_particles(self):
+        """是否有需要绘制的粒子"""
+        for i in range(self.capacity):
+            if self.kind[i] != KIND_NONE:
+                return True
+        return False
+
+    def update_damage_rects(self, dx, dy):
+        """把所有活动粒子在窗口坐标中的外接矩形写入self.damage（用于局部重绘），返回矩形数量"""
+        count = 0
+        for i in range(self.capacity):
+            if self.kind[i] != KIND_NONE:
+                half = self.size[i] / 2
+                self.damage[count].setRect(int(self.x[i] - half + dx) - 1, int(self.y[i] - half + dy) - 1,
+                                           int(self.size[i]) + 3, int(self.size[i]) + 3)
+                count += 1
+        return count
+
+    def draw(self, painter, clip_path, dx, dy, dpr=1.0):
+        """用一次批量调用绘制所有粒子，裁剪到瓶身内部"""
+        sprite = self._ensure_sprite(dpr)
+        sprite_width = sprite.width()
+
+        count = 0
+        for i in range(self.capacity):
+            if self.kind[i] != KIND_NONE:
+                count += 1
+        self.active_fragments = count
+        if count == 0:
+            return
+
+        fragments = self.fragment_arrays[count]
+        index = 0
+        for i in range(self.capacity):
+            k = self.kind[i]
+            if k == KIND_NONE:
+                continue
+            fragment = fragments[index]
+            fragment.x = self.x[i] + dx
+            fragment.y = self.y[i] + dy
+            fragment.sourceLeft = 0
+            fragment.sourceTop = 0
+            fragment.width = sprite_width
+            fragment.height = sprite_width
+            fragment.scaleX = fragment.scaleY = self.size[i] / sprite_width
+            fragment.rotation = 0
+            fragment.opacity = 1.0 if k == KIND_BUBBLE else max(0.0, min(1.0, self.life[i]))
+            index += 1
+
+        painter.save()
+        painter.setClipPath(clip_path, Qt.IntersectClip)
+        painter.drawPixmapFragments(fragments, sprite)
+        painter.restore()
+
+    def _spawn_bubble(self, i, anywhere=False):
+        """在瓶底（或整个水体中）随机生成一个气泡"""
+        rnd = self.random
+        self.kind[i] = KIND_BUBBLE
+        self.x[i] = self.width * rnd.uniform(0.25, 0.75)
+        if anywhere and self.bottom_y > self.surface_y:
+            self.y[i] = rnd.uniform(self.surface_y, self.bottom_y)
+        else:
+            self.y[i] = self.bottom_y
+        self.vx[i] = rnd.uniform(2.0, 5.0)
+        self.vy[i] = -rnd.uniform(15.0, 30.0)
+        self.size[i] = rnd.choice((3.0, 4.5, 6.0)) + rnd.uniform(-1.0, 1.5)
+        self.phase[i] = rnd.uniform(0, 2 * math.pi)
+
+    def _ensure_sprite(self, dpr):
+        """预渲染气泡精灵（按DPR缓存）"""
+        if self.sprite is None or self.sprite_dpr != dpr:
+            pixel_size = int(math.ceil(SPRITE_SIZE * dpr))
+            sprite = QPixmap(pixel_size, pixel_size)
+            sprite.fill(Qt.transparent)
+
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            gradient = QRadialGradient(pixel_size * 0.35, pixel_size * 0.35, pixel_size * 0.6)
+            gradient.setColorAt(0, QColor(255, 255, 255, 170))
+            gradient.setColorAt(1, QColor(255, 255, 255, 110))
+            painter.setBrush(gradient)
+            painter.drawEllipse(0, 0, pixel_size, pixel_size)
+            painter.end()
+
+            self.sprite = sprite
+            self.sprite_dpr = dpr
+        return self.sprite
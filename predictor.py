@@ -0,0 +1,164 @@
+from collections import deque
+from datetime import datetime, date, timedelta
+
+# 提醒方式（名称 -> 显示名称）
+REMINDER_MODES = ["adaptive", "interval"]
+REMINDER_MODE_LABELS = ["按饮水习惯", "固定间隔"]
+
+# 参与建模的历史天数，以及启用预测所需的最少有记录天数
+HISTORY_DAYS = 14
+MIN_HISTORY_DAYS = 3
+
+
+class IntakePredictor:
+    """根据历史每小时饮水量预测当天的饮水节奏
+
+    模型只保存最近 HISTORY_DAYS 天的每小时饮水量之和（24个数），
+    新记录只更新当天的24格计数；跨天时把当天计数并入历史并移出最旧的一天，
+    因此每次添加记录都是O(1)，不需要重新扫描所有记录。
+    """
+    def __init__(self, history_days=HISTORY_DAYS):
+        self.history_days = history_days
+        self.today = date.today().strftime("%Y-%m-%d")
+        self.today_hours = [0] * 24
+        self.history = deque()        # (日期, 每小时饮水量)，最旧的在前
+        self.hour_sums = [0] * 24     # history中各小时之和
+        self.day_count = 0            # history中有饮水记录的天数
+        self._curve = None            # 累计比例曲线缓存，历史变化时失效
+
+    def load(self, hourly_totals, today=None):
+        """从每天每小时的汇总数据（日期 -> 24个数）初始化模型"""
+        self.today = today or date.today().strftime("%Y-%m-%d")
+        self.today_hours = list(hourly_totals.get(self.today, [0] * 24))
+        self.history.clear()
+        self.hour_sums = [0] * 24
+        self.day_count = 0
+        self._curve = None
+
+        first_day = (datetime.strptime(self.today, "%Y-%m-%d")
+                     - timedelta(days=self.history_days)).strftime("%Y-%m-%d")
+        for day in sorted(hourly_totals):
+            if first_day <= day < self.today:
+                self._push_day(day, list(hourly_totals[day]))
+
+    def observe(self, day, hour, amount):
+        """记录一次饮水（添加记录时调用；amount为负表示删除了一条记录）
+        
+        同步来的记录可能属于历史中的某一天，这时只更新那一天和hour_sums中的一格。
+        """
+        self.roll_to(day)
+        if day == self.today:
+            self.today_hours[hour] += amount
+            return
+        first_day = (datetime.strptime(self.today, "%Y-%m-%d")
+                     - timedelta(days=self.history_days)).strftime("%Y-%m-%d")
+        if day < first_day:
+            return
+        index = 0
+        for index, (known_day, hours) in enumerate(self.history):
+            if known_day == day:
+                hours[hour] += amount
+                self.hour_sums[hour] += amount
+                self._curve = None
+                if not any(hours):
+                    del self.history[index]
+                    self.day_count -= 1
+                return
+            if known_day > day:
+                break
+        else:
+            index = len(self.history)
+        if amount > 0:
+            hours = [0] * 24
+            hours[hour] = amount
+            self.history.insert(index, (day, hours))
+            self.hour_sums[hour] += amount
+            self.day_count += 1
+            self._curve = None
+
+    def reset_today(self):
+        """清空当天的计数（重置今日记录时调用）"""
+        self.today_hours = [0] * 24
+
+    def roll_to(self, day):
+        """日期变化时把当天计数并入历史"""
+        if day <= self.today:
+            return
+        self._push_day(self.today, self.today_hours)
+        self.today = day
+        self.today_hours = [0] * 24
+
+        first_day = (datetime.strptime(day, "%Y-%m-%d")
+                     - timedelta(days=self.history_days)).strftime("%Y-%m-%d")
+        while self.history and self.history[0][0] < first_day:
+            self._pop_day()
+
+    def _push_day(self, day, hours):
+        if not any(hours):
+            return
+        self.history.append((day, hours))
+        for hour, amount in enumerate(hours):
+            self.hour_sums[hour] += amount
+        self.day_count += 1
+        self._curve = None
+
+    def _pop_day(self):
+        _, hours = self.history.popleft()
+        for hour, amount in enumerate(hours):
+            self.hour_sums[hour] -= amount
+        self.day_count -= 1
+        self._curve = None
+
+    @property
+    def ready(self):
+        """历史数据是否足够进行预测"""
+        return self.day_count >= MIN_HISTORY_DAYS
+
+    def cumulative_curve(self):
+        """每个整点结束时通常已完成的当日饮水比例（25个点，0点为0）"""
+        if self._curve is None:
+            total = sum(self.hour_sums)
+            curve = [0.0]
+            running = 0
+            for amount in self.hour_sums:
+                running += amount
+                curve.append(running / total if total else 0.0)
+            self._curve = curve
+        return self._curve
+
+    def expected_fraction(self, moment):
+        """到某个时刻（datetime）为止通常已完成的当日饮水比例"""
+        curve = self.cumulative_curve()
+        start, end = curve[moment.hour], curve[moment.hour + 1]
+        return start + (end - start) * (moment.minute * 60 + moment.second) / 3600
+
+    def deficit(self, moment, goal, today_total):
+        """按通常节奏，此刻应喝的量与实际饮水量之差（ml，落后为正）"""
+        return goal * self.expected_fraction(moment) - today_total
+
+    def next_due(self, moment, goal, today_total, sip_amount):
+        """预测下一次应该提醒的时刻（datetime）
+
+        找出从moment开始、按通常节奏落后达到一次饮水量（sip_amount）的最早时刻；
+        已经落后时返回moment。历史不足、目标已完成或今天剩余时间内不会落后时返回None。
+        """
+        if not self.ready or today_total >= goal:
+            return None
+        self.roll_to(moment.strftime("%Y-%m-%d"))
+
+        # 需要达到的累计比例
+        target = (today_total + sip_amount) / goal
+        if self.expected_fraction(moment) >= target:
+            return moment
+
+        # 逐小时在线性插值的曲线上求解
+        curve = self.cumulative_curve()
+        day_start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        for hour in range(moment.hour, 24):
+            start, end = curve[hour], curve[hour + 1]
+            if end < target:
+                continue
+            seconds = (target - start) / (end - start) * 3600 if end > start else 0
+            due = day_start + timedelta(hours=hour, seconds=seconds)
+            return max(due, moment)
+        return None
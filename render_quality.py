@@ -0,0 +1,84 @@
+from collections import deque, namedtuple
+
+# 渲染质量档位
+# bubble_scale: 气泡数量比例；wave_step: 波浪采样间隔（像素）
+QualityTier = namedtuple("QualityTier", [
+    "name", "label", "bubble_scale", "wave_step", "shadow", "antialias", "gradient", "decorations"
+])
+
+QUALITY_TIERS = [
+    QualityTier("full", "完整", 1.0, 1, True, True, True, True),
+    QualityTier("balanced", "均衡", 0.5, 2, True, True, True, True),
+    QualityTier("low", "简化", 0.25, 4, False, True, False, False),
+    QualityTier("minimal", "最低", 0.0, 8, False, False, False, False),
+]
+
+# 设置中可选的质量模式（"auto" 表示根据帧耗时自动选择）
+QUALITY_MODES = ["auto"] + [tier.name for tier in QUALITY_TIERS]
+QUALITY_MODE_LABELS = ["自动"] + [tier.label for tier in QUALITY_TIERS]
+
+
+class RenderQualityController:
+    """根据滚动窗口内的平均帧耗时自动调整渲染质量档位
+
+    平均耗时超过帧预算的 downgrade_ratio 时降一档；低于 upgrade_ratio
+    并且在当前档位已稳定运行 upgrade_cooldown 帧后才升一档，两个阈值之间
+    保持不变，避免在相邻档位之间来回切换。
+    """
+    def __init__(self, frame_budget_ms=60, window=30,
+                 downgrade_ratio=0.5, upgrade_ratio=0.15, upgrade_cooldown=150):
+        self.frame_budget_ms = frame_budget_ms
+        self.downgrade_ratio = downgrade_ratio
+        self.upgrade_ratio = upgrade_ratio
+        self.upgrade_cooldown = upgrade_cooldown
+        self.samples = deque(maxlen=window)
+        self.mode = "auto"
+        self.tier_index = 0
+        self.frames_since_change = 0
+
+    @property
+    def tier(self):
+        """当前生效的质量档位"""
+        return QUALITY_TIERS[self.tier_index]
+
+    def set_mode(self, mode):
+        """设置质量模式：auto 或某个档位名称（固定档位）"""
+        if mode not in QUALITY_MODES:
+            mode = "auto"
+        self.mode = mode
+        if mode != "auto":
+            self.tier_index = QUALITY_MODES.index(mode) - 1
+        self._reset_samples()
+
+    def average_frame_ms(self):
+        """滚动窗口内的平均帧耗时"""
+        if not self.samples:
+            return 0.0
+        return sum(self.samples) / len(self.samples)
+
+    def record_frame(self, elapsed_ms):
+        """记录一帧的绘制耗时，档位发生变化时返回True"""
+        if self.mode != "auto":
+            return False
+
+        self.samples.append(elapsed_ms)
+        self.frames_since_change += 1
+        if len(self.samples) < self.samples.maxlen:
+            return False
+
+        average = self.average_frame_ms()
+        if average > self.frame_budget_ms * self.downgrade_ratio:
+            if self.tier_index < len(QUALITY_TIERS) - 1:
+                self.tier_index += 1
+                self._reset_samples()
+                return True
+        elif average < self.frame_budget_ms * self.upgrade_ratio:
+            if self.tier_index > 0 and self.frames_since_change >= self.upgrade_cooldown:
+                self.tier_index -= 1
+                self._reset_samples()
+                return True
+        return False
+
+    def _reset_samples(self):
+        self.samples.clear()
+        self.frames_since_change = 0
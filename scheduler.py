@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+
+from PyQt5.QtCore import QObject, QTimer, Qt
+
+# 单次定时的最长时间（毫秒）。超过时先唤醒一次再重新计算，
+# 以免系统休眠或调整时钟后错过截止时间
+MAX_TIMER_MS = 60 * 60 * 1000
+
+# 粗粒度定时器只保证秒级精度，可能提前最多约半秒唤醒，
+# 截止时间在这个范围内的事件视为已到期，避免为几百毫秒再唤醒一次
+EARLY_TOLERANCE = 1.0
+
+
+class DeadlineScheduler(QObject):
+    """单定时器的截止时间调度器
+
+    所有待执行的事件按最晚执行时间放在优先队列中，只为最近的一个启动定时器，
+    不做任何轮询。每个key只保留最近一次安排，旧条目在出队时直接丢弃。
+
+    事件可以带有允许延后的秒数（slack），即可以在 [due, due + slack] 内任意时刻执行。
+    定时器在最早的最晚执行时间唤醒，并顺带执行所有已到期的事件，
+    相近的事件因此合并到同一次唤醒中。定时器使用 Qt.VeryCoarseTimer，
+    系统可以把这些唤醒和其他程序对齐。
+    """
+    def __init__(self, parent=None, clock=time.time):
+        super().__init__(parent)
+        self.clock = clock
+        self._heap = []       # (最晚执行时间, 序号, key)
+        self._entries = {}    # key -> (截止时间, 最晚执行时间, 序号)
+        self._callbacks = {}  # key -> 回调
+        self._seq = itertools.count()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.VeryCoarseTimer)
+        self._timer.timeout.connect(self.run_due)
+
+    def schedule(self, key, due, callback, slack=0):
+        """安排（或重新安排）一个事件，due为时间戳（秒），slack为允许延后的秒数"""
+        seq = next(self._seq)
+        latest = due + slack
+        self._entries[key] = (due, latest, seq)
+        self._callbacks[key] = callback
+        heapq.heappush(self._heap, (latest, seq, key))
+        self._arm()
+
+    def cancel(self, key):
+        """取消一个事件"""
+        self._entries.pop(key, None)
+        self._callbacks.pop(key, None)
+        self._arm()
+
+    def due_time(self, key):
+        """事件的截止时间，没有安排时返回None"""
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def next_due(self):
+        """下一次唤醒的时间（最早的最晚执行时间），队列为空时返回None"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """执行所有已到期的事件（按截止时间先后），然后为下一次唤醒重新定时"""
+        now = self.clock() + EARLY_TOLERANCE
+        due_keys = sorted((entry[0], entry[2], key) for key, entry in self._entries.items()
+                          if entry[0] <= now)
+        for due, seq, key in due_keys:
+            # 前面的回调可能已经取消或重新安排了这个事件
+            if self._entries.get(key, (None, None, None))[2] != seq:
+                continue
+            del self._entries[key]
+            callback = self._callbacks.pop(key)
+            callback()
+        self._arm()
+
+    def stop(self):
+        """停止定时器（退出程序时调用）"""
+        self._timer.stop()
+
+    def _drop_stale(self):
+        """丢弃队首已被执行、取消或重新安排的条目"""
+        while self._heap:
+            latest, seq, key = self._heap[0]
+            if self._entries.get(key, (None, None, None))[2] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def _arm(self):
+        """只为最近的一次唤醒启动一个定时器"""
+        wake = self.next_due()
+        if wake is None:
+            self._timer.stop()
+            return
+        delay_ms = int(max(0.0, wake - self.clock()) * 1000)
+        self._timer.start(min(delay_ms, MAX_TIMER_MS))
+
+
+def next_midnight(timestamp=None):
+    """某个时刻（默认现在）之后的下一个午夜的时间戳"""
+    moment = datetime.fromtimestamp(timestamp if timestamp is not None else time.time())
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return midnight.timestamp()
+
+
+class QuietHours:
+    """免打扰时段，例如 22:00 - 08:00（可跨越午夜）
+
+    默认不启用，由用户在设置中打开；开始和结束相同时也不生效。
+    """
+    def __init__(self, start="22:00", end="08:00", active=False):
+        self.start = self._parse(start)
+        self.end = self._parse(end)
+        self.active = active
+
+    @staticmethod
+    def _parse(text):
+        hour, minute = str(text).split(":")[:2]
+        return int(hour) * 60 + int(minute)
+
+    @property
+    def enabled(self):
+        return self.active and self.start != self.end
+
+    def contains(self, moment):
+        """判断某个时刻（datetime）是否处于免打扰时段"""
+        if not self.enabled:
+            return False
+        minutes = moment.hour * 60 + moment.minute
+        if self.start < self.end:
+            return self.start <= minutes < self.end
+        return minutes >= self.start or minutes < self.end
+
+    def adjust(self, timestamp):
+        """落在免打扰时段内的时间推迟到时段结束，否则原样返回"""
+        moment = datetime.fromtimestamp(timestamp)
+        if not self.contains(moment):
+            return timestamp
+        end = moment.replace(hour=self.end // 60, minute=self.end % 60, second=0, microsecond=0)
+        if end <= moment:
+            end += timedelta(days=1)
+        return end.timestamp()
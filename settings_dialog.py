@@ -1,9 +1,14 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
                            QPushButton, QComboBox, QSpinBox, QFormLayout, QGroupBox,
-                           QRadioButton, QButtonGroup, QApplication, QStyleFactory, QFrame, QGraphicsBlurEffect, QStyleOptionButton, QStyle)
-from PyQt5.QtCore import Qt, QSettings, QSize, QPropertyAnimation, QEasingCurve
+                           QRadioButton, QButtonGroup, QApplication, QStyleFactory, QFrame, QGraphicsBlurEffect, QStyleOptionButton, QStyle,
+                           QTimeEdit, QAbstractSpinBox, QCheckBox)
+from PyQt5.QtCore import Qt, QSettings, QSize, QPropertyAnimation, QEasingCurve, QObject, QEvent, QTime
 from PyQt5.QtGui import QIcon, QFont, QColor, QPalette, QCursor, QBrush, QLinearGradient
 
+from render_quality import QUALITY_MODES, QUALITY_MODE_LABELS
+from theme import THEME_NAMES, THEME_LABELS, DEFAULT_THEME
+from predictor import REMINDER_MODES, REMINDER_MODE_LABELS
+
 class StyledSpinBox(QSpinBox):
     """自定义样式的SpinBox"""
     def __init__(self, parent=None):
@@ -14,34 +19,7 @@ class StyledRadioButton(QRadioButton):
     """自定义iPhone风格的单选按钮"""
     def __init__(self, text, parent=None):
         super().__init__(text, parent)
-        # 自定义样式
-        self.setStyleSheet("""
-            QRadioButton {
-                spacing: 8px;
-                color: #2c3e50;
-                padding: 4px 0px;
-                margin-right: 15px;
-            }
-            QRadioButton::indicator {
-                width: 22px;
-                height: 22px;
-                border-radius: 11px;
-            }
-            QRadioButton::indicator:unchecked {
-                border: 2px solid #bdc3c7;
-                background-color: transparent;
-            }
-            QRadioButton::indicator:hover {
-                border: 2px solid #3498db;
-            }
-            QRadioButton::indicator:checked {
-                border: none;
-                background-color: #3498db;
-            }
-            QRadioButton::indicator:checked:hover {
-                background-color: #2980b9;
-            }
-        """)
+        # 样式由主题样式表统一提供（见 resources/themes）
         
     def paintEvent(self, event):
         """自定义绘制以添加选中时的勾选标志"""
@@ -68,21 +46,48 @@ class StyledRadioButton(QRadioButton):
             
             painter.end()
 
+class InteractionEffectFilter(QObject):
+    """统一处理按钮悬停和输入框焦点效果的事件过滤器
+    
+    通过动态属性（hovered/focused）配合样式表中的属性选择器切换样式，
+    所有控件共用这一个过滤器，不再逐个替换控件的事件处理函数。
+    """
+    HOVER_EVENTS = {QEvent.Enter: True, QEvent.Leave: False}
+    FOCUS_EVENTS = {QEvent.FocusIn: True, QEvent.FocusOut: False}
+    
+    def eventFilter(self, obj, event):
+        event_type = event.type()
+        if isinstance(obj, QPushButton) and event_type in self.HOVER_EVENTS:
+            self.set_state(obj, "hovered", self.HOVER_EVENTS[event_type])
+        elif isinstance(obj, (QAbstractSpinBox, QComboBox)) and event_type in self.FOCUS_EVENTS:
+            self.set_state(obj, "focused", self.FOCUS_EVENTS[event_type])
+        # 不拦截事件，控件自身的处理照常进行
+        return False
+    
+    @staticmethod
+    def set_state(widget, name, value):
+        """设置状态属性并让样式表重新匹配"""
+        if widget.property(name) == value:
+            return
+        widget.setProperty(name, value)
+        widget.style().unpolish(widget)
+        widget.style().polish(widget)
+
 class SettingsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("水瓶设置--作者（木木iOS分享）")
-        self.resize(450, 650)  # 从580增加到650，为新的外观设置组腾出空间
+        self.resize(450, 850)  # 为免打扰时段和提醒方式设置腾出空间
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         
         self.settings = QSettings("WaterBottleApp", "WaterReminder")
         
-        # 设置字体
+        # 设置字体（只用于对话框本身：对话框可能在空闲时预先创建，不能改变整个应用的字体）
         self.font = QFont("微软雅黑", 9)
-        QApplication.setFont(self.font)
+        self.setFont(self.font)
         
-        # 应用样式表
-        self.apply_stylesheet()
+        # 样式由应用级别的主题样式表提供，这里只设置用于匹配的objectName
+        self.setObjectName("settingsDialog")
         
         self.init_ui()
         self.load_settings()
@@ -91,173 +96,18 @@ class SettingsDialog(QDialog):
         self.setup_animations()
         
     def setup_animations(self):
-        """设置各种控件的动画效果"""
-        # 按钮动画
+        """设置各种控件的动画效果 - 所有控件共用一个事件过滤器"""
+        self.effect_filter = InteractionEffectFilter(self)
+        
+        # 按钮悬停
         for button in self.findChildren(QPushButton):
-            button.setGraphicsEffect(None)  # 清除之前的效果
             button.setProperty("hovered", False)
-            button.enterEvent = lambda e, b=button: self.button_enter_event(e, b)
-            button.leaveEvent = lambda e, b=button: self.button_leave_event(e, b)
-        
-        # 输入框动画
-        for spinbox in self.findChildren(QSpinBox):
-            spinbox.setProperty("focused", False)
-            spinbox.focusInEvent = lambda e, s=spinbox: self.spinbox_focus_in(e, s)
-            spinbox.focusOutEvent = lambda e, s=spinbox: self.spinbox_focus_out(e, s)
-            
-        # ComboBox动画
-        for combo in self.findChildren(QComboBox):
-            combo.setProperty("focused", False)
-            combo.focusInEvent = lambda e, c=combo: self.combo_focus_in(e, c)
-            combo.focusOutEvent = lambda e, c=combo: self.combo_focus_out(e, c)
-    
-    def button_enter_event(self, event, button):
-        """按钮鼠标进入事件"""
-        button.setProperty("hovered", True)
-        button.setStyleSheet("""
-            QPushButton {
-                background-color: #2980b9;
-                color: white;
-                border: none;
-                border-radius: 6px;
-                padding: 8px 16px;
-                font-weight: bold;
-                min-width: 80px;
-                margin: 1px;
-            }
-        """)
-        
-    def button_leave_event(self, event, button):
-        """按钮鼠标离开事件"""
-        button.setProperty("hovered", False)
-        button.setStyleSheet("")
-        self.style().unpolish(button)
-        self.style().polish(button)
-        
-    def spinbox_focus_in(self, event, spinbox):
-        """输入框获取焦点事件"""
-        spinbox.setProperty("focused", True)
-        spinbox.setStyleSheet("""
-            QSpinBox {
-                border: 2px solid #3498db;
-                border-radius: 6px;
-                padding: 4px;
-                background-color: rgba(255, 255, 255, 0.8);
-            }
-        """)
-        
-    def spinbox_focus_out(self, event, spinbox):
-        """输入框失去焦点事件"""
-        spinbox.setProperty("focused", False)
-        spinbox.setStyleSheet("")
-        self.style().unpolish(spinbox)
-        self.style().polish(spinbox)
-        
-    def combo_focus_in(self, event, combo):
-        """下拉框获取焦点事件"""
-        combo.setProperty("focused", True)
-        combo.setStyleSheet("""
-            QComboBox {
-                border: 2px solid #3498db;
-                border-radius: 6px;
-                padding: 4px;
-                background-color: rgba(255, 255, 255, 0.8);
-            }
-        """)
-        
-    def combo_focus_out(self, event, combo):
-        """下拉框失去焦点事件"""
-        combo.setProperty("focused", False)
-        combo.setStyleSheet("")
-        self.style().unpolish(combo)
-        self.style().polish(combo)
-        
-    def apply_stylesheet(self):
-        """应用自定义样式表"""
-        stylesheet = """
-        /* 整体样式 - 液态玻璃效果 */
-        QDialog {
-            background-color: rgba(245, 247, 250, 0.85);
-            color: #2c3e50;
-        }
-        
-        /* 分组框样式 - 液态玻璃效果 */
-        QGroupBox {
-            font-weight: bold;
-            border: 1px solid rgba(189, 195, 199, 0.6);
-            border-radius: 16px;
-            margin-top: 16px;
-            padding-top: 16px;
-            background-color: rgba(255, 255, 255, 0.7);
-        }
-        
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            left: 15px;
-            padding: 0 8px;
-            color: #3498db;
-        }
-        
-        /* 按钮样式 */
-        QPushButton {
-            background-color: #3498db;
-            color: white;
-            border: none;
-            border-radius: 8px;
-            padding: 8px 16px;
-            font-weight: bold;
-            min-width: 80px;
-            margin: 1px;
-        }
-        
-        QPushButton:hover {
-            background-color: #2980b9;
-            margin: 0px;
-            border: 1px solid #1c6ea4;
-        }
-        
-        QPushButton:pressed {
-            background-color: #1c6ea4;
-            margin: 2px 0px 0px 2px;
-        }
-        
-        /* 输入框样式 */
-        QSpinBox, QComboBox {
-            border: 1px solid rgba(189, 195, 199, 0.8);
-            border-radius: 8px;
-            padding: 6px;
-            background-color: rgba(255, 255, 255, 0.7);
-            min-height: 24px;
-        }
-        
-        QSpinBox:focus, QComboBox:focus, QSpinBox:hover, QComboBox:hover {
-            border: 2px solid #3498db;
-            background-color: rgba(255, 255, 255, 0.9);
-        }
-        
-        QComboBox::drop-down {
-            border: none;
-            width: 24px;
-        }
-        
-        QComboBox::down-arrow {
-            image: url(none);
-            width: 14px;
-            height: 14px;
-        }
-        
-        /* 标签样式 */
-        QLabel {
-            color: #2c3e50;
-        }
-        
-        /* 表单样式 */
-        QFormLayout Label {
-            min-width: 80px;
-        }
-        """
-        
-        self.setStyleSheet(stylesheet)
+            button.installEventFilter(self.effect_filter)
+        
+        # 输入框和下拉框焦点
+        for widget in self.findChildren(QAbstractSpinBox) + self.findChildren(QComboBox):
+            widget.setProperty("focused", False)
+            widget.installEventFilter(self.effect_filter)
         
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -269,7 +119,7 @@ class SettingsDialog(QDialog):
         welcome_label = QLabel("个性化您的饮水方案")
         welcome_label.setAlignment(Qt.AlignCenter)
         welcome_label.setFont(QFont("微软雅黑", 14, QFont.Bold))
-        welcome_label.setStyleSheet("color: #3498db; margin-bottom: 15px;")
+        welcome_label.setObjectName("welcomeLabel")
         main_layout.addWidget(welcome_label)
         
         # 个人信息组
@@ -364,6 +214,12 @@ class SettingsDialog(QDialog):
         self.interval_spin.setMinimumHeight(36)  # 增加高度
         reminder_layout.addRow("提醒间隔:", self.interval_spin)
         
+        # 提醒方式（按饮水习惯时，落后于平时节奏会在间隔内提前提醒）
+        self.reminder_mode_combo = QComboBox()
+        self.reminder_mode_combo.addItems(REMINDER_MODE_LABELS)
+        self.reminder_mode_combo.setFixedHeight(36)
+        reminder_layout.addRow("提醒方式:", self.reminder_mode_combo)
+        
         # 每次饮水量
         self.amount_spin = StyledSpinBox()
         self.amount_spin.setRange(50, 500)
@@ -373,6 +229,23 @@ class SettingsDialog(QDialog):
         self.amount_spin.setMinimumHeight(36)  # 增加高度
         reminder_layout.addRow("每次饮水量:", self.amount_spin)
         
+        # 免打扰时段（默认不启用；开始和结束相同也表示不启用）
+        quiet_layout = QHBoxLayout()
+        quiet_layout.setSpacing(10)
+        self.quiet_check = QCheckBox("启用")
+        quiet_layout.addWidget(self.quiet_check)
+        self.quiet_start_edit = QTimeEdit()
+        self.quiet_end_edit = QTimeEdit()
+        for time_edit in (self.quiet_start_edit, self.quiet_end_edit):
+            time_edit.setDisplayFormat("HH:mm")
+            time_edit.setButtonSymbols(QAbstractSpinBox.NoButtons)
+            time_edit.setMinimumHeight(36)
+            self.quiet_check.toggled.connect(time_edit.setEnabled)
+        quiet_layout.addWidget(self.quiet_start_edit)
+        quiet_layout.addWidget(QLabel("至"))
+        quiet_layout.addWidget(self.quiet_end_edit)
+        reminder_layout.addRow("免打扰:", quiet_layout)
+        
         main_layout.addWidget(reminder_group)
         
         # 外观设置组
@@ -388,6 +261,18 @@ class SettingsDialog(QDialog):
         self.size_combo.setFixedHeight(36)
         appearance_layout.addRow("水瓶大小:", self.size_combo)
         
+        # 渲染质量设置 - 性能较差的电脑可固定为低档位
+        self.quality_combo = QComboBox()
+        self.quality_combo.addItems(QUALITY_MODE_LABELS)
+        self.quality_combo.setFixedHeight(36)
+        appearance_layout.addRow("渲染质量:", self.quality_combo)
+        
+        # 主题设置
+        self.theme_combo = QComboBox()
+        self.theme_combo.addItems(THEME_LABELS)
+        self.theme_combo.setFixedHeight(36)
+        appearance_layout.addRow("主题:", self.theme_combo)
+        
         main_layout.addWidget(appearance_group)
         
         # 按钮
@@ -395,15 +280,7 @@ class SettingsDialog(QDialog):
         button_layout.setSpacing(15)
         self.save_button = QPushButton("保存")
         self.cancel_button = QPushButton("取消")
-        self.cancel_button.setStyleSheet("""
-            background-color: #e74c3c;
-            color: white;
-            border: none;
-            border-radius: 8px;
-            padding: 8px 16px;
-            font-weight: bold;
-            min-width: 80px;
-        """)
+        self.cancel_button.setObjectName("cancelButton")
         
         self.save_button.setCursor(QCursor(Qt.PointingHandCursor))
         self.cancel_button.setCursor(QCursor(Qt.PointingHandCursor))
@@ -420,7 +297,7 @@ class SettingsDialog(QDialog):
         main_layout.addLayout(button_layout)
         
     def load_settings(self):
-        """从QSettings加载设置"""
+        """从QSettings加载设置（对话框复用时每次打开前调用，只刷新控件的值）"""
         # 性别
         if self.settings.value("gender", "male") == "male":
             self.male_radio.setChecked(True)
@@ -449,13 +326,34 @@ class SettingsDialog(QDialog):
         # 提醒间隔
         self.interval_spin.setValue(int(self.settings.value("reminder_interval", 60)))
         
+        # 提醒方式
+        reminder_mode = self.settings.value("reminder_mode", "adaptive")
+        self.reminder_mode_combo.setCurrentIndex(REMINDER_MODES.index(reminder_mode) if reminder_mode in REMINDER_MODES else 0)
+        
         # 每次饮水量
         self.amount_spin.setValue(int(self.settings.value("water_amount", 200)))
         
+        # 免打扰时段
+        self.quiet_start_edit.setTime(QTime.fromString(self.settings.value("quiet_start", "22:00"), "HH:mm"))
+        self.quiet_end_edit.setTime(QTime.fromString(self.settings.value("quiet_end", "08:00"), "HH:mm"))
+        quiet_enabled = self.settings.value("quiet_enabled", False, type=bool)
+        self.quiet_check.setChecked(quiet_enabled)
+        for time_edit in (self.quiet_start_edit, self.quiet_end_edit):
+            time_edit.setEnabled(quiet_enabled)
+        
         # 水瓶大小
         bottle_size = self.settings.value("bottle_size", "中等")
         size_index = ["小", "中等", "大", "超大"].index(bottle_size) if bottle_size in ["小", "中等", "大", "超大"] else 1
         self.size_combo.setCurrentIndex(size_index)
+        
+        # 渲染质量
+        quality_mode = self.settings.value("render_quality", "auto")
+        quality_index = QUALITY_MODES.index(quality_mode) if quality_mode in QUALITY_MODES else 0
+        self.quality_combo.setCurrentIndex(quality_index)
+        
+        # 主题
+        theme_name = self.settings.value("theme", DEFAULT_THEME)
+        self.theme_combo.setCurrentIndex(THEME_NAMES.index(theme_name) if theme_name in THEME_NAMES else 0)
     
     def save_settings(self):
         """保存设置到QSettings"""
@@ -469,12 +367,7 @@ class SettingsDialog(QDialog):
         self.settings.setValue("activity_level", self.activity_combo.currentIndex())
         
         # 计算模式
-        if self.standard_radio.isChecked():
-            self.settings.setValue("goal_mode", "standard")
-        elif self.formula_radio.isChecked():
-            self.settings.setValue("goal_mode", "formula")
-        else:
-            self.settings.setValue("goal_mode", "custom")
+        self.settings.setValue("goal_mode", self.goal_mode())
         
         # 自定义目标
         self.settings.setValue("custom_goal", self.custom_goal.value())
@@ -482,16 +375,38 @@ class SettingsDialog(QDialog):
         # 提醒间隔
         self.settings.setValue("reminder_interval", self.interval_spin.value())
         
+        # 提醒方式
+        self.settings.setValue("reminder_mode", REMINDER_MODES[self.reminder_mode_combo.currentIndex()])
+        
         # 每次饮水量
         self.settings.setValue("water_amount", self.amount_spin.value())
         
+        # 免打扰时段
+        self.settings.setValue("quiet_start", self.quiet_start_edit.time().toString("HH:mm"))
+        self.settings.setValue("quiet_end", self.quiet_end_edit.time().toString("HH:mm"))
+        self.settings.setValue("quiet_enabled", self.quiet_check.isChecked())
+        
         # 水瓶大小
         bottle_sizes = ["小", "中等", "大", "超大"]
         self.settings.setValue("bottle_size", bottle_sizes[self.size_combo.currentIndex()])
         
+        # 渲染质量
+        self.settings.setValue("render_quality", QUALITY_MODES[self.quality_combo.currentIndex()])
+        
+        # 主题
+        self.settings.setValue("theme", THEME_NAMES[self.theme_combo.currentIndex()])
+        
         # 计算每日目标并返回
         self.accept()
     
+    def goal_mode(self):
+        """当前选择的目标模式：standard、formula或custom"""
+        if self.standard_radio.isChecked():
+            return "standard"
+        elif self.formula_radio.isChecked():
+            return "formula"
+        return "custom"
+    
     def calculate_daily_goal(self):
         """根据设置计算每日饮水目标"""
         if self.standard_radio.isChecked():
@@ -0,0 +1,47 @@
+import time
+
+# 冷启动目标耗时（毫秒），超出时在跟踪报告中提示
+STARTUP_TARGET_MS = 500
+
+
+def _pad(text, width):
+    """按显示宽度（中文字符占两列）右侧补齐空格"""
+    display_width = sum(2 if ord(ch) > 0x2e80 else 1 for ch in text)
+    return text + " " * max(0, width - display_width)
+
+
+class StartupTrace:
+    """记录启动各阶段的耗时，使用 --trace-startup 启动时打印分阶段报告"""
+    def __init__(self, enabled=False, start=None):
+        self.enabled = enabled
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, name):
+        """结束一个阶段，记录从上一个标记到现在的耗时"""
+        now = time.perf_counter()
+        self.phases.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    def total_ms(self):
+        """从开始到最后一个标记的总耗时"""
+        return (self.last - self.start) * 1000
+
+    def report(self, target_ms=STARTUP_TARGET_MS):
+        """打印分阶段耗时（只打印一次）"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+
+        print("启动耗时分析:")
+        elapsed = 0.0
+        for name, ms in self.phases:
+            elapsed += ms
+            print(f"  {_pad(name, 20)}{ms:8.1f} ms  (累计 {elapsed:7.1f} ms)")
+
+        total = self.total_ms()
+        print(f"  {_pad('合计', 20)}{total:8.1f} ms")
+        if target_ms and total > target_ms:
+            print(f"  警告: 超出冷启动目标 {target_ms} ms")
@@ -0,0 +1,277 @@
+"""饮水记录的增量同步（不导入PyQt）
+
+每台设备上的每次变更（添加记录、删除记录、修改目标）都有一个单调递增的本机序号。
+同步时只推送上次确认之后的本机变更、只拉取上次拉取之后的服务器变更，分批传输；
+拉取到的变更只追加到日志（见DataManager），不会重写整个数据文件。
+
+    python sync.py serve --port 8766             启动本机的替身同步服务器（数据保存在内存中）
+    python cli.py sync http://127.0.0.1:8766     与服务器同步
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 每批传输的变更数
+SYNC_BATCH_SIZE = 200
+
+# 网络请求超时（秒）
+SYNC_TIMEOUT = 10.0
+
+DEFAULT_SYNC_PORT = 8766
+
+
+class SyncError(Exception):
+    """同步失败"""
+
+
+class SyncServer:
+    """内存中的同步服务器（也作为回环HTTP服务器的数据端）
+
+    服务器按接收顺序给变更分配服务器序号，拉取时按序号返回。
+    冲突规则与DataManager.apply_remote_changes相同：记录按id只接收一次，删除优先，
+    目标以修改时间较大的为准，因此最终结果与各设备的同步顺序无关。
+    """
+    def __init__(self):
+        self.changes = []          # 服务器序号 = 下标 + 1
+        self.record_ids = set()
+        self.deleted_ids = set()
+        self.goal_stamp = None
+        self.acks = {}             # 设备 -> 已确认的本机序号
+        self._lock = threading.Lock()
+
+    def push(self, device_id, changes):
+        """接收一批变更，返回已确认的最大本机序号（重发的变更会被忽略）"""
+        with self._lock:
+            acked = self.acks.get(device_id, 0)
+            for change in sorted(changes, key=lambda change: change["seq"]):
+                if change["seq"] <= acked:
+                    continue
+                if self._accept(change):
+                    self.changes.append(dict(change, origin=device_id))
+                acked = change["seq"]
+            self.acks[device_id] = acked
+            return {"ack": acked}
+
+    def pull(self, device_id, since, limit):
+        """返回服务器序号大于since的一批变更（不含该设备自己推送的）"""
+        with self._lock:
+            position = since
+            batch = []
+            while position < len(self.changes) and len(batch) < limit:
+                change = self.changes[position]
+                position += 1
+                if change["origin"] != device_id:
+                    batch.append(change)
+            return {"changes": batch, "next": position, "more": position < len(self.changes)}
+
+    def _accept(self, change):
+        kind = change.get("kind")
+        if kind == "add":
+            if change["id"] in self.record_ids or change["id"] in self.deleted_ids:
+                return False
+            self.record_ids.add(change["id"])
+            return True
+        if kind == "delete":
+            if change["id"] in self.deleted_ids:
+                return False
+            self.deleted_ids.add(change["id"])
+            return True
+        if kind == "goal":
+            if self.goal_stamp is not None and list(change["stamp"]) <= self.goal_stamp:
+                return False
+            self.goal_stamp = list(change["stamp"])
+            return True
+        return False
+
+
+class InProcessTransport:
+    """直接调用同一进程中的SyncServer（数据经过JSON往返，与网络传输一致）"""
+    def __init__(self, server, name="in-process"):
+        self.server = server
+        self.name = name
+
+    def push(self, device_id, changes):
+        return json.loads(json.dumps(self.server.push(device_id, json.loads(json.dumps(changes)))))
+
+    def pull(self, device_id, since, limit):
+        return json.loads(json.dumps(self.server.pull(device_id, since, limit)))
+
+
+class HttpTransport:
+    """通过HTTP访问同步服务器（POST /push 和 /pull，JSON格式）"""
+    def __init__(self, url, timeout=SYNC_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.name = self.url
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except (OSError, ValueError) as e:
+            raise SyncError(f"无法连接同步服务器: {e}")
+
+    def push(self, device_id, changes):
+        return self._post("/push", {"device": device_id, "changes": changes})
+
+    def pull(self, device_id, since, limit):
+        return self._post("/pull", {"device": device_id, "since": since, "limit": limit})
+
+
+class LoopbackSyncServer:
+    """在本机端口上提供SyncServer的HTTP替身服务器（后台线程）"""
+    def __init__(self, server=None, port=0, host="127.0.0.1"):
+        self.server = server or SyncServer()
+        sync_server = self.server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    if self.path == "/push":
+                        reply = sync_server.push(payload["device"], payload["changes"])
+                    elif self.path == "/pull":
+                        reply = sync_server.pull(payload["device"], payload["since"], payload["limit"])
+                    else:
+                        self.send_error(404)
+                        return
+                except (ValueError, KeyError, TypeError):
+                    self.send_error(400)
+                    return
+                body = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="sync-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ForwardingStore:
+    """在后台线程中同步时代替DataManager交给SyncEngine
+
+    读取本机变更和应用拉取到的变更都通过submit(函数, *参数)交给持有数据的线程执行
+    （界面中为GuiThreadExecutor.submit），并等待结果；网络请求留在调用线程中。
+    """
+    def __init__(self, data_manager, submit):
+        self.data_manager = data_manager
+        self.submit = submit
+        self.device_id = data_manager.device_id
+        self.data_dir = data_manager.data_dir
+
+    def get_local_changes(self, since_seq, limit):
+        return self.submit(self.data_manager.get_local_changes, since_seq, limit).result()
+
+    def apply_remote_changes(self, changes):
+        return self.submit(self.data_manager.apply_remote_changes, changes).result()
+
+
+class SyncEngine:
+    """在DataManager和同步服务器之间推送、拉取增量变更
+
+    同步进度（已确认推送到的本机序号、已拉取到的服务器序号）按服务器分别保存在
+    sync_state.json 中，每批完成后立即保存，中断后下次从断点继续。
+    """
+    def __init__(self, data_manager, transport, batch_size=SYNC_BATCH_SIZE):
+        self.data_manager = data_manager
+        self.transport = transport
+        self.batch_size = batch_size
+        self.state_file = os.path.join(data_manager.data_dir, "sync_state.json")
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                states = json.load(f)
+        except (OSError, ValueError):
+            states = {}
+        return states.get(self.transport.name, {"pushed": 0, "pulled": 0})
+
+    def _save_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                states = json.load(f)
+        except (OSError, ValueError):
+            states = {}
+        states[self.transport.name] = self.state
+        temp_file = self.state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(states, f)
+        os.replace(temp_file, self.state_file)
+
+    def push(self):
+        """分批推送本机变更，返回推送的数量"""
+        device_id = self.data_manager.device_id
+        pushed = 0
+        while True:
+            changes = self.data_manager.get_local_changes(self.state["pushed"], self.batch_size)
+            if not changes:
+                return pushed
+            reply = self.transport.push(device_id, changes)
+            if reply.get("ack", 0) < changes[-1]["seq"]:
+                raise SyncError("同步服务器没有确认全部变更")
+            self.state["pushed"] = reply["ack"]
+            self._save_state()
+            pushed += len(changes)
+
+    def pull(self):
+        """分批拉取其他设备的变更，返回实际生效的数量"""
+        device_id = self.data_manager.device_id
+        applied = 0
+        while True:
+            reply = self.transport.pull(device_id, self.state["pulled"], self.batch_size)
+            applied += self.data_manager.apply_remote_changes(reply["changes"])
+            self.state["pulled"] = reply["next"]
+            self._save_state()
+            if not reply.get("more"):
+                return applied
+
+    def sync(self):
+        """先推送再拉取，返回(推送数量, 生效的拉取数量)"""
+        return self.push(), self.pull()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="饮水记录同步服务器（替身）")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    serve_parser = subparsers.add_parser("serve", help="在本机端口上启动内存中的同步服务器")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_SYNC_PORT)
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args(argv)
+
+    loopback = LoopbackSyncServer(port=args.port, host=args.host)
+    print(f"同步服务器已启动: {loopback.url}（Ctrl+C 退出）")
+    try:
+        loopback.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loopback.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入仓库根目录下的模块；Qt使用不需要显示器的平台插件
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """数据目录（~/.water_bottle）放在临时目录中"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    return tmp_path
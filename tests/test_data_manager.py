@@ -0,0 +1,103 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+
+from data_manager import DataManager
+from predictor import IntakePredictor
+
+
+def count_saves(manager, monkeypatch):
+    saves = []
+    save_data = manager.save_data
+    monkeypatch.setattr(manager, "save_data", lambda: (saves.append(1), save_data())[1])
+    return saves
+
+
+def test_update_settings_saves_once(home, monkeypatch):
+    manager = DataManager()
+    saves = count_saves(manager, monkeypatch)
+    goals = []
+    manager.goal_changed.connect(goals.append)
+    user_info = {"gender": "female", "weight": 55, "activity_level": 1}
+
+    manager.update_settings(user_info, 1900, "formula")
+
+    assert len(saves) == 1
+    assert goals == [1900]
+    snapshot = DataManager().get_day_goal_info(date.today().strftime("%Y-%m-%d"))
+    assert snapshot == {"goal": 1900, "mode": "formula", "user_info": user_info}
+
+
+def test_update_settings_without_changes_does_not_write(home, monkeypatch):
+    manager = DataManager()
+    manager.update_settings({"gender": "male", "weight": 70, "activity_level": 0}, 2000, "formula")
+    saves = count_saves(manager, monkeypatch)
+
+    manager.update_settings({"gender": "male", "weight": 70, "activity_level": 0}, 2000, "formula")
+
+    assert saves == []
+
+
+def days_ago(days):
+    return (date.today() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def remote_add(record_id, day, time, amount):
+    return {"kind": "add", "seq": 1, "origin": "other", "id": record_id, "day": day,
+            "time": time, "amount": amount}
+
+
+def test_synced_records_update_intake_model_incrementally(home):
+    manager = DataManager()
+    manager.apply_remote_changes([remote_add("other-1", days_ago(2), "09:10", 300),
+                                  remote_add("other-2", days_ago(5), "14:00", 200),
+                                  remote_add("other-3", days_ago(40), "08:00", 250)])
+    manager.apply_remote_changes([{"kind": "delete", "seq": 4, "origin": "other", "id": "other-2",
+                                   "day": days_ago(5)}])
+
+    reloaded = IntakePredictor()
+    reloaded.load(manager.hourly_totals)
+    assert manager.intake_model.hour_sums == reloaded.hour_sums
+    assert manager.intake_model.day_count == reloaded.day_count == 1
+    assert list(manager.intake_model.history) == list(reloaded.history)
+
+
+def test_last_record_time_follows_adds_and_deletes(home):
+    manager = DataManager()
+    assert manager.get_last_record_time() is None
+    manager.apply_remote_changes([remote_add("other-1", days_ago(1), "20:30", 300),
+                                  remote_add("other-2", days_ago(3), "09:00", 200)])
+    yesterday = datetime.strptime(days_ago(1), "%Y-%m-%d")
+    assert manager.get_last_record_time() == yesterday.replace(hour=20, minute=30)
+
+    manager.apply_remote_changes([{"kind": "delete", "seq": 3, "origin": "other", "id": "other-1",
+                                   "day": days_ago(1)}])
+    assert manager.get_last_record_time() == datetime.strptime(f"{days_ago(3)} 09:00", "%Y-%m-%d %H:%M")
+
+    manager.add_water_record(250)
+    assert manager.get_last_record_time().date() == date.today()
+
+
+def test_read_only_load_does_not_write(home):
+    data_dir = home / ".water_bottle"
+    data_dir.mkdir()
+    # 旧版本的数据：记录没有id，也没有本机标识和目标快照
+    legacy = {"user_info": {"weight": 60, "gender": "female", "activity_level": 0}, "daily_goal": 1800,
+              "records": {days_ago(1): [{"time": "08:00", "amount": 300}]}}
+    data_file = data_dir / "water_data.json"
+    data_file.write_text(json.dumps(legacy), encoding="utf-8")
+    before = data_file.read_bytes()
+
+    manager = DataManager(read_only=True)
+
+    assert manager.daily_totals[days_ago(1)] == 300
+    assert manager.achievements.summary()
+    manager.roll_over_day()
+    assert data_file.read_bytes() == before
+    assert os.listdir(data_dir) == ["water_data.json"]
+
+
+def test_read_only_load_without_data_dir(home):
+    manager = DataManager(read_only=True)
+    assert manager.get_today_total() == 0
+    assert not (home / ".water_bottle").exists()
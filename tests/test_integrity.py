@@ -0,0 +1,72 @@
+import json
+from datetime import date
+
+import pytest
+
+from data_manager import DataManager
+from integrity import MAX_RECORD_AMOUNT, valid_amount
+
+
+def test_valid_amount_range():
+    assert valid_amount(1)
+    assert valid_amount(MAX_RECORD_AMOUNT)
+    assert not valid_amount(0)
+    assert not valid_amount(MAX_RECORD_AMOUNT + 1)
+    assert not valid_amount(250.0)
+    assert not valid_amount("250")
+
+
+def test_out_of_range_amount_is_rejected_without_adding_anything(home):
+    manager = DataManager()
+    with pytest.raises(ValueError):
+        manager.add_water_records([200, MAX_RECORD_AMOUNT + 1])
+    assert manager.get_today_total() == 0
+    assert DataManager().get_today_total() == 0
+
+
+def test_out_of_range_remote_record_is_ignored(home):
+    manager = DataManager()
+    today = date.today().strftime("%Y-%m-%d")
+    applied = manager.apply_remote_changes([
+        {"kind": "add", "seq": 1, "origin": "other", "id": "other-1", "day": today, "time": "09:00", "amount": 300},
+        {"kind": "add", "seq": 2, "origin": "other", "id": "other-2", "day": today, "time": "09:30", "amount": 20000},
+    ])
+    assert manager.get_today_total() == 300
+    assert DataManager().get_today_total() == 300
+    assert applied >= 1
+
+
+def test_invalid_record_with_matching_checksum_keeps_the_rest_of_the_month(home):
+    manager = DataManager()
+    manager.add_water_record(100)
+    manager.save_data()
+    manager.create_backup()
+    manager.add_water_records([200, 300])
+    # 旧版本写入的超出范围的记录（校验值是按它计算的）
+    today = date.today().strftime("%Y-%m-%d")
+    manager.data["records"][today].append({"time": "10:00", "amount": 20000, "id": "legacy-x", "seq": 999})
+    manager.save_data()
+
+    reloaded = DataManager()
+    assert reloaded.get_today_total() == 600
+    assert any("格式错误" in issue for issue in reloaded.integrity_issues)
+
+
+def test_damaged_segment_is_restored_from_backup(home):
+    manager = DataManager()
+    manager.add_water_record(100)
+    manager.save_data()
+    manager.create_backup()
+    manager.add_water_record(200)
+    manager.save_data()
+
+    with open(manager.data_file, encoding="utf-8") as f:
+        data = json.load(f)
+    today = date.today().strftime("%Y-%m-%d")
+    data["records"][today][0]["amount"] = 150  # 内容被改动，校验值不再相符
+    with open(manager.data_file, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    reloaded = DataManager()
+    assert reloaded.get_today_total() == 100
+    assert any("已从备份恢复" in issue for issue in reloaded.integrity_issues)
@@ -0,0 +1,61 @@
+import socket
+
+import pytest
+
+from data_manager import DataManager
+from integrity import MAX_RECORD_AMOUNT
+from local_api import LocalApiServer, StoreBackend, api_request
+
+
+@pytest.fixture
+def server(home):
+    manager = DataManager()
+    server = LocalApiServer(StoreBackend(manager), port=0)
+    server.start()
+    yield server, manager
+    server.stop()
+
+
+def raw_request(port, data):
+    """发送原始请求，返回状态行"""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as connection:
+        connection.sendall(data)
+        connection.shutdown(socket.SHUT_WR)
+        response = b""
+        while True:
+            chunk = connection.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+    return response.split(b"\r\n", 1)[0].decode("ascii")
+
+
+def test_post_records_adds_amounts(server):
+    api, manager = server
+    status, reply = api_request("POST", "/api/records", {"records": [{"amount": 200}, {"amount": 150}]},
+                                port=api.port)
+    assert status == 200
+    assert reply["added"] == 2
+    assert manager.get_today_total() == 350
+
+
+def test_post_records_rejects_out_of_range_amounts(server):
+    api, manager = server
+    status, _ = api_request("POST", "/api/records", {"records": [{"amount": MAX_RECORD_AMOUNT + 1}]},
+                            port=api.port)
+    assert status == 400
+    assert manager.get_today_total() == 0
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5"])
+def test_invalid_content_length_is_a_bad_request(server, length):
+    api, _ = server
+    status_line = raw_request(api.port, b"POST /api/records HTTP/1.1\r\nContent-Length: " + length +
+                              b"\r\n\r\n{}")
+    assert status_line.startswith("HTTP/1.1 400")
+
+
+def test_truncated_body_is_a_bad_request(server):
+    api, _ = server
+    status_line = raw_request(api.port, b"POST /api/records HTTP/1.1\r\nContent-Length: 100\r\n\r\n{}")
+    assert status_line.startswith("HTTP/1.1 400")
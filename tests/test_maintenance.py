@@ -0,0 +1,107 @@
+import json
+import os
+from datetime import date, timedelta
+
+from data_manager import DataManager, DETAIL_RETENTION_DAYS
+
+
+def days_ago(days):
+    return (date.today() - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def add_history(manager, days, amounts=(250, 250)):
+    """在过去的若干天里各添加几条本机记录"""
+    for offset in range(days, 0, -1):
+        day = days_ago(offset)
+        for index, amount in enumerate(amounts):
+            seq = manager._next_seq()
+            record_id = f"{manager.device_id}-{seq}"
+            manager._apply_add(day, {"time": f"{8 + index:02d}:00", "amount": amount, "id": record_id, "seq": seq})
+            manager.local_changes.append((seq, "add", record_id))
+        manager._stamp_day_goal(day)
+    manager.save_data()
+
+
+def test_compact_prunes_details_but_keeps_daily_totals(home):
+    manager = DataManager()
+    add_history(manager, DETAIL_RETENTION_DAYS + 40)
+    old_day = days_ago(DETAIL_RETENTION_DAYS + 10)
+
+    manager.compact()
+
+    reloaded = DataManager()
+    assert old_day not in reloaded.data["records"]
+    assert reloaded.daily_totals[old_day] == 500
+    assert "user_info" not in reloaded.get_day_goal_info(old_day)
+    assert reloaded.get_month_rollup(old_day[:7])["total"] > 0
+    assert reloaded.verify_store()["healthy"]
+    # 已清理的日期不会被同步或重放日志重新加入
+    assert not reloaded._apply_add(old_day, {"time": "09:00", "amount": 100, "id": "other-1", "seq": 1})
+
+
+def test_compact_with_keep_days_removes_totals(home):
+    manager = DataManager()
+    add_history(manager, 60)
+
+    manager.compact(30)
+
+    reloaded = DataManager()
+    assert days_ago(45) not in reloaded.daily_totals
+    assert reloaded.daily_totals[days_ago(10)] == 500
+
+
+def test_background_checkpoint_keeps_later_journal_entries(home):
+    manager = DataManager()
+    add_history(manager, 5)
+    for _ in manager.maintenance_steps():
+        pass
+
+    token, snapshot = manager.begin_checkpoint()
+    manager.add_water_record(300)  # 快照之后的新记录只在日志中
+    manager.write_checkpoint(snapshot)
+    assert manager.finish_checkpoint(token)
+
+    reloaded = DataManager()
+    assert reloaded.get_today_total() == 300
+    with open(manager.backup_file, encoding="utf-8") as f:
+        assert days_ago(1) in json.load(f)["records"]
+
+
+def test_checkpoint_after_a_newer_save_still_refreshes_the_backup(home):
+    manager = DataManager()
+    add_history(manager, 5)
+
+    token, snapshot = manager.begin_checkpoint()
+    manager.set_daily_goal(2500)  # 同步保存，数据文件比快照新
+    manager.write_checkpoint(snapshot)
+    assert not manager.finish_checkpoint(token)
+
+    assert DataManager().get_daily_goal() == 2500
+    with open(manager.backup_file, encoding="utf-8") as f:
+        assert days_ago(1) in json.load(f)["records"]
+
+
+def test_vacuum_removes_only_its_own_leftovers(home):
+    manager = DataManager()
+    foreign = os.path.join(manager.data_dir, "notes.tmp")
+    leftovers = [manager.data_file + ".tmp", manager.journal_file + ".tmp", manager.backup_file + ".checkpoint"]
+    for path in leftovers + [foreign]:
+        open(path, "w").close()
+
+    for _ in manager.maintenance_steps():
+        pass
+
+    assert os.path.exists(foreign)
+    assert not any(os.path.exists(path) for path in leftovers)
+
+
+def test_vacuum_keeps_files_of_a_checkpoint_in_flight(home):
+    manager = DataManager()
+    token, snapshot = manager.begin_checkpoint()
+    manager.write_checkpoint(snapshot)
+
+    for _ in manager.maintenance_steps():
+        pass
+
+    assert os.path.exists(manager.data_file + ".checkpoint")
+    assert manager.finish_checkpoint(token)
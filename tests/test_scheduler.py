@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+import water_bottle
+from scheduler import DeadlineScheduler, QuietHours, next_midnight
+from water_bottle import WaterBottle
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MidnightBottle:
+    """只借用WaterBottle中安排午夜事件的方法，换日和维护只记下调用"""
+    schedule_day_rollover = WaterBottle.schedule_day_rollover
+    schedule_maintenance = WaterBottle.schedule_maintenance
+    on_day_rollover = WaterBottle.on_day_rollover
+    on_maintenance_due = WaterBottle.on_maintenance_due
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.calls = []
+
+    def check_day_rollover(self):
+        self.calls.append("rollover")
+
+    def start_maintenance(self):
+        self.calls.append("maintenance")
+
+
+def test_due_events_run_in_deadline_order(app):
+    clock = FakeClock(1000.0)
+    scheduler = DeadlineScheduler(clock=clock)
+    calls = []
+    scheduler.schedule("b", 1020.0, lambda: calls.append("b"))
+    scheduler.schedule("a", 1010.0, lambda: calls.append("a"))
+    scheduler.schedule("c", 2000.0, lambda: calls.append("c"))
+
+    clock.now = 1030.0
+    scheduler.run_due()
+
+    assert calls == ["a", "b"]
+    assert scheduler.next_due() == 2000.0
+
+
+def test_rescheduled_event_is_skipped_in_the_same_wakeup(app):
+    clock = FakeClock(1000.0)
+    scheduler = DeadlineScheduler(clock=clock)
+    calls = []
+    scheduler.schedule("first", 1010.0, lambda: (calls.append("first"),
+                                                   scheduler.schedule("second", 5000.0, lambda: None)))
+    scheduler.schedule("second", 1010.0, lambda: calls.append("second"))
+
+    clock.now = 1010.0
+    scheduler.run_due()
+
+    assert calls == ["first"]
+    assert scheduler.due_time("second") == 5000.0
+
+
+def test_rollover_and_maintenance_both_run_at_midnight(app, monkeypatch):
+    midnight = next_midnight()
+    clock = FakeClock(midnight - 60)
+    monkeypatch.setattr(water_bottle, "next_midnight", lambda: next_midnight(clock.now))
+    bottle = MidnightBottle(DeadlineScheduler(clock=clock))
+    bottle.schedule_day_rollover()
+    bottle.schedule_maintenance()
+
+    clock.now = midnight + 1
+    bottle.scheduler.run_due()
+
+    # 两者都在同一次唤醒中执行，并各自安排到下一个午夜
+    assert sorted(bottle.calls) == ["maintenance", "rollover"]
+    following = next_midnight(midnight + 1)
+    assert bottle.scheduler.due_time("rollover") == following
+    assert bottle.scheduler.due_time("maintenance") == following
+
+
+def test_quiet_hours_are_disabled_by_default():
+    night = datetime(2024, 1, 1, 23, 30)
+    assert not QuietHours().contains(night)
+    assert QuietHours(active=True).contains(night)
+    assert not QuietHours("22:00", "22:00", active=True).enabled
+
+
+def test_quiet_hours_postpone_to_the_end_of_the_period():
+    quiet = QuietHours("22:00", "08:00", active=True)
+    night = datetime(2024, 1, 1, 23, 30)
+    assert datetime.fromtimestamp(quiet.adjust(night.timestamp())) == datetime(2024, 1, 2, 8, 0)
+    noon = datetime(2024, 1, 1, 12, 0)
+    assert quiet.adjust(noon.timestamp()) == noon.timestamp()
@@ -0,0 +1,192 @@
+from datetime import date
+
+import pytest
+
+from data_manager import DataManager
+from sync import SyncServer, SyncEngine, InProcessTransport, LoopbackSyncServer, HttpTransport
+
+TODAY = date.today().strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def device(tmp_path, monkeypatch):
+    """open_device(名称)：每台设备的数据目录在各自的临时主目录中"""
+    def open_device(name):
+        home = tmp_path / name
+        home.mkdir(exist_ok=True)
+        monkeypatch.setenv("HOME", str(home))
+        monkeypatch.setenv("USERPROFILE", str(home))
+        return DataManager()
+    return open_device
+
+
+def engines(server, *managers):
+    return [SyncEngine(manager, InProcessTransport(server), batch_size=2) for manager in managers]
+
+
+def add_change(record_id, amount, day=TODAY, time="09:00"):
+    return {"kind": "add", "seq": 1, "origin": "other", "id": record_id, "day": day, "time": time, "amount": amount}
+
+
+def delete_change(record_id, day=TODAY):
+    return {"kind": "delete", "seq": 2, "origin": "other", "id": record_id, "day": day}
+
+
+def goal_change(value, stamp):
+    return {"kind": "goal", "seq": 3, "origin": stamp[1], "value": value, "stamp": stamp}
+
+
+@pytest.mark.parametrize("order", ["ab", "ba"])
+def test_adds_from_both_devices_converge(device, order):
+    a, b = device("a"), device("b")
+    a.add_water_records([100, 200])
+    b.add_water_records([50])
+    sync = dict(zip("ab", engines(SyncServer(), a, b)))
+
+    for name in order + order:
+        sync[name].sync()
+
+    assert a.get_today_total() == b.get_today_total() == 350
+    assert set(a.record_days) == set(b.record_days)
+
+
+@pytest.mark.parametrize("order", ["ab", "ba"])
+def test_delete_wins_on_both_devices(device, order):
+    a, b = device("a"), device("b")
+    sync = dict(zip("ab", engines(SyncServer(), a, b)))
+    a.add_water_record(300)
+    sync["a"].sync()
+    sync["b"].sync()
+    assert b.get_today_total() == 300
+
+    # b删除这条记录的同时a又添加了一条
+    b.reset_today_records()
+    a.add_water_record(200)
+    for name in order + order:
+        sync[name].sync()
+
+    assert a.get_today_total() == b.get_today_total() == 200
+
+
+@pytest.mark.parametrize("changes", [
+    [add_change("other-1", 250), delete_change("other-1")],
+    [delete_change("other-1"), add_change("other-1", 250)],
+])
+def test_delete_and_add_in_either_order(device, changes):
+    manager = device("a")
+    manager.apply_remote_changes(changes)
+    assert manager.get_today_total() == 0
+    # 删除过的记录不会再出现
+    manager.apply_remote_changes([add_change("other-1", 250)])
+    assert manager.get_today_total() == 0
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_latest_goal_wins_in_either_order(device, reverse):
+    manager = device("a")
+    changes = [goal_change(2000, [100.0, "device-a"]), goal_change(2400, [200.0, "device-b"])]
+    if reverse:
+        changes.reverse()
+    for change in changes:
+        manager.apply_remote_changes([change])
+    assert manager.get_daily_goal() == 2400
+
+
+def test_goal_conflict_between_devices_converges(device):
+    a, b = device("a"), device("b")
+    sync_a, sync_b = engines(SyncServer(), a, b)
+    a.set_daily_goal(2000)
+    b.set_daily_goal(2100)
+    b.sync_info["goal_stamp"][0] = a.sync_info["goal_stamp"][0] + 1  # b的修改更晚
+
+    for engine in (sync_a, sync_b, sync_a, sync_b):
+        engine.sync()
+
+    assert a.get_daily_goal() == b.get_daily_goal() == 2100
+
+
+def test_journal_replay_is_idempotent(device):
+    a, b = device("a"), device("b")
+    sync_a, sync_b = engines(SyncServer(), a, b)
+    b.add_water_records([100, 200, 300])
+    b.reset_today_records()
+    b.add_water_record(400)
+    sync_b.sync()
+    sync_a.sync()
+
+    reloaded = device("a")
+    assert reloaded.get_today_total() == a.get_today_total() == 400
+    assert reloaded.local_changes == a.local_changes
+    assert reloaded.sync_info["next_seq"] == a.sync_info["next_seq"]
+
+    # 日志中的条目重放两次，结果不变
+    with open(a.journal_file, encoding="utf-8") as f:
+        journal = f.read()
+    with open(a.journal_file, "a", encoding="utf-8") as f:
+        f.write(journal)
+    assert device("a").get_today_total() == 400
+
+    # 再次拉取同样的变更不会生效
+    assert SyncEngine(reloaded, InProcessTransport(sync_a.transport.server, "again")).pull() == 0
+    assert reloaded.get_today_total() == 400
+
+
+def test_sync_does_not_rewrite_the_data_file(device):
+    a, b = device("a"), device("b")
+    sync_a, sync_b = engines(SyncServer(), a, b)
+    a.save_data()
+    b.add_water_records([100, 200])
+    b.set_daily_goal(2600)
+    with open(a.data_file, "rb") as f:
+        before = f.read()
+
+    sync_b.sync()
+    sync_a.sync()
+
+    assert a.get_today_total() == 300
+    assert a.get_daily_goal() == 2600
+    with open(a.data_file, "rb") as f:
+        assert f.read() == before
+    assert a.journal_entries > 0
+
+
+def test_loopback_http_server(device):
+    a, b = device("a"), device("b")
+    a.add_water_records([150, 250])
+    server = LoopbackSyncServer()
+    url = server.start()
+    try:
+        assert SyncEngine(a, HttpTransport(url)).sync()[0] == 2
+        SyncEngine(b, HttpTransport(url)).sync()
+    finally:
+        server.stop()
+    assert b.get_today_total() == 400
+
+
+class BatchTransport:
+    """只返回一批固定变更的传输（模拟格式错误的服务器数据）"""
+    name = "batch"
+
+    def __init__(self, changes):
+        self.changes = changes
+
+    def pull(self, device_id, since, limit):
+        return {"changes": self.changes, "next": len(self.changes), "more": False}
+
+
+def test_malformed_change_is_skipped_and_the_rest_is_journaled(device):
+    a = device("a")
+    changes = [add_change("other-1", 300),
+               {"kind": "add", "seq": 2, "origin": "other", "id": "other-2", "time": "10:00", "amount": 200},
+               add_change("other-3", 250, time="11:00"),
+               {"kind": "delete", "seq": 4, "origin": "other", "id": "other-1", "day": "2024-13-40"},
+               goal_change(2300, [1.0, "other"])]
+
+    assert SyncEngine(a, BatchTransport(changes)).pull() > 0
+
+    assert a.get_today_total() == 550
+    assert a.get_daily_goal() == 2300
+    reloaded = device("a")
+    assert reloaded.get_today_total() == 550
+    assert reloaded.get_daily_goal() == 2300
+    assert "other-2" not in reloaded.record_days
@@ -0,0 +1,67 @@
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QColor
+
+from app_resources import read_text_resource
+
+# 可选主题（名称 -> 显示名称），样式表位于 resources/themes/<名称>.qss
+THEMES = {
+    "light": "浅色",
+    "dark": "深色",
+}
+THEME_NAMES = list(THEMES)
+THEME_LABELS = list(THEMES.values())
+DEFAULT_THEME = "light"
+
+# 水瓶和统计图表自绘部分使用的主题颜色
+THEME_COLORS = {
+    "light": {
+        "text": QColor(50, 50, 80),
+        "status_text": QColor(100, 100, 120),
+        "grid": QColor(189, 195, 199, 150),
+    },
+    "dark": {
+        "text": QColor(230, 232, 240),
+        "status_text": QColor(200, 202, 215),
+        "grid": QColor(90, 96, 108, 200),
+    },
+}
+
+# 已读取的样式表缓存，切换回来时无需再次读取
+_stylesheet_cache = {}
+_current_theme = None
+
+
+def load_stylesheet(name):
+    """读取主题样式表（缓存）"""
+    if name not in _stylesheet_cache:
+        _stylesheet_cache[name] = read_text_resource(f"themes/{name}.qss")
+    return _stylesheet_cache[name]
+
+
+def current_theme():
+    """当前应用的主题名称"""
+    return _current_theme or DEFAULT_THEME
+
+
+def theme_color(role, name=None):
+    """获取主题颜色"""
+    return THEME_COLORS[name or current_theme()][role]
+
+
+def apply_theme(name, app=None):
+    """在应用级别设置主题样式表
+
+    菜单、消息框和设置对话框都通过objectName匹配这一份样式表，
+    只有主题真正变化时才会设置（即Qt重新解析）一次。
+    主题发生变化时返回True。
+    """
+    global _current_theme
+    if name not in THEMES:
+        name = DEFAULT_THEME
+    if name == _current_theme:
+        return False
+
+    app = app or QApplication.instance()
+    app.setStyleSheet(load_stylesheet(name))
+    _current_theme = name
+    return True
@@ -3,27 +3,119 @@ import os
 import json
 import math
 import time
+import argparse
+import threading
 from datetime import datetime, date
+
+# 进程开始导入模块的时间，用于 --trace-startup
+STARTUP_BEGIN = time.perf_counter()
+
+# 已有实例在运行时，在导入PyQt之前把命令转发给它并立即退出
+import ipc
+if __name__ == "__main__" and ipc.forward_command_line(sys.argv):
+    sys.exit(0)
+
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QLabel, 
                             QSystemTrayIcon, QMenu, QAction, QGraphicsDropShadowEffect,
                             QMessageBox, QStyleFactory, QGraphicsBlurEffect)
-from PyQt5.QtCore import Qt, QPropertyAnimation, QPoint, QTimer, pyqtProperty, QRect, QSize, QEasingCurve
+from PyQt5.QtCore import Qt, QPropertyAnimation, QPoint, QTimer, pyqtProperty, QRect, QSize, QEasingCurve, QPointF, QSettings
 from PyQt5.QtGui import (QPainter, QColor, QPen, QBrush, QPainterPath, QFont, QIcon, QPixmap, 
-                        QLinearGradient, QRadialGradient, QPalette, QFontDatabase)
+                        QLinearGradient, QRadialGradient, QPalette, QFontDatabase, QFontInfo,
+                        QStaticText, QTransform, QRegion)
 
-from settings_dialog import SettingsDialog
+# 设置对话框在首次使用时才导入，以加快冷启动
 from data_manager import DataManager
+from integrity import valid_amount, MAX_RECORD_AMOUNT
+from render_quality import RenderQualityController
+from particles import BubbleParticleSystem
+from startup_trace import StartupTrace
+from app_resources import load_app_icon
+from theme import apply_theme, theme_color, DEFAULT_THEME
+from scheduler import DeadlineScheduler, QuietHours, next_midnight
+from maintenance import MaintenanceWorker, describe_progress
+from notifications import NotificationCenter, BubbleSink, TraySink, LogSink
+from instance_server import InstanceServer, GuiThreadExecutor
+
+# 表情对应的状态文字
+STATUS_TEXTS = {
+    "thirsty": "渴了~",
+    "normal": "还行",
+    "happy": "不错!",
+    "excited": "棒极了!"
+}
+
+# 表情对应的百分比文字颜色，未列出的表情使用主题文字颜色
+PERCENTAGE_COLORS = {
+    "thirsty": QColor(255, 100, 100),  # 红色，表示需要喝水
+    "excited": QColor(50, 200, 50),    # 绿色，表示完成目标
+}
+
+# 水面波浪幅度（像素）
+WAVE_HEIGHT = 8
+
+# 安排提醒时距当前至少间隔的秒数（例如启动时提醒已过期）
+REMINDER_MIN_DELAY = 60
 
-# 尝试导入图标生成模块
-try:
-    from create_icon import create_water_bottle_icon
-except ImportError:
-    create_water_bottle_icon = None
+# 稍后提醒的分钟数
+SNOOZE_MINUTES = 10
+
+# 非界面事件允许延后的秒数，相近的事件会合并到同一次唤醒
+REMINDER_SLACK = 120
+ROLLOVER_SLACK = 60
+MAINTENANCE_SLACK = 30 * 60
+
+# 按饮水习惯提醒时，两次提醒（或喝水后到提醒）之间的最短分钟数
+ADAPTIVE_MIN_GAP_MINUTES = 20
+
+def resolve_app_font(point_size=10):
+    """解析应用字体
+    
+    优先使用上次启动时缓存的字体族；只有缓存失效时才检查系统字体，
+    最后才尝试注册msyh.ttc字体文件。都不可用时也记下结果（font_fallback），
+    之后的启动直接使用默认字体族，直到系统中装上了它。
+    """
+    settings = QSettings("WaterBottleApp", "WaterReminder")
+    
+    # 1. 上次解析出的字体族仍然可用时直接使用
+    cached_family = settings.value("font_family", "")
+    if cached_family and QFontInfo(QFont(cached_family)).family() == cached_family:
+        settings.remove("font_fallback")
+        return QFont(cached_family, point_size)
+    if cached_family and settings.value("font_fallback", False, type=bool):
+        # 上次已确认没有可用的雅黑字体，跳过系统字体检查和字体文件
+        return QFont(cached_family, point_size)
+    
+    # 2. 系统已安装微软雅黑
+    for family in ("Microsoft YaHei", "微软雅黑"):
+        if QFontInfo(QFont(family)).family() == family:
+            settings.setValue("font_family", family)
+            settings.remove("font_fallback")
+            return QFont(family, point_size)
+    
+    # 3. 尝试加载字体文件（注册的字体只在本次进程内有效，不缓存）
+    try:
+        font_id = QFontDatabase.addApplicationFont("msyh.ttc")
+        if font_id != -1:
+            return QFont(QFontDatabase.applicationFontFamilies(font_id)[0], point_size)
+    except Exception:
+        pass
+    
+    # 4. 都不可用：记下默认字体族，以后只检查它是否已经装上
+    settings.setValue("font_family", "微软雅黑")
+    settings.setValue("font_fallback", True)
+    return QFont("微软雅黑", point_size)
 
 class WaterBottle(QWidget):
-    def __init__(self):
+    def __init__(self, trace=None, api_port=None):
         super().__init__()
         
+        # 启动耗时跟踪
+        self.trace = trace or StartupTrace()
+        
+        # 本机JSON接口（未指定端口时使用设置项 api_port）
+        self.api_port = api_port
+        self.local_api = None
+        
         # 检查是否有图形界面环境
         if not QApplication.instance().testAttribute(Qt.AA_UseDesktopOpenGL) and \
            not QApplication.instance().testAttribute(Qt.AA_UseSoftwareOpenGL) and \
@@ -32,8 +124,24 @@ class WaterBottle(QWidget):
                 print("错误: 未检测到图形显示环境，请在桌面环境中运行")
                 sys.exit(1)
                 
-        # 初始化数据管理器
-        self.data_manager = DataManager()
+        # 数据管理器在首帧绘制后才创建（见finish_startup）
+        self.data_manager = None
+        self._startup_scheduled = False
+        # 后台维护（清理旧记录、写回数据文件）随数据管理器一起创建
+        self.maintenance = None
+        # 命令行工具请求的同步在这个后台线程中进行（见start_sync）；
+        # 后台线程（同步、本地接口）通过gui_executor回到主线程访问数据
+        self.sync_thread = None
+        self.gui_executor = GuiThreadExecutor(self)
+        
+        # 设置对话框首次使用（或空闲预热）时创建，之后复用
+        self._settings_dialog = None
+        self._chart_window = None  # 饮水统计窗口，首次打开时创建
+        
+        # 右键菜单和快捷饮水量子菜单只创建一次
+        self.context_menu = None
+        self.quick_add_menu = None
+        self._quick_add_amounts = None
                 
         # 基本属性设置
         self.setWindowTitle("水瓶提醒")
@@ -44,32 +152,42 @@ class WaterBottle(QWidget):
         # 创建一个白色背景，而不是完全透明，避免UpdateLayeredWindowIndirect错误
         self.setAttribute(Qt.WA_TranslucentBackground)
         
-        # 设置美观的字体
-        try:
-            # 尝试加载微软雅黑字体
-            font_id = QFontDatabase.addApplicationFont("msyh.ttc")
-            if font_id != -1:
-                font_family = QFontDatabase.applicationFontFamilies(font_id)[0]
-                self.font = QFont(font_family, 10)
-            else:
-                self.font = QFont("微软雅黑", 10)
-        except:
-            self.font = QFont("微软雅黑", 10)
-            
+        # 设置美观的字体 - 首帧先用默认字体，首帧之后再解析一次（见apply_app_font）
+        self.font = QFont("微软雅黑", 10)
         self.setFont(self.font)
         
+        # 文字绘制缓存：字体按字号只创建一次，排版结果按文字和字号缓存
+        self._text_fonts = {}
+        self._static_text_cache = {}
+        
+        # 表情精灵缓存：(表情, 眨眼, 宽, 高, DPR) -> QPixmap
+        self._face_sprite_cache = {}
+        
+        # 局部重绘相关：上一帧的状态和动画区域
+        self._last_render_state = None
+        self._last_animated_state = None
+        self._last_animated_region = QRegion()
+        self._bottle_bounds = None
+        
+        # 渲染质量档位（根据帧耗时自动调整，可在设置中固定）
+        self.render_quality = RenderQualityController(frame_budget_ms=60)
+        
+        # 气泡粒子池，由动画时钟推进
+        self.bubbles = BubbleParticleSystem()
+        self._last_tick_time = None
+        
         # 窗口大小 - 调整为更适合卡通风格（将被设置覆盖）
         self.resize(160, 320)
         
-        # 饮水数据
-        self.daily_goal = self.data_manager.get_daily_goal()  # 获取目标
-        self.current_amount = self.data_manager.get_today_total()  # 获取今日饮水量
+        # 饮水数据 - 先用上次保存的快照，历史数据加载后再刷新
+        self.load_startup_snapshot()
         self.water_percentage = self.calculate_percentage()  # 计算水位百分比
         
         # 卡通视觉样式 - 使用更活泼的颜色
         self.bottle_color = QColor(65, 180, 255)      # 明亮的天蓝色
         self.water_color = QColor(30, 150, 255, 220)  # 鲜艳的蓝色
-        self.text_color = QColor(50, 50, 80)          # 深色文字
+        self.text_color = QColor(50, 50, 80)          # 深色文字（随主题变化）
+        self.status_text_color = QColor(100, 100, 120)
         self.face_color = QColor(255, 255, 255)       # 白色表情
         self.cheek_color = QColor(255, 182, 193, 180) # 粉色脸颊
         
@@ -77,11 +195,15 @@ class WaterBottle(QWidget):
         self._water_offset = 0
         self._bounce_offset = 0  # 弹跳偏移
         self._blink_state = 0    # 眨眼状态
-        self._expression_state = "happy"  # 表情状态
+        self.update_expression()  # 表情状态（只在水位变化时重新计算）
         
         # 提醒相关
         self.reminder_interval = 60  # 默认60分钟提醒一次
         self.default_water_amount = 200  # 默认每次200ml
+        self.quiet_hours = QuietHours()
+        self.launch_time = time.time()
+        self.current_day = date.today().strftime("%Y-%m-%d")  # 当前显示的是哪一天的饮水量
+        self.last_drink_time = None  # 上次喝水的时间戳，历史数据加载后得到
         
         # 加载设置（包括水瓶大小）- 在设置动画之前加载
         self.load_settings()
@@ -98,17 +220,284 @@ class WaterBottle(QWidget):
         
         # 不再在这里设置位置，因为apply_bottle_size会处理位置
         
-        # 设置提醒定时器
-        self.reminder_timer = QTimer(self)
-        self.reminder_timer.timeout.connect(self.show_reminder)
-        self.reminder_timer.start(self.reminder_interval * 60 * 1000)  # 转换为毫秒
+        # 提醒调度器：待提醒事件放在优先队列中，只为最近的一个启动定时器
+        # （提醒在历史数据加载后安排，见finish_startup）
+        self.scheduler = DeadlineScheduler(self)
         
-        # 设置系统托盘
-        self.setup_tray_icon()
+        # 通知队列：提醒和提示不再弹出模态对话框，而是排队显示在水瓶上方和托盘气泡中
+        self.notifications = NotificationCenter(self)
+        self.notifications.add_sink(BubbleSink(self))
+        
+        # 系统托盘在首帧绘制后设置（见finish_startup）
         
         # 修复UpdateLayeredWindowIndirect错误：增加额外边距
         self.setContentsMargins(25, 25, 25, 25)
         
+        self.trace.mark("创建窗口")
+        
+    def finish_startup(self):
+        """首帧绘制之后完成其余的启动工作"""
+        self.load_history()
+        self.restore_reminder()
+        self.schedule_day_rollover()
+        self.schedule_maintenance()
+        self.trace.mark("加载历史数据")
+        
+        self.apply_app_font()
+        self.trace.mark("解析字体")
+        
+        self.setup_tray_icon()
+        self.trace.mark("系统托盘")
+        
+        self.start_local_api()
+        
+        self.trace.report()
+        
+        # 空闲时预先创建设置对话框
+        self.scheduler.schedule("prewarm_settings", time.time() + 3, self.get_settings_dialog, slack=10)
+        
+    def start_local_api(self):
+        """按设置（或 --api-port 参数）启动本机JSON接口，端口为0时不启用"""
+        port = self.api_port
+        if port is None:
+            port = int(QSettings("WaterBottleApp", "WaterReminder").value("api_port", 0))
+        if port <= 0:
+            return
+        
+        # 只在需要时导入（asyncio等模块较大）
+        from local_api import LocalApiServer, StoreBackend
+        backend = StoreBackend(self.data_manager, add_records=self.add_water_records,
+                               submit=self.gui_executor.submit)
+        self.local_api = LocalApiServer(backend, port)
+        try:
+            self.local_api.start()
+        except OSError as e:
+            print(f"无法启动本地接口: {str(e)}")
+            self.local_api = None
+        
+    def load_startup_snapshot(self):
+        """读取上次保存的今日饮水量快照，让首帧无需加载历史数据"""
+        settings = QSettings("WaterBottleApp", "WaterReminder")
+        self.daily_goal = int(settings.value("snapshot_goal", 1700))
+        if settings.value("snapshot_date", "") == date.today().strftime("%Y-%m-%d"):
+            self.current_amount = int(settings.value("snapshot_amount", 0))
+        else:
+            self.current_amount = 0
+            
+    def save_startup_snapshot(self):
+        """保存今日饮水量快照，供下次启动时的首帧使用"""
+        settings = QSettings("WaterBottleApp", "WaterReminder")
+        settings.setValue("snapshot_date", date.today().strftime("%Y-%m-%d"))
+        settings.setValue("snapshot_amount", self.current_amount)
+        settings.setValue("snapshot_goal", self.daily_goal)
+        
+    def load_history(self):
+        """加载历史数据并用真实数据刷新显示（只执行一次）"""
+        if self.data_manager is not None:
+            return
+        self.data_manager = DataManager()
+        self.daily_goal = self.data_manager.get_daily_goal()  # 获取目标
+        self.current_amount = self.data_manager.get_today_total()  # 获取今日饮水量
+        self.update_last_drink_time()
+        self.update_water_percentage()
+        
+        # 界面、命令行转发、本地接口和同步的修改都经过DataManager，
+        # 由它的变更通知驱动显示刷新，只重新计算受影响的部分
+        self.data_manager.records_added.connect(self.on_records_added)
+        self.data_manager.records_removed.connect(self.on_records_removed)
+        self.data_manager.day_reset.connect(self.on_records_removed)
+        self.data_manager.goal_changed.connect(self.on_goal_changed)
+        self.data_manager.day_rolled_over.connect(self.on_day_rolled_over)
+        self.data_manager.achievement_unlocked.connect(self.on_achievement_unlocked)
+        
+        self.maintenance = MaintenanceWorker(self.data_manager, self)
+        self.maintenance.progress.connect(self.on_maintenance_progress)
+        self.maintenance.finished.connect(self.on_maintenance_finished)
+        
+    def on_records_added(self, day, records):
+        """新增了饮水记录：刷新今天的水量，下一次提醒从这次喝水开始计时"""
+        if day != self.current_day:
+            return
+        self.update_last_drink_time()
+        self.set_today_amount(self.data_manager.get_today_total())
+        self.set_reminder_due(self.next_reminder_due())
+        
+    def on_records_removed(self, day, records=None):
+        """记录被删除、清理或今天被重置"""
+        if day != self.current_day:
+            return
+        self.update_last_drink_time()
+        self.set_today_amount(self.data_manager.get_today_total())
+        
+    def on_achievement_unlocked(self, rule):
+        """解锁了新成就（每个成就单独提示，不与其他成就合并）"""
+        self.notifications.notify(f"achievement:{rule.key}", f"成就解锁 🏆 {rule.title}", rule.description)
+        
+    def on_goal_changed(self, goal):
+        """每日目标变化：只需重新计算水位"""
+        self.daily_goal = goal
+        self.update_water_percentage()
+        
+    def on_day_rolled_over(self, day):
+        """切换到新的一天"""
+        self.current_day = day
+        self.set_today_amount(self.data_manager.get_today_total())
+        self.set_reminder_due(self.next_reminder_due())
+        
+    def set_today_amount(self, amount):
+        """今天的饮水量变化后更新水位和表情；增加时溅起水花，刚好越过目标时提示"""
+        old_amount = self.current_amount
+        old_percentage = self.water_percentage
+        self.current_amount = amount
+        # 只在刚好越过目标的这一次提示
+        if old_amount < self.daily_goal <= amount:
+            self.notifications.notify("goal", "恭喜 🎉", "您今天的饮水目标已达成！")
+        self.update_water_percentage()
+        
+        if amount > old_amount:
+            # 水面溅起水花
+            if self.render_quality.tier.bubble_scale > 0:
+                self.bubbles.splash()
+            # 如果水位有显著增加，触发开心动画
+            if self.water_percentage - old_percentage > 0.1:
+                self.trigger_happy_animation()
+        
+    def update_last_drink_time(self):
+        """从历史记录中获取上次喝水的时间"""
+        last_record_time = self.data_manager.get_last_record_time()
+        self.last_drink_time = last_record_time.timestamp() if last_record_time else None
+        
+    def next_reminder_due(self, base_time=None):
+        """下一次提醒的时间：从上次喝水（不早于本次启动）或给定时间起 reminder_interval 分钟后
+        
+        按饮水习惯提醒时，如果预测按平时的节奏会更早落后一次饮水量，就提前到那个时刻，
+        但至少间隔 ADAPTIVE_MIN_GAP_MINUTES 分钟。
+        """
+        if base_time is None:
+            base_time = max(self.last_drink_time or 0, self.launch_time)
+        due = base_time + self.reminder_interval * 60
+        
+        if self.reminder_mode == "adaptive" and self.data_manager is not None:
+            predicted = self.data_manager.intake_model.next_due(
+                datetime.now(), self.daily_goal, self.current_amount, self.default_water_amount)
+            if predicted is not None:
+                earliest = base_time + min(ADAPTIVE_MIN_GAP_MINUTES, self.reminder_interval) * 60
+                due = min(due, max(predicted.timestamp(), earliest))
+        return due
+        
+    def set_reminder_due(self, due):
+        """安排提醒（避开免打扰时段），并保存以便重启后恢复"""
+        due = self.quiet_hours.adjust(max(due, time.time() + REMINDER_MIN_DELAY))
+        self.scheduler.schedule("reminder", due, self.on_reminder_due, slack=REMINDER_SLACK)
+        QSettings("WaterBottleApp", "WaterReminder").setValue("reminder_next_due", due)
+        
+    def restore_reminder(self):
+        """恢复上次保存的提醒时间，但不早于上次喝水后的一个间隔"""
+        settings = QSettings("WaterBottleApp", "WaterReminder")
+        saved_due = float(settings.value("reminder_next_due", 0) or 0)
+        self.set_reminder_due(max(saved_due, self.next_reminder_due()))
+        
+    def on_reminder_due(self):
+        """提醒到期：显示提醒，用户一直没喝水时每隔一个间隔再提醒"""
+        self.check_day_rollover()
+        self.show_reminder()
+        self.set_reminder_due(self.next_reminder_due(time.time()))
+        
+    def schedule_day_rollover(self):
+        """在下一个午夜切换到新的一天"""
+        self.scheduler.schedule("rollover", next_midnight(), self.on_day_rollover, slack=ROLLOVER_SLACK)
+        
+    def schedule_maintenance(self):
+        """在下一个午夜执行每日维护（与换日合并在同一次唤醒中）
+        
+        两者各自重新安排下一次：换日的回调如果同时重新安排维护，
+        同一次唤醒中排在后面的维护会被当作已重新安排而跳过。
+        """
+        self.scheduler.schedule("maintenance", next_midnight(), self.on_maintenance_due,
+                                slack=MAINTENANCE_SLACK)
+        
+    def on_maintenance_due(self):
+        """每日维护到期：在空闲时开始后台维护，并安排下一次"""
+        self.schedule_maintenance()
+        self.start_maintenance()
+        
+    def start_maintenance(self, purge_days=None):
+        """在空闲时分段执行每日维护（见MaintenanceWorker），已经在进行时返回False"""
+        self.load_history()
+        return self.maintenance.start(purge_days)
+        
+    def start_sync(self, server):
+        """在后台线程中与同步服务器交换变更，已经在同步时返回False
+        
+        读取和应用变更经GuiThreadExecutor回到主线程执行，DataManager只在主线程中访问。
+        """
+        self.load_history()
+        if self.sync_thread is not None and self.sync_thread.is_alive():
+            return False
+        self.sync_thread = threading.Thread(target=self._run_sync, args=(server,), name="sync", daemon=True)
+        self.sync_thread.start()
+        return True
+        
+    def _run_sync(self, server):
+        """后台线程：同步完成后回到主线程显示结果"""
+        from sync import SyncEngine, HttpTransport, ForwardingStore
+        try:
+            store = ForwardingStore(self.data_manager, self.gui_executor.submit)
+            pushed, pulled = SyncEngine(store, HttpTransport(server)).sync()
+        except Exception as e:
+            self.gui_executor.submit(self.on_sync_finished, None, None, str(e))
+        else:
+            self.gui_executor.submit(self.on_sync_finished, pushed, pulled, None)
+        
+    def on_sync_finished(self, pushed, pulled, error):
+        if error is not None:
+            self.notifications.notify("sync", "水瓶提醒", f"同步失败: {error}", "warning")
+        else:
+            self.notifications.notify("sync", "水瓶提醒", f"同步完成：推送 {pushed} 条、拉取 {pulled} 条变更")
+        
+    def on_maintenance_progress(self, job, done, total):
+        """在托盘提示中显示后台维护的进度"""
+        if hasattr(self, 'tray_icon') and self.tray_icon:
+            self.tray_icon.setToolTip(f"水瓶提醒 - 正在{describe_progress(job, done, total)}")
+        
+    def on_maintenance_finished(self, ok):
+        if hasattr(self, 'tray_icon') and self.tray_icon:
+            self.tray_icon.setToolTip("水瓶提醒")
+        if not ok:
+            self.notifications.notify("maintenance", "水瓶提醒", "整理数据文件失败，将在下次维护时重试", "warning")
+        
+    def on_day_rollover(self):
+        """午夜到达：切换今天的状态并安排下一次"""
+        self.check_day_rollover()
+        self.schedule_day_rollover()
+        
+    def check_day_rollover(self):
+        """日期变化时把今天的饮水量切换到新的一天（系统休眠跨过午夜时也会在这里补上）"""
+        today = date.today().strftime("%Y-%m-%d")
+        if today == self.current_day:
+            return False
+        # 显示由day_rolled_over通知刷新（见on_day_rolled_over）
+        self.data_manager.roll_over_day()
+        return True
+        
+    def snooze_reminder(self, minutes=SNOOZE_MINUTES):
+        """稍后提醒"""
+        self.set_reminder_due(time.time() + minutes * 60)
+        
+    def minutes_since_last_drink(self):
+        """距离上次喝水的分钟数，没有记录时返回None"""
+        if self.last_drink_time is None:
+            return None
+        return int((time.time() - self.last_drink_time) / 60)
+        
+    def apply_app_font(self):
+        """解析应用字体并清空依赖字体的文字缓存"""
+        self.font = resolve_app_font(10)
+        self.setFont(self.font)
+        self._text_fonts.clear()
+        self._static_text_cache.clear()
+        self._last_render_state = None
+        
     def setup_animations(self):
         """设置多重动画效果"""
         # 水波动画 - 调慢速度
@@ -136,9 +525,102 @@ class WaterBottle(QWidget):
         # 创建一个定时器来限制更新频率
         self.update_timer = QTimer(self)
         self.update_timer.setInterval(60)  # 从50ms增加到60ms，稍微降低刷新率
-        self.update_timer.timeout.connect(self.update)
+        self.update_timer.timeout.connect(self.on_animation_tick)
         self.update_timer.start()
         
+    def content_rect(self):
+        """获取有效绘制区域（去掉阴影边距）"""
+        return self.rect().adjusted(
+            self.contentsMargins().left(),
+            self.contentsMargins().top(),
+            -self.contentsMargins().right(),
+            -self.contentsMargins().bottom()
+        )
+        
+    def current_bounce_y(self):
+        """当前弹跳偏移（像素）"""
+        return int(3 * math.sin(self._bounce_offset))
+        
+    def get_bottle_bounds(self, rect):
+        """瓶身和阴影在所有弹跳位置下的外接矩形（按尺寸缓存）"""
+        if self._bottle_bounds is None:
+            bottle_path = self.create_cartoon_bottle_path(rect)
+            shadow_path = self.create_cartoon_bottle_path(rect.adjusted(-8, -8, 8, 8)).translated(8, 8)
+            bounds = bottle_path.boundingRect().united(shadow_path.boundingRect())
+            bounce_y = self.current_bounce_y()
+            self._bottle_bounds = bounds.toAlignedRect().adjusted(-3, -3 - 3 - bounce_y, 3, 3 + 3 - bounce_y)
+        return self._bottle_bounds
+        
+    def animated_region(self, rect):
+        """计算本帧动画涉及的区域：水面波浪带、气泡、眨眼时的表情和弹跳位移"""
+        bounce_y = self.current_bounce_y()
+        animated_state = (bounce_y, self._blink_state)
+        last_state = self._last_animated_state
+        self._last_animated_state = animated_state
+        
+        # 弹跳时整个瓶身都会移动
+        if last_state is not None and last_state[0] != bounce_y:
+            return QRegion(self.get_bottle_bounds(rect))
+        
+        region = QRegion()
+        
+        if self.water_percentage > 0:
+            # 水面波浪带
+            water_height = int(rect.height() * (1 - self.water_percentage * 0.7)) + bounce_y
+            region += QRect(rect.x(), water_height - WAVE_HEIGHT - 2,
+                            rect.width() + 1, WAVE_HEIGHT * 2 + 4)
+            
+        # 气泡和水花
+        damage = self.bubbles.damage
+        for index in range(self.bubbles.update_damage_rects(rect.x(), rect.y() + bounce_y)):
+            region += damage[index]
+        
+        # 眨眼
+        if last_state is not None and last_state[1] != self._blink_state:
+            region += self.face_sprite_rect(rect).translated(rect.x(), rect.y() + bounce_y)
+        
+        return region
+        
+    def on_animation_tick(self):
+        """动画定时器回调
+        
+        先推进气泡粒子，然后在水位、表情或尺寸变化时整窗重绘，其余时间只重绘
+        动画涉及的区域（同时包含上一帧的区域，以擦除旧位置）。
+        """
+        self.advance_bubbles()
+        
+        render_state = (self.water_percentage, self._expression_state, self.width(), self.height(),
+                        self.render_quality.tier.name)
+        if render_state != self._last_render_state:
+            self._last_render_state = render_state
+            self._last_animated_state = None
+            self._last_animated_region = QRegion()
+            self.update()
+            return
+        
+        region = self.animated_region(self.content_rect())
+        if not region.isEmpty() or not self._last_animated_region.isEmpty():
+            self.update(region.united(self._last_animated_region))
+        self._last_animated_region = region
+        
+    def advance_bubbles(self):
+        """按实际经过的时间推进气泡粒子，气泡数量随水位变化"""
+        now = time.monotonic()
+        # 定时器暂停（例如提醒动画期间）后恢复时不让粒子跳跃
+        dt = 0.0 if self._last_tick_time is None else min(now - self._last_tick_time, 0.1)
+        self._last_tick_time = now
+        
+        rect = self.content_rect()
+        surface_y = rect.height() * (1 - self.water_percentage * 0.7) - rect.y()
+        self.bubbles.set_bounds(rect.width(), surface_y, rect.height() * 0.88)
+        
+        bubble_count = 0
+        if self.water_percentage > 0.1:
+            bubble_count = int(self.water_percentage * 6) + 2  # 从8减少到6，气泡数量稍少
+            bubble_count = int(bubble_count * self.render_quality.tier.bubble_scale)
+        self.bubbles.set_bubble_count(bubble_count)
+        self.bubbles.advance(dt)
+        
     def blink(self):
         """眨眼动画"""
         self._blink_state = 1
@@ -185,8 +667,7 @@ class WaterBottle(QWidget):
         y_offset = rect.y()
         
         # 添加轻微的弹跳效果
-        bounce_y = int(3 * math.sin(self._bounce_offset))
-        y_offset += bounce_y
+        y_offset += self.current_bounce_y()
         
         bottle_path = QPainterPath()
         
@@ -233,17 +714,13 @@ class WaterBottle(QWidget):
         
         return bottle_path
         
-    def draw_cartoon_face(self, painter, rect):
-        """绘制卡通表情"""
+    def render_face(self, painter, rect, expression_state, blink_state):
+        """绘制指定表情和眨眼状态的卡通表情（不含弹跳偏移）"""
         width = rect.width()
         height = rect.height()
         x_offset = rect.x()
         y_offset = rect.y()
         
-        # 添加弹跳效果
-        bounce_y = int(3 * math.sin(self._bounce_offset))
-        y_offset += bounce_y
-        
         # 脸部区域
         face_y = y_offset + height * 0.25
         face_height = height * 0.35
@@ -251,7 +728,7 @@ class WaterBottle(QWidget):
         painter.setRenderHint(QPainter.Antialiasing)
         
         # 绘制脸颊（可选，当开心时显示）
-        if self._expression_state in ["happy", "excited"]:
+        if expression_state in ["happy", "excited"]:
             cheek_size = width * 0.08
             # 左脸颊
             painter.setBrush(self.cheek_color)
@@ -274,15 +751,15 @@ class WaterBottle(QWidget):
         
         painter.setBrush(QColor(50, 50, 50))  # 深色眼睛
         
-        if self._blink_state == 0:
+        if blink_state == 0:
             # 正常眼睛
-            if self._expression_state == "thirsty":
+            if expression_state == "thirsty":
                 # 疲惫的眼神（小一点）
                 painter.drawEllipse(int(left_eye_x), int(eye_y + eye_size*0.2), 
                                   int(eye_size), int(eye_size*0.6))
                 painter.drawEllipse(int(right_eye_x), int(eye_y + eye_size*0.2), 
                                   int(eye_size), int(eye_size*0.6))
-            elif self._expression_state == "excited":
+            elif expression_state == "excited":
                 # 兴奋的大眼睛
                 painter.drawEllipse(int(left_eye_x - eye_size*0.1), int(eye_y - eye_size*0.1), 
                                   int(eye_size*1.2), int(eye_size*1.2))
@@ -322,11 +799,11 @@ class WaterBottle(QWidget):
         painter.setPen(QPen(QColor(50, 50, 50), 2))
         painter.setBrush(Qt.NoBrush)
         
-        if self._expression_state == "thirsty":
+        if expression_state == "thirsty":
             # 渴望的小嘴
             painter.drawEllipse(int(mouth_x + mouth_width*0.3), int(mouth_y), 
                               int(mouth_width*0.4), int(mouth_width*0.3))
-        elif self._expression_state == "excited":
+        elif expression_state == "excited":
             # 兴奋的大笑
             smile_path = QPainterPath()
             smile_path.moveTo(mouth_x, mouth_y)
@@ -337,7 +814,7 @@ class WaterBottle(QWidget):
             painter.setBrush(QColor(255, 255, 255))
             painter.drawRect(int(mouth_x + mouth_width*0.4), int(mouth_y + mouth_width*0.1),
                            int(mouth_width*0.2), int(mouth_width*0.15))
-        elif self._expression_state == "happy":
+        elif expression_state == "happy":
             # 开心的微笑
             smile_path = QPainterPath()
             smile_path.moveTo(mouth_x, mouth_y)
@@ -349,43 +826,91 @@ class WaterBottle(QWidget):
             painter.drawLine(int(mouth_x), int(mouth_y), 
                            int(mouth_x + mouth_width), int(mouth_y))
         
+    def face_sprite_rect(self, rect):
+        """表情精灵在瓶身坐标中覆盖的区域（眼睛、脸颊和嘴巴，上下各留一点余量）"""
+        top = int(rect.height() * 0.25) - 4
+        bottom = int(rect.height() * 0.6) + 8
+        return QRect(0, top, rect.width(), bottom - top)
+        
+    def get_face_sprite(self, rect):
+        """获取当前表情的预渲染精灵
+        
+        只有4种表情×2种眨眼状态，按水瓶尺寸和DPR缓存，每帧只需贴一张图。
+        """
+        dpr = self.devicePixelRatioF()
+        key = (self._expression_state, self._blink_state, rect.width(), rect.height(), dpr)
+        sprite = self._face_sprite_cache.get(key)
+        if sprite is None:
+            sprite_rect = self.face_sprite_rect(rect)
+            sprite = QPixmap(int(sprite_rect.width() * dpr), int(sprite_rect.height() * dpr))
+            sprite.setDevicePixelRatio(dpr)
+            sprite.fill(Qt.transparent)
+            
+            sprite_painter = QPainter(sprite)
+            sprite_painter.translate(0, -sprite_rect.y())
+            self.render_face(sprite_painter, QRect(0, 0, rect.width(), rect.height()),
+                             self._expression_state, self._blink_state)
+            sprite_painter.end()
+            
+            self._face_sprite_cache[key] = sprite
+        return sprite
+        
+    def on_theme_changed(self):
+        """主题变化时更新自绘颜色并清空相关缓存"""
+        self.text_color = theme_color("text")
+        self.status_text_color = theme_color("status_text")
+        self.invalidate_face_cache()
+        self._last_render_state = None
+        
+    def invalidate_face_cache(self):
+        """清空表情精灵缓存（尺寸或主题变化时调用）"""
+        self._face_sprite_cache.clear()
+        
+    def draw_cartoon_face(self, painter, rect):
+        """绘制卡通表情"""
+        # 添加弹跳效果
+        bounce_y = self.current_bounce_y()
+        sprite_rect = self.face_sprite_rect(rect)
+        painter.drawPixmap(rect.x(), rect.y() + sprite_rect.y() + bounce_y,
+                           self.get_face_sprite(rect))
+        
     def paintEvent(self, event):
         """绘制卡通水瓶"""
+        frame_start = time.perf_counter()
+        tier = self.render_quality.tier
+        
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing, True)
+        painter.setRenderHint(QPainter.Antialiasing, tier.antialias)
         
         # 获取有效绘制区域
-        draw_rect = self.rect().adjusted(
-            self.contentsMargins().left(),
-            self.contentsMargins().top(),
-            -self.contentsMargins().right(),
-            -self.contentsMargins().bottom()
-        )
-        
-        # 更新表情状态
-        self.update_expression()
+        draw_rect = self.content_rect()
+        dirty_region = event.region()
         
         # 创建阴影
-        shadow_path = self.create_cartoon_bottle_path(draw_rect.adjusted(-8, -8, 8, 8))
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(QColor(0, 0, 0, 20))
-        painter.drawPath(shadow_path.translated(8, 8))
+        if tier.shadow:
+            shadow_path = self.create_cartoon_bottle_path(draw_rect.adjusted(-8, -8, 8, 8))
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 20))
+            painter.drawPath(shadow_path.translated(8, 8))
         
         # 绘制瓶身
         bottle_path = self.create_cartoon_bottle_path(draw_rect)
         
-        # 卡通风格的渐变
-        gradient = QRadialGradient(
-            draw_rect.x() + draw_rect.width() * 0.3,
-            draw_rect.y() + draw_rect.height() * 0.2,
-            draw_rect.width() * 0.8
-        )
-        gradient.setColorAt(0, QColor(255, 255, 255, 200))
-        gradient.setColorAt(0.7, QColor(230, 245, 255, 180))
-        gradient.setColorAt(1, QColor(200, 230, 255, 160))
+        # 卡通风格的渐变（低档位使用纯色）
+        if tier.gradient:
+            gradient = QRadialGradient(
+                draw_rect.x() + draw_rect.width() * 0.3,
+                draw_rect.y() + draw_rect.height() * 0.2,
+                draw_rect.width() * 0.8
+            )
+            gradient.setColorAt(0, QColor(255, 255, 255, 200))
+            gradient.setColorAt(0.7, QColor(230, 245, 255, 180))
+            gradient.setColorAt(1, QColor(200, 230, 255, 160))
+            painter.setBrush(gradient)
+        else:
+            painter.setBrush(QColor(230, 245, 255, 180))
         
         painter.setPen(QPen(self.bottle_color, 2.5))
-        painter.setBrush(gradient)
         painter.drawPath(bottle_path)
         
         # 绘制水
@@ -393,14 +918,32 @@ class WaterBottle(QWidget):
             water_height = draw_rect.height() * (1 - self.water_percentage * 0.7)
             self.draw_cartoon_water(painter, water_height, draw_rect, bottle_path)
         
-        # 绘制表情
-        self.draw_cartoon_face(painter, draw_rect)
+        # 绘制表情（局部重绘时跳过不在重绘区域内的部分）
+        face_rect = self.face_sprite_rect(draw_rect).translated(draw_rect.x(), draw_rect.y()).adjusted(0, -3, 0, 3)
+        if dirty_region.intersects(face_rect):
+            self.draw_cartoon_face(painter, draw_rect)
         
         # 绘制可爱的装饰
-        self.draw_decorations(painter, draw_rect)
+        if tier.decorations:
+            self.draw_decorations(painter, draw_rect)
         
         # 绘制文字
-        self.draw_text(painter, draw_rect)
+        text_rect = QRect(draw_rect.x(), int(draw_rect.y() + draw_rect.height() * 0.75),
+                          draw_rect.width(), int(draw_rect.height() * 0.25))
+        if dirty_region.intersects(text_rect):
+            self.draw_text(painter, draw_rect)
+        
+        painter.end()
+        
+        # 首帧绘制完成后再进行其余的启动工作
+        if not self._startup_scheduled:
+            self._startup_scheduled = True
+            self.trace.mark("首帧绘制")
+            QTimer.singleShot(0, self.finish_startup)
+        
+        # 记录帧耗时，档位变化时下一帧整窗重绘
+        if self.render_quality.record_frame((time.perf_counter() - frame_start) * 1000):
+            self._last_render_state = None
         
     def draw_cartoon_water(self, painter, water_height, rect, bottle_path):
         """绘制卡通风格的水"""
@@ -409,18 +952,23 @@ class WaterBottle(QWidget):
         x_offset = rect.x()
         
         # 添加弹跳效果
-        bounce_y = int(3 * math.sin(self._bounce_offset))
-        water_height += bounce_y
+        water_height += self.current_bounce_y()
         
         water_path = QPainterPath()
         water_height = int(water_height)
         water_path.moveTo(x_offset, water_height)
         
         # 创建更优雅的卡通波浪 - 调整波浪参数
-        wave_height = 8  # 从10减少到8，波浪幅度稍小
+        wave_height = WAVE_HEIGHT  # 从10减少到8，波浪幅度稍小
         wave_count = 2   # 从2.5减少到2，波浪数量更少，更优雅
         
-        for x in range(width + 1):
+        # 按质量档位的间隔采样波浪，并保证包含最右端的点
+        wave_step = self.render_quality.tier.wave_step
+        sample_xs = list(range(0, width + 1, wave_step))
+        if sample_xs[-1] != width:
+            sample_xs.append(width)
+        
+        for x in sample_xs:
             # 使用更平缓的波浪函数
             offset = int(wave_height * math.sin((x / width * wave_count * math.pi) + self._water_offset) * 
                           (0.6 + 0.4 * math.sin(self._water_offset * 0.3)))  # 调整振幅变化
@@ -444,33 +992,14 @@ class WaterBottle(QWidget):
         painter.drawPath(water_path)
         
         # 添加可爱的水泡
-        if self.water_percentage > 0.1:
-            self.draw_bubbles(painter, water_height, rect, bottle_path)
+        if self.bubbles.has_particles():
+            self.draw_bubbles(painter, rect, bottle_path)
             
-    def draw_bubbles(self, painter, water_height, rect, bottle_path):
-        """绘制可爱的气泡 - 调整气泡速度"""
-        bubble_count = int(self.water_percentage * 6) + 2  # 从8减少到6，气泡数量稍少
-        
-        painter.setBrush(QColor(255, 255, 255, 120))
-        painter.setPen(Qt.NoPen)
+    def draw_bubbles(self, painter, rect, bottle_path):
+        """绘制可爱的气泡 - 粒子池一次批量绘制"""
+        self.bubbles.draw(painter, bottle_path, rect.x(), rect.y() + self.current_bounce_y(),
+                          self.devicePixelRatioF())
         
-        for i in range(bubble_count):
-            # 气泡位置计算 - 使用更慢的动画偏移
-            bubble_x = rect.x() + rect.width() * (0.2 + 0.6 * (i / bubble_count))
-            # 气泡上升速度减慢
-            bubble_y = water_height + (rect.height() - water_height) * (0.2 + 0.6 * ((i + self._water_offset * 0.3) % 1))
-            
-            # 气泡大小随机，变化更温和
-            bubble_size = 3 + (i % 3) * 1.5 + int(1.5 * math.sin(self._water_offset * 0.5 + i))
-            
-            # 创建气泡路径并裁剪
-            bubble_path = QPainterPath()
-            bubble_path.addEllipse(bubble_x - bubble_size/2, bubble_y - bubble_size/2, 
-                                 bubble_size, bubble_size)
-            bubble_path = bottle_path.intersected(bubble_path)
-            
-            painter.drawPath(bubble_path)
-            
     def draw_decorations(self, painter, rect):
         """绘制可爱的装饰元素"""
         # 在瓶身上画一些小星星或心形装饰
@@ -502,22 +1031,44 @@ class WaterBottle(QWidget):
                 
                 painter.drawPath(star_path)
                 
+    def get_text_font(self, point_size, bold=False):
+        """获取指定字号的字体（缓存）"""
+        key = (point_size, bold)
+        font = self._text_fonts.get(key)
+        if font is None:
+            font = QFont(self.font)
+            font.setPointSize(point_size)
+            font.setBold(bold)
+            self._text_fonts[key] = font
+        return font
+        
+    def get_static_text(self, text, point_size, bold=False):
+        """获取预排版的文字（缓存），只有文字或字号变化时才重新排版"""
+        key = (text, point_size, bold)
+        static_text = self._static_text_cache.get(key)
+        if static_text is None:
+            static_text = QStaticText(text)
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.prepare(QTransform(), self.get_text_font(point_size, bold))
+            self._static_text_cache[key] = static_text
+        return static_text
+        
+    def draw_static_text_centered(self, painter, rect, text, point_size, bold=False):
+        """在矩形中居中绘制缓存的文字"""
+        static_text = self.get_static_text(text, point_size, bold)
+        size = static_text.size()
+        painter.setFont(self.get_text_font(point_size, bold))
+        painter.drawStaticText(
+            QPointF(rect.x() + (rect.width() - size.width()) / 2,
+                    rect.y() + (rect.height() - size.height()) / 2),
+            static_text
+        )
+        
     def draw_text(self, painter, rect):
         """绘制文字信息"""
-        # 绘制百分比
+        # 绘制百分比 - 根据表情改变文字颜色
         percentage_text = f"{int(self.water_percentage * 100)}%"
-        font = QFont(self.font)
-        font.setPointSize(16)
-        font.setBold(True)
-        painter.setFont(font)
-        
-        # 根据表情改变文字颜色
-        if self._expression_state == "thirsty":
-            painter.setPen(QColor(255, 100, 100))  # 红色，表示需要喝水
-        elif self._expression_state == "excited":
-            painter.setPen(QColor(50, 200, 50))    # 绿色，表示完成目标
-        else:
-            painter.setPen(self.text_color)
+        painter.setPen(PERCENTAGE_COLORS.get(self._expression_state, self.text_color))
         
         text_rect = QRect(
             rect.x(), 
@@ -525,21 +1076,11 @@ class WaterBottle(QWidget):
             rect.width(), 
             int(rect.height() * 0.15)
         )
-        painter.drawText(text_rect, Qt.AlignCenter, percentage_text)
+        self.draw_static_text_centered(painter, text_rect, percentage_text, 16, bold=True)
         
         # 绘制状态文字
-        status_texts = {
-            "thirsty": "渴了~",
-            "normal": "还行",
-            "happy": "不错!",
-            "excited": "棒极了!"
-        }
-        
-        status_text = status_texts.get(self._expression_state, "")
-        font.setPointSize(10)
-        font.setBold(False)
-        painter.setFont(font)
-        painter.setPen(QColor(100, 100, 120))
+        status_text = STATUS_TEXTS.get(self._expression_state, "")
+        painter.setPen(self.status_text_color)
         
         status_rect = QRect(
             rect.x(), 
@@ -547,33 +1088,29 @@ class WaterBottle(QWidget):
             rect.width(), 
             int(rect.height() * 0.1)
         )
-        painter.drawText(status_rect, Qt.AlignCenter, status_text)
+        self.draw_static_text_centered(painter, status_rect, status_text, 10)
         
     def add_water(self, amount):
         """添加饮水量 - 增加动画效果"""
-        old_percentage = self.water_percentage
-        self.current_amount += amount
-        if self.current_amount > self.daily_goal:
-            self.show_styled_message("恭喜", "您今天的饮水目标已达成！🎉", QMessageBox.Information)
-        
-        # 更新数据库
-        self.data_manager.add_water_record(amount)
+        self.add_water_records([amount])
         
-        # 更新显示
-        self.update_water_percentage()
+    def add_water_records(self, amounts):
+        """一次添加多条饮水记录（本地接口的批量写入），只保存和刷新一次
         
-        # 如果水位有显著增加，触发开心动画
-        if self.water_percentage - old_percentage > 0.1:
-            self.trigger_happy_animation()
+        水位、提醒和动画由records_added通知更新（见on_records_added）
+        """
+        self.load_history()
+        self.maintenance.note_activity()
+        self.check_day_rollover()
+        self.data_manager.add_water_records(amounts)
             
     def trigger_happy_animation(self):
         """触发开心动画"""
         # 暂时设置为兴奋状态
-        old_state = self._expression_state
         self._expression_state = "excited"
         
-        # 2秒后恢复正常状态
-        QTimer.singleShot(2000, lambda: setattr(self, '_expression_state', old_state))
+        # 2秒后恢复为当前水位对应的表情
+        QTimer.singleShot(2000, self.update_expression)
         
         # 触发额外的弹跳
         bounce_anim = QPropertyAnimation(self, b"bounceOffset")
@@ -591,9 +1128,24 @@ class WaterBottle(QWidget):
         # 提醒间隔
         self.reminder_interval = int(settings.value("reminder_interval", 60))
         
+        # 提醒方式 - 默认根据饮水习惯提前提醒
+        self.reminder_mode = settings.value("reminder_mode", "adaptive")
+        
+        # 免打扰时段 - 默认不启用，启用后默认22:00到次日08:00
+        self.quiet_hours = QuietHours(settings.value("quiet_start", "22:00"),
+                                      settings.value("quiet_end", "08:00"),
+                                      settings.value("quiet_enabled", False, type=bool))
+        
         # 每次饮水量
         self.default_water_amount = int(settings.value("water_amount", 200))
         
+        # 主题 - 在应用级别设置一次样式表
+        if apply_theme(settings.value("theme", DEFAULT_THEME)):
+            self.on_theme_changed()
+        
+        # 渲染质量 - 默认根据帧耗时自动选择
+        self.render_quality.set_mode(settings.value("render_quality", "auto"))
+        
         # 水瓶大小设置 - 默认为"中等"
         bottle_size = settings.value("bottle_size", "中等")
         self.apply_bottle_size(bottle_size)
@@ -628,27 +1180,7 @@ class WaterBottle(QWidget):
         """设置系统托盘图标"""
         # 托盘菜单
         self.tray_menu = QMenu()
-        self.tray_menu.setStyleSheet("""
-            QMenu {
-                background-color: rgba(255, 255, 255, 0.85);
-                border: 1px solid rgba(200, 200, 200, 0.5);
-                border-radius: 10px;
-                padding: 5px;
-            }
-            QMenu::item {
-                padding: 8px 30px 8px 30px;
-                border-radius: 6px;
-            }
-            QMenu::item:selected {
-                background-color: rgba(52, 152, 219, 0.8);
-                color: white;
-            }
-            QMenu::separator {
-                height: 1px;
-                background-color: rgba(200, 200, 200, 0.5);
-                margin: 5px 15px;
-            }
-        """)
+        self.tray_menu.setObjectName("trayMenu")  # 样式见主题样式表
         
         # 添加菜单项
         self.show_action = QAction("显示", self)
@@ -657,33 +1189,29 @@ class WaterBottle(QWidget):
         self.settings_action = QAction("设置", self)
         self.settings_action.triggered.connect(self.open_settings)
         
+        self.chart_action = QAction("饮水统计", self)
+        self.chart_action.triggered.connect(self.open_chart)
+        
+        self.snooze_action = QAction(f"{SNOOZE_MINUTES}分钟后提醒", self)
+        self.snooze_action.triggered.connect(lambda: self.snooze_reminder())
+        
         self.exit_action = QAction("退出", self)
         self.exit_action.triggered.connect(self.close_application)
         
         self.tray_menu.addAction(self.show_action)
+        self.tray_menu.addMenu(self.get_quick_add_menu())
+        self.tray_menu.addAction(self.snooze_action)
+        self.tray_menu.addAction(self.chart_action)
         self.tray_menu.addAction(self.settings_action)
         self.tray_menu.addSeparator()
         self.tray_menu.addAction(self.exit_action)
         
         # 创建图标
         try:
-            icon = None
-            
-            # 1. 尝试从资源目录加载图标
-            icon_path = os.path.join("resources", "water_bottle_64.png")
-            if os.path.exists(icon_path):
-                icon = QIcon(icon_path)
-            
-            # 2. 尝试生成图标
-            elif create_water_bottle_icon:
-                try:
-                    icon_path = create_water_bottle_icon()
-                    if os.path.exists(icon_path):
-                        icon = QIcon(icon_path)
-                except Exception as e:
-                    print(f"生成图标失败: {str(e)}")
-            
-            # 3. 如果前两种方式失败，创建一个简单的默认图标
+            # 1. 从编译好的资源（或源码目录）加载图标
+            icon = load_app_icon()
+            
+            # 2. 如果资源缺失，创建一个简单的默认图标
             if not icon:
                 icon_pixmap = QPixmap(32, 32)
                 icon_pixmap.fill(self.bottle_color)
@@ -696,8 +1224,10 @@ class WaterBottle(QWidget):
             self.tray_icon.setContextMenu(self.tray_menu)
             self.tray_icon.activated.connect(self.tray_icon_activated)
             self.tray_icon.show()
+            self.notifications.add_sink(TraySink(self.tray_icon))
         except Exception as e:
             print(f"无法创建系统托盘图标: {str(e)}")
+            self.notifications.add_sink(LogSink())
             
     def tray_icon_activated(self, reason):
         """托盘图标被激活"""
@@ -707,9 +1237,50 @@ class WaterBottle(QWidget):
             else:
                 self.hide()
         
+    def handle_instance_command(self, command):
+        """处理其他进程转发来的命令（见ipc.py），返回回复"""
+        name = command.get("command")
+        if name == "show":
+            self.show()
+            self.raise_()
+            self.activateWindow()
+        elif name == "add":
+            amount = int(command.get("amount", 0))
+            if not valid_amount(amount):
+                return {"ok": False, "error": f"饮水量应在1到{MAX_RECORD_AMOUNT}毫升之间"}
+            self.add_water(amount)
+        elif name == "settings":
+            # 设置对话框是模态的，先回复再打开
+            QTimer.singleShot(0, self.open_settings)
+        elif name == "quit":
+            QTimer.singleShot(0, self.close_application)
+        elif name == "status":
+            self.load_history()
+        elif name == "sync":
+            # 网络请求可能很慢，在后台线程中进行，先回复；完成后显示通知
+            started = self.start_sync(command["server"])
+            return {"background": True, "started": started, "today": self.current_amount, "goal": self.daily_goal}
+        elif name == "verify":
+            # 修复要由持有数据的本实例完成，否则会被下一次保存覆盖
+            self.load_history()
+            report = self.data_manager.verify_store(bool(command.get("repair")))
+            return dict(report, today=self.current_amount, goal=self.daily_goal)
+        elif name == "compact":
+            # 数据由本实例持有，整理也要在这里进行，否则会被下一次保存覆盖；
+            # 在后台分段执行，先回复
+            started = self.start_maintenance(command.get("keep_days"))
+            return {"background": True, "started": started, "today": self.current_amount, "goal": self.daily_goal}
+        else:
+            return {"ok": False, "error": f"未知命令: {name}"}
+        return {"today": self.current_amount, "goal": self.daily_goal}
+        
     def update_water_percentage(self):
-        """更新水位百分比"""
+        """更新水位百分比和对应的表情（饮水量或目标变化时调用，绘制时不再重新计算）"""
         self.water_percentage = self.calculate_percentage()
+        self.update_expression()
+        self.update()
+        if self.data_manager is not None:
+            self.save_startup_snapshot()
         
     def calculate_percentage(self):
         """计算当前饮水百分比"""
@@ -717,11 +1288,20 @@ class WaterBottle(QWidget):
             return min(1.0, self.current_amount / self.daily_goal)
         return 0
         
+    def resizeEvent(self, event):
+        """窗口尺寸变化时使表情缓存和瓶身范围失效"""
+        self.invalidate_face_cache()
+        self._bottle_bounds = None
+        self.bubbles.reset()
+        super().resizeEvent(event)
+        
     def mousePressEvent(self, event):
         """鼠标按下事件，用于拖动窗口"""
         if event.button() == Qt.LeftButton:
             self.old_pos = event.globalPos()
             self.is_dragging = True
+            if self.maintenance:
+                self.maintenance.note_activity()
     
     def mouseMoveEvent(self, event):
         """鼠标移动事件，用于拖动窗口"""
@@ -739,92 +1319,133 @@ class WaterBottle(QWidget):
         """鼠标双击事件，记录饮水"""
         self.add_water(self.default_water_amount)
         
-    def contextMenuEvent(self, event):
-        """右键菜单 - 卡通风格"""
-        menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: rgba(255, 255, 255, 0.9);
-                border: 2px solid rgba(65, 180, 255, 0.7);
-                border-radius: 12px;
-                padding: 8px;
-            }
-            QMenu::item {
-                padding: 10px 35px 10px 35px;
-                border-radius: 8px;
-                color: #333;
-            }
-            QMenu::item:selected {
-                background-color: rgba(65, 180, 255, 0.8);
-                color: white;
-            }
-            QMenu::separator {
-                height: 2px;
-                background-color: rgba(65, 180, 255, 0.3);
-                margin: 8px 15px;
-            }
-        """)
-        
-        # 添加饮水量动作
-        add_menu = menu.addMenu("💧 添加饮水量")
-        add_menu.setStyleSheet("QMenu::item {padding: 8px 25px;}")
-        
-        amounts = [100, 200, 300, 500]
-        for amount in amounts:
-            action = add_menu.addAction(f"{amount}ml")
-            action.triggered.connect(lambda checked, a=amount: self.add_water(a))
-        
-        # 其他动作
-        menu.addSeparator()
-        settings_action = menu.addAction("⚙️ 设置")
-        settings_action.triggered.connect(self.open_settings)
-        
-        reset_action = menu.addAction("🔄 重置今日记录")
-        reset_action.triggered.connect(self.reset_today)
+    def get_quick_add_menu(self):
+        """获取快捷饮水量子菜单（右键菜单和托盘菜单共用，只创建一次）"""
+        if self.quick_add_menu is None:
+            self.quick_add_menu = QMenu("💧 添加饮水量", self)
+            self.quick_add_menu.setObjectName("quickAddMenu")
+            self.quick_add_menu.aboutToShow.connect(self.refresh_quick_add_menu)
+            self.quick_add_menu.triggered.connect(lambda action: self.add_water(action.data()))
+        return self.quick_add_menu
+        
+    def refresh_quick_add_menu(self):
+        """按最常用的饮水量更新快捷菜单，数值没有变化时直接返回"""
+        self.load_history()
+        amounts = self.data_manager.get_frequent_amounts()
+        if amounts == self._quick_add_amounts:
+            return
         
-        menu.addSeparator()
-        exit_action = menu.addAction("❌ 退出")
-        exit_action.triggered.connect(self.close_application)
+        # 复用已有的动作，只修改文字和数据
+        actions = self.quick_add_menu.actions()
+        for i, amount in enumerate(amounts):
+            action = actions[i] if i < len(actions) else self.quick_add_menu.addAction("")
+            action.setText(f"{amount}ml")
+            action.setData(amount)
+        for action in actions[len(amounts):]:
+            self.quick_add_menu.removeAction(action)
+        
+        self._quick_add_amounts = amounts
+        
+    def get_context_menu(self):
+        """获取右键菜单（首次使用时创建，之后复用）"""
+        if self.context_menu is None:
+            menu = QMenu(self)
+            menu.setObjectName("bottleMenu")  # 样式见主题样式表
+            
+            # 添加饮水量动作
+            menu.addMenu(self.get_quick_add_menu())
+            
+            # 其他动作
+            menu.addSeparator()
+            chart_action = menu.addAction("📊 饮水统计")
+            chart_action.triggered.connect(self.open_chart)
+            
+            achievements_action = menu.addAction("🏆 成就")
+            achievements_action.triggered.connect(self.show_achievements)
+            
+            settings_action = menu.addAction("⚙️ 设置")
+            settings_action.triggered.connect(self.open_settings)
+            
+            snooze_action = menu.addAction(f"⏰ {SNOOZE_MINUTES}分钟后提醒")
+            snooze_action.triggered.connect(lambda: self.snooze_reminder())
+            
+            reset_action = menu.addAction("🔄 重置今日记录")
+            reset_action.triggered.connect(self.reset_today)
+            
+            menu.addSeparator()
+            exit_action = menu.addAction("❌ 退出")
+            exit_action.triggered.connect(self.close_application)
+            
+            self.context_menu = menu
+        return self.context_menu
         
-        menu.exec_(event.globalPos())
+    def contextMenuEvent(self, event):
+        """右键菜单 - 卡通风格"""
+        self.get_context_menu().exec_(event.globalPos())
+        
+    def get_settings_dialog(self):
+        """获取设置对话框（首次调用时创建，之后复用同一个实例）"""
+        if self._settings_dialog is None:
+            from settings_dialog import SettingsDialog
+            self._settings_dialog = SettingsDialog(self)
+        return self._settings_dialog
+        
+    def open_chart(self):
+        """打开饮水统计窗口（首次打开时创建，关闭后保留，再次打开时复用）"""
+        self.load_history()
+        if self._chart_window is None:
+            from chart_window import ChartWindow
+            self._chart_window = ChartWindow(self.data_manager, self)
+        self._chart_window.show()
+        self._chart_window.raise_()
+        self._chart_window.activateWindow()
+        
+    def show_achievements(self):
+        """显示全部成就和进度"""
+        self.load_history()
+        lines = []
+        for item in self.data_manager.achievements.summary():
+            if item["unlocked"]:
+                lines.append(f"🏆 {item['title']}（{item['unlocked']}）- {item['description']}")
+            else:
+                lines.append(f"🔒 {item['title']}（{item['progress']}/{item['target']}）- {item['description']}")
+        self.show_styled_message("成就", "\n".join(lines))
         
     def open_settings(self):
         """打开设置对话框"""
-        dialog = SettingsDialog(self)
+        self.load_history()
+        
+        dialog = self.get_settings_dialog()
+        dialog.load_settings()
         if dialog.exec_():
             # 更新设置
             self.load_settings()
             
-            # 更新每日目标
-            new_goal = dialog.calculate_daily_goal()
-            self.daily_goal = new_goal
-            self.data_manager.set_daily_goal(new_goal)
-            
             # 更新用户信息
             user_info = {
                 "gender": "male" if dialog.male_radio.isChecked() else "female",
                 "weight": dialog.weight_input.value(),
                 "activity_level": dialog.activity_combo.currentIndex()
             }
-            self.data_manager.set_user_info(user_info)
             
-            # 更新显示
-            self.update_water_percentage()
+            # 用户信息和每日目标一起保存（今天的目标快照记下目标模式和用户信息）
+            # 目标变化时由goal_changed通知刷新水位
+            new_goal = dialog.calculate_daily_goal()
+            self.data_manager.update_settings(user_info, new_goal, dialog.goal_mode())
             
-            # 重置提醒定时器
-            self.reminder_timer.stop()
-            self.reminder_timer.start(self.reminder_interval * 60 * 1000)
+            # 按新的提醒间隔和免打扰时段重新安排提醒
+            self.set_reminder_due(self.next_reminder_due())
     
     def reset_today(self):
         """重置今天的饮水记录"""
+        self.load_history()
         reply = self.show_styled_message("确认重置", 
                                 "确定要重置今天的饮水记录吗？",
                                 QMessageBox.Question,
                                 QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
+            # 显示由day_reset通知刷新
             self.data_manager.reset_today_records()
-            self.current_amount = 0
-            self.update_water_percentage()
             
     def show_styled_message(self, title, text, icon_type=QMessageBox.Information, buttons=QMessageBox.Ok):
         """显示自定义样式的消息框 - 卡通风格"""
@@ -834,38 +1455,7 @@ class WaterBottle(QWidget):
         msg_box.setIcon(icon_type)
         msg_box.setStandardButtons(buttons)
         
-        # 设置样式表 - 卡通风格
-        msg_box.setStyleSheet("""
-            QMessageBox {
-                background-color: rgba(245, 250, 255, 0.95);
-                color: #2c3e50;
-                border-radius: 15px;
-                border: 2px solid rgba(65, 180, 255, 0.7);
-            }
-            QPushButton {
-                background-color: rgba(65, 180, 255, 0.9);
-                color: white;
-                border: none;
-                border-radius: 10px;
-                padding: 10px 18px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: rgba(30, 150, 255, 0.9);
-            }
-            QPushButton:pressed {
-                background-color: rgba(20, 120, 200, 0.9);
-                padding-top: 11px;
-                padding-left: 19px;
-                padding-bottom: 9px;
-                padding-right: 17px;
-            }
-            QLabel {
-                color: #2c3e50;
-                font-size: 12pt;
-            }
-        """)
+        # 卡通风格的样式由应用级别的主题样式表提供
         
         # 应用字体
         font = QFont("微软雅黑", 9)
@@ -883,17 +1473,15 @@ class WaterBottle(QWidget):
         # 创建提醒动画
         self.reminder_animation()
         
-        # 显示消息
-        if hasattr(self, 'tray_icon') and self.tray_icon:
-            self.tray_icon.showMessage("该喝水了! 💧", 
-                                      f"距离上次喝水已经过去 {self.reminder_interval} 分钟了！\n来喝点水吧~",
-                                      QSystemTrayIcon.Information, 
-                                      4000)
-            
-            # 同时显示一个更美观的提醒对话框
-            self.show_styled_message("喝水提醒 🥤", 
-                                    f"已经 {self.reminder_interval} 分钟没有喝水了\n该补充水分啦！",
-                                    QMessageBox.Information)
+        # 根据真实的上次喝水时间生成提示文字
+        minutes = self.minutes_since_last_drink()
+        if minutes is None:
+            text = "今天还没有喝水记录！\n来喝点水吧~"
+        else:
+            text = f"距离上次喝水已经过去 {minutes} 分钟了！\n来喝点水吧~"
+        
+        # 放入通知队列后立即返回，不会阻塞事件循环（动画和计时照常进行）
+        self.notifications.notify("reminder", "该喝水了! 💧", text)
     
     def reminder_animation(self):
         """提醒动画效果"""
@@ -922,7 +1510,7 @@ class WaterBottle(QWidget):
                 self.update_timer.start()
                 # 触发开心表情，因为用户注意到了提醒
                 self._expression_state = "happy"
-                QTimer.singleShot(3000, lambda: setattr(self, '_expression_state', "normal"))
+                QTimer.singleShot(3000, self.update_expression)
                 
             pos_anim.finished.connect(resume_update)
             
@@ -949,8 +1537,11 @@ class WaterBottle(QWidget):
         if hasattr(self, 'blink_timer') and self.blink_timer:
             self.blink_timer.stop()
             
-        if hasattr(self, 'reminder_timer') and self.reminder_timer:
-            self.reminder_timer.stop()
+        if hasattr(self, 'scheduler') and self.scheduler:
+            self.scheduler.stop()
+            
+        if self.local_api:
+            self.local_api.stop()
         
         # 清理系统托盘图标
         if hasattr(self, 'tray_icon') and self.tray_icon:
@@ -959,13 +1550,43 @@ class WaterBottle(QWidget):
         # 退出应用
         QApplication.quit()
 
+def parse_args(argv):
+    """解析命令行参数（Qt自身的参数原样保留）"""
+    parser = argparse.ArgumentParser(description="水瓶 - 智能饮水提醒")
+    parser.add_argument("--trace-startup", action="store_true",
+                        help="打印启动各阶段的耗时")
+    parser.add_argument("--api-port", type=int, metavar="PORT",
+                        help="在本机端口上启用JSON接口（0为关闭，默认使用设置）")
+    ipc.add_instance_arguments(parser)
+    args, _ = parser.parse_known_args(argv[1:])
+    return args
+
 if __name__ == "__main__":
+    args = parse_args(sys.argv)
+    command = ipc.command_from_args(args)
+    trace = StartupTrace(enabled=args.trace_startup, start=STARTUP_BEGIN)
+    trace.mark("导入模块")
+    
+    # 单实例：拿不到锁说明另一个实例正在启动，等它开始监听后转发命令
+    instance_lock = ipc.InstanceLock()
+    if not instance_lock.acquire():
+        reply = ipc.send_command(command, wait=ipc.CONNECT_WAIT)
+        sys.exit(0 if reply is not None else 1)
+    if command["command"] == "quit":
+        sys.exit(0)
+    
     app = QApplication(sys.argv)
+    trace.mark("创建QApplication")
     
     # 检查运行环境
     try:
-        window = WaterBottle()
+        window = WaterBottle(trace, api_port=args.api_port)
+        instance_server = InstanceServer(window.handle_instance_command, window)
+        instance_server.listen()
         window.show()
+        trace.mark("显示窗口")
+        if command["command"] != "show":
+            QTimer.singleShot(0, lambda: window.handle_instance_command(command))
         sys.exit(app.exec_())
     except Exception as e:
         print(f"启动错误: {str(e)}")